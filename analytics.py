@@ -0,0 +1,142 @@
+# analytics.py - Rolling risk analytics over the position history
+"""Realized against implied volatility, hedge error and a gamma/theta P&L
+attribution over rolling windows of position_history.
+
+Every history row contributes one step (the move from the row before it).
+The steps are kept as running sums, so a window of any length is the
+difference of two sums and a series costs O(points), not O(points x window).
+"""
+import threading
+from typing import Dict
+
+import numpy as np
+
+from pricing import DAYS_PER_YEAR, bs_gamma
+from store import ColumnStore, HISTORY_SCHEMA
+
+# Per-step values; row i of the running sums holds the total over rows 0..i
+STEP_SCHEMA = {
+    'return_sq': np.float64,   # squared log return of the underlying
+    'years': np.float64,       # calendar time elapsed
+    'iv': np.float64,
+    'gamma_pnl': np.float64,   # 1/2 gamma dS^2 of the option position
+    'theta_pnl': np.float64,   # -1/2 iv^2 S^2 gamma dt, the delta-hedged theta
+    'option_pnl': np.float64,  # option price change on the contracts held
+    'stock_pnl': np.float64,   # price change on the shares held
+}
+
+# Rows per window when none is asked for
+DEFAULT_WINDOW = 20
+
+SERIES = ('realized_vol', 'implied_vol', 'vol_spread', 'hedged_pnl', 'gamma_pnl', 'theta_pnl', 'hedge_error')
+
+
+class RollingAnalytics:
+    """Running sums of the per-row steps of a hedger's history.
+
+    New history rows only add their own steps. Any other change to the
+    history (edits replay it) makes the next call recompute the sums once,
+    as DateIndex does for its order.
+    """
+
+    def __init__(self, history: ColumnStore, options: ColumnStore):
+        self.history = history
+        self.options = options
+        self._sums = ColumnStore(STEP_SCHEMA)
+        self._generation = None
+        # HEDGE rows among the summed ones; each hedges the next option row
+        self._hedge_rows = 0
+        self._lock = threading.Lock()
+
+    def _sync(self) -> None:
+        with self._lock:
+            size = len(self.history)
+            if self._generation != self.history.generation or size < len(self._sums):
+                self._generation = self.history.generation
+                self._sums.clear()
+                self._hedge_rows = 0
+            if size > len(self._sums):
+                self._extend(len(self._sums), size)
+
+    def _extend(self, lo: int, hi: int) -> None:
+        """Add the steps of history rows [lo, hi) to the running sums"""
+        history, options = self.history, self.options
+        start = max(lo - 1, 0)
+        price = history.column('underlying_price')[start:hi]
+        date = history.column('date')[start:hi]
+        iv = history.column('iv')[start:hi]
+        held = history.column('stock_position')[start:hi]
+
+        # History rows map onto option rows through the HEDGE rows (one per
+        # hedged tick, in order); manual rows keep the option row before them
+        hedge = history.column('transaction_type')[start:hi] == HISTORY_SCHEMA['transaction_type'].index('HEDGE')
+        before = self._hedge_rows - int(hedge[0]) if lo else 0
+        option_row = before + np.cumsum(hedge) - 1
+        self._hedge_rows += int(hedge[lo - start:].sum())
+        valid = (option_row >= 0) & (option_row < len(options))
+        k = np.where(valid, option_row, 0)
+
+        def option_column(name):
+            """Each row's value from its option row (0 for rows before the first)"""
+            column = options.column(name)
+            return np.where(valid, column[k], 0) if len(column) else np.zeros(len(k))
+
+        contracts = option_column('position_size') * 100.0
+        option_price = option_column('option_price')
+        years_left = (option_column('expiration') - date) / DAYS_PER_YEAR
+
+        # Greeks at the start of each step
+        p0, p1 = price[:-1], price[1:]
+        vol = iv[:-1]
+        live = valid[:-1] & (years_left[:-1] > 0) & (vol > 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            gamma = bs_gamma(p0, np.where(live, option_column('strike_price')[:-1], p0),
+                             np.where(live, years_left[:-1], 1.0), np.where(live, vol, 1.0))
+            gamma = np.where(live, gamma, 0.0) * contracts[:-1]
+            move = p1 - p0
+            dt = np.maximum(np.diff(date), 0) / DAYS_PER_YEAR
+            steps = {
+                'return_sq': np.log(p1 / p0) ** 2,
+                'years': dt,
+                'iv': iv[1:],
+                'gamma_pnl': 0.5 * gamma * move * move,
+                'theta_pnl': -0.5 * vol * vol * p0 * p0 * gamma * dt,
+                'option_pnl': contracts[:-1] * np.diff(option_price),
+                'stock_pnl': held[:-1] * move
+            }
+        if not lo:
+            # The first row has no move, only its iv
+            steps = {name: np.concatenate(([iv[0] if name == 'iv' else 0.0], values))
+                     for name, values in steps.items()}
+
+        last = self._sums[-1] if self._sums else dict.fromkeys(STEP_SCHEMA, 0.0)
+        self._sums.extend({name: last[name] + np.cumsum(values) for name, values in steps.items()})
+
+    def series(self, rows: np.ndarray, window: int) -> Dict[str, np.ndarray]:
+        """SERIES over the `window` rows ending at each of `rows` (shorter at the start)"""
+        self._sync()
+        sums = self._sums
+        first = rows - window
+
+        def total(name):
+            column = sums.column(name)
+            return column[rows] - np.where(first >= 0, column[np.maximum(first, 0)], 0.0)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            years = total('years')
+            realized = np.where(years > 0, np.sqrt(total('return_sq') / years), np.nan)
+            implied = total('iv') / np.minimum(window, rows + 1)
+        hedged, gamma, theta = total('option_pnl') + total('stock_pnl'), total('gamma_pnl'), total('theta_pnl')
+        return {
+            'realized_vol': realized,
+            'implied_vol': implied,
+            'vol_spread': realized - implied,
+            'hedged_pnl': hedged,
+            'gamma_pnl': gamma,
+            'theta_pnl': theta,
+            'hedge_error': hedged - gamma - theta
+        }
+
+    @property
+    def nbytes(self) -> int:
+        return self._sums.nbytes
@@ -1,65 +1,65 @@
 # app.py - Main Flask application
-from flask import Flask, render_template, request, jsonify, redirect, url_for
-import pandas as pd
-import numpy as np
-import json
+#
+# Importing this module is cheap: nothing is loaded until create_app() runs.
+# Serve with `gunicorn -c gunicorn.conf.py` (the data is loaded once in the
+# master and the workers fork from it) or run this file for development.
+from flask import Flask
 import os
-import datetime as dt
-from dataclasses import dataclass, asdict
-from typing import List, Dict, Optional, Tuple
-import plotly.graph_objects as go
-import plotly.express as px
-from plotly.subplots import make_subplots
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'delta-hedging-dashboard-secret-key'
+from models import OptionData  # noqa: F401 - re-exported for older imports
 
-# Data storage path
-DATA_FILE = os.path.join(os.path.dirname(__file__), 'data', 'delta_hedge_data.json')
+# Data storage path (a *.store directory of memory-mapped columns; an existing
+# delta_hedge_data.json is migrated on first load, and *.json paths still work)
+DATA_FILE = os.path.join(os.path.dirname(__file__), 'data', 'delta_hedge_data.store')
 
-# Make sure data directory exists
-os.makedirs(os.path.dirname(DATA_FILE), exist_ok=True)
+# Multi-underlying option portfolio (snapshot file; marks are journaled next to it)
+PORTFOLIO_FILE = os.path.join(os.path.dirname(__file__), 'data', 'portfolio.json')
 
-@dataclass
-class OptionData:
-    date: dt.date
-    underlying_price: float
-    strike_price: float
-    option_price: float
-    iv: float
-    delta: float
-    expiration: dt.date
-    option_type: str  # 'call' or 'put'
-    position_size: int  # number of contracts
-    
-    @property
-    def days_to_expiration(self) -> int:
-        return (self.expiration - self.date).days
-    
-    def to_dict(self):
-        data = asdict(self)
-        data['date'] = self.date.isoformat()
-        data['expiration'] = self.expiration.isoformat()
-        return data
-    
-    @classmethod
-    def from_dict(cls, data):
-        # Convert string dates back to date objects
-        data['date'] = dt.date.fromisoformat(data['date'])
-        data['expiration'] = dt.date.fromisoformat(data['expiration'])
-        return cls(**data)
+# Independent hedge books served under /books/<book_id>/ (one *.store each)
+BOOKS_DIR = os.path.join(os.path.dirname(__file__), 'data', 'books')
 
-# Routes will be defined after the DeltaHedger class
 
-# Import the rest of the application
-from hedger import DeltaHedger
-from routes import configure_routes
+def create_app(data_file: str = DATA_FILE, portfolio_file: str = PORTFOLIO_FILE,
+               books_dir: str = BOOKS_DIR) -> Flask:
+    """Build the application: load the hedger, portfolio and books and add the routes"""
+    from books import BookRegistry
+    from hedger import DeltaHedger
+    from portfolio import Portfolio
+    from routes import configure_routes, add_portfolio_routes, add_book_routes, add_metrics_routes
 
-# Initialize the hedger
-hedger = DeltaHedger(DATA_FILE)
+    # Make sure data directory exists
+    os.makedirs(os.path.dirname(data_file), exist_ok=True)
+
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'delta-hedging-dashboard-secret-key'
+
+    hedger = DeltaHedger(data_file)
+    portfolio = Portfolio(portfolio_file)
+    books = BookRegistry(books_dir)
+    app.extensions['delta_hedging'] = {'hedger': hedger, 'portfolio': portfolio, 'books': books}
+
+    # Configure routes
+    configure_routes(app, hedger)
+    add_portfolio_routes(app, portfolio)
+    add_book_routes(app, books)
+    add_metrics_routes(app)
+    return app
+
+
+def __getattr__(name):
+    """`app.app`, `app.hedger` etc. still work, built on first access"""
+    global app
+    if name == 'app':
+        app = create_app()
+        return app
+    if name in ('hedger', 'portfolio', 'books'):
+        return __getattr__('app').extensions['delta_hedging'][name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# Configure routes
-configure_routes(app, hedger)
 
 if __name__ == '__main__':
+    import atexit
+    app = create_app()
+    # gunicorn workers do the same in worker_exit (see gunicorn.conf.py)
+    atexit.register(app.extensions['delta_hedging']['books'].flush_all)
     app.run(debug=True)
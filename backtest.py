@@ -0,0 +1,154 @@
+# backtest.py - Replay stored option ticks under many rebalancing policies at once
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, Optional
+
+import numpy as np
+
+from engine import DEAD_BAND, hedge_units
+
+# Policy x row cells below which a sweep runs in-process instead of on the pool
+PARALLEL_MIN_CELLS = 4_000_000
+
+# Most policies one sweep may run
+MAX_POLICIES = 100_000
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+# Sweeps running on each pool; a replaced pool shuts down once its count drops to 0
+_pool_users: Dict[ProcessPoolExecutor, int] = {}
+_pool_lock = threading.Lock()
+
+
+def policy_grid(bands: Iterable[float] = (), vol_bands: Iterable[float] = (),
+                intervals: Iterable[float] = ()) -> Dict[str, np.ndarray]:
+    """Policy parameter arrays, one entry per policy:
+
+    - band: trade when the hedge is more than `band` shares off target
+      (band 0.01 is the live rule, see engine.DEAD_BAND)
+    - vol_band: the band is this multiple of the position's delta-shares
+      times iv * sqrt(years to expiry), so it widens with the remaining risk
+    - interval: trade back to target once `interval` days have passed since
+      the last trade, whatever the error
+    """
+    bands, vol_bands, intervals = (np.asarray(list(values), dtype=np.float64)
+                                   for values in (bands, vol_bands, intervals))
+    kinds = ['band'] * len(bands) + ['vol_band'] * len(vol_bands) + ['interval'] * len(intervals)
+    zeros, never = np.zeros, np.full
+    return {
+        'kind': np.asarray(kinds, dtype=object),
+        'param': np.concatenate((bands, vol_bands, intervals)),
+        'band': np.concatenate((bands, zeros(len(vol_bands)), never(len(intervals), np.inf))),
+        'vol_band': np.concatenate((zeros(len(bands)), vol_bands, zeros(len(intervals)))),
+        'interval': np.concatenate((never(len(bands) + len(vol_bands), np.inf), intervals))
+    }
+
+
+def backtest(columns: Dict[str, np.ndarray], policies: Dict[str, np.ndarray],
+             fixed_cost: float = 0.0, percentage_cost: float = 0.0) -> Dict[str, np.ndarray]:
+    """Replay option ticks under every policy, stepping through the rows
+    with all policies advanced together as arrays.
+
+    Returns per-policy arrays: trades, fees, turnover (shares traded) and
+    the mean, RMS and maximum absolute hedge error in shares after each row.
+    """
+    band = np.maximum(policies['band'], DEAD_BAND)
+    vol_band = policies['vol_band']
+    interval = policies['interval']
+    target = hedge_units(columns['delta'], columns['position_size'])
+    price = columns['underlying_price']
+    days = columns['date']
+    # Delta-shares times the volatility left to expiry, for vol_band policies
+    years = np.maximum(columns['expiration'] - days, 0) / 365.0
+    risk = np.abs(target) * columns['iv'] * np.sqrt(years)
+
+    count = len(band)
+    held = np.zeros(count)
+    last_trade = np.full(count, -np.inf)
+    trades = np.zeros(count, dtype=np.int64)
+    fees = np.zeros(count)
+    turnover = np.zeros(count)
+    error_sum = np.zeros(count)
+    error_squares = np.zeros(count)
+    error_max = np.zeros(count)
+    for row in range(len(target)):
+        error = target[row] - held
+        # Band policies never fall due: their interval is inf, and so is the time since no trade
+        due = np.isfinite(interval) & (days[row] - last_trade >= interval)
+        trade = np.abs(error) > np.where(due, DEAD_BAND, band + vol_band * risk[row])
+        adjustment = np.where(trade, error, 0.0)
+        shares = np.abs(adjustment)
+        trades += trade
+        turnover += shares
+        fees += trade * fixed_cost + shares * (price[row] * percentage_cost)
+        held += adjustment
+        last_trade[trade] = days[row]
+        remaining = np.abs(error - adjustment)
+        error_sum += remaining
+        error_squares += remaining * remaining
+        np.maximum(error_max, remaining, out=error_max)
+
+    rows = max(len(target), 1)
+    return {
+        'trades': trades,
+        'fees': fees,
+        'turnover': turnover,
+        'mean_error': error_sum / rows,
+        'rms_error': np.sqrt(error_squares / rows),
+        'max_error': error_max
+    }
+
+
+def run_backtest(columns: Dict[str, np.ndarray], policies: Dict[str, np.ndarray],
+                 fixed_cost: float = 0.0, percentage_cost: float = 0.0,
+                 workers: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """backtest, with large sweeps split by policy across a process pool"""
+    count = len(policies['band'])
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or count * len(columns['delta']) < PARALLEL_MIN_CELLS:
+        return backtest(columns, policies, fixed_cost, percentage_cost)
+
+    numeric = {name: values for name, values in policies.items() if name != 'kind'}
+    chunks = np.array_split(np.arange(count), min(workers, count))
+    with process_pool(workers) as pool:
+        futures = [pool.submit(backtest, columns, {name: values[chunk] for name, values in numeric.items()},
+                               fixed_cost, percentage_cost)
+                   for chunk in chunks]
+        results = [future.result() for future in futures]
+    return {name: np.concatenate([result[name] for result in results]) for name in results[0]}
+
+
+def valid_workers(workers) -> bool:
+    """Whether a request may ask for this many workers (None means one per CPU)"""
+    return workers is None or (type(workers) is int and 1 <= workers <= (os.cpu_count() or 1))
+
+
+@contextmanager
+def process_pool(workers: int) -> Iterator[ProcessPoolExecutor]:
+    """Pool kept across sweeps and simulations; forkserver workers don't inherit the server's threads.
+
+    Asking for another size replaces the pool, but one still in use is only
+    shut down when its last sweep leaves.
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None and _pool not in _pool_users:
+                _pool.shutdown(wait=False)
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            _pool, _pool_workers = ProcessPoolExecutor(workers, mp_context=context), workers
+        pool = _pool
+        _pool_users[pool] = _pool_users.get(pool, 0) + 1
+    try:
+        yield pool
+    finally:
+        with _pool_lock:
+            _pool_users[pool] -= 1
+            if not _pool_users[pool]:
+                del _pool_users[pool]
+                if pool is not _pool:
+                    pool.shutdown(wait=False)
@@ -0,0 +1,81 @@
+# bench/coldstart.py - Cold start time of a fresh server process
+"""Measure how long a new process takes to import the app, build it and answer.
+
+Each run is a fresh interpreter that times `import app`, create_app() on a
+data file and the first /api/summary and /api/plots requests (the latter
+pays for loading plotly). The median of --runs is reported; the run exits
+with status 1 when import plus create_app exceeds --target ms.
+
+    python bench/coldstart.py                  # empty data file
+    python bench/coldstart.py --rows 1000000   # a prebuilt 1M-row history
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+flask_app = app.create_app(sys.argv[1], sys.argv[2], sys.argv[3])
+created = time.perf_counter()
+heavy = [name for name in ('plotly', 'pandas') if name in sys.modules]
+client = flask_app.test_client()
+client.get('/api/summary')
+summary = time.perf_counter()
+client.get('/api/plots')
+plots = time.perf_counter()
+print(json.dumps({
+    'import': imported - start,
+    'create_app': created - imported,
+    'first_summary': summary - created,
+    'first_plots': plots - summary,
+    'loaded_at_boot': heavy
+}))
+'''
+
+
+def build_data(directory: str, rows: int) -> str:
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from hotpaths import build_hedger
+    return build_hedger(directory, rows).filename
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=0, help="history size of the data file")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--target', type=float, default=300, help="import + create_app budget (ms)")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        data_file = build_data(directory, args.rows) if args.rows else os.path.join(directory, 'cold.store')
+        args_for_probe = [data_file, os.path.join(directory, 'portfolio.json'), os.path.join(directory, 'books')]
+        runs = []
+        for _ in range(args.runs):
+            output = subprocess.run([sys.executable, '-c', PROBE, *args_for_probe], cwd=ROOT,
+                                    capture_output=True, text=True, check=True).stdout
+            runs.append(json.loads(output.splitlines()[-1]))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    medians = {name: sorted(run[name] for run in runs)[len(runs) // 2] for name in runs[0] if name != 'loaded_at_boot'}
+    for name, seconds in medians.items():
+        print(f"  {name:<14} {seconds * 1000:8.1f} ms")
+    print(f"Loaded at boot: {', '.join(runs[0]['loaded_at_boot']) or 'neither plotly nor pandas'}")
+    boot = (medians['import'] + medians['create_app']) * 1000
+    print(f"Boot (import + create_app): {boot:.1f} ms, target {args.target:.0f} ms")
+    return 1 if boot > args.target else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,201 @@
+# bench/hotpaths.py - Micro-benchmarks of the DeltaHedger hot paths
+"""Time the hedger's hot paths on synthetic histories and compare to a baseline.
+
+Each benchmark runs on hedgers of 1k, 100k and 1M option rows built from
+the same seeded random walk, so runs are reproducible. The best of
+--repeat timings is kept. Results slower than the baseline by more than
+--threshold (and by more than --min-delta) are flagged and make the run
+exit with status 1, as do benchmarks missing from the baseline. Baselines are machine specific: record one on the
+machine that runs the comparison.
+
+    python bench/hotpaths.py                   # compare to bench/baseline.json
+    python bench/hotpaths.py --save-baseline   # record a new baseline
+    python bench/hotpaths.py --sizes 1k,100k --only update_hedge,plots
+"""
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+from models import OptionData
+from hedger import DeltaHedger
+from pricing import bs_delta
+from engine import replay_hedge
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+SIZES = {'1k': 1_000, '100k': 100_000, '1M': 1_000_000}
+
+
+def synthetic_columns(rows: int, seed: int = 0, quiet: float = 0.0):
+    """Encoded option rows: a daily GBM walk of one call, hedged every tick.
+
+    A `quiet` share of the ticks barely move price and vol, so their hedge
+    lands inside the dead band and the replay has to skip them.
+    """
+    rng = np.random.default_rng(seed)
+    start = dt.date(2000, 1, 3).toordinal()
+    date = start + np.arange(rows) // 4  # four ticks a day
+    expiration = np.full(rows, start + rows // 4 + 365)
+    scale = np.where(rng.random(rows) < quiet, 1e-5, 1.0)
+    price = 100 * np.exp(np.cumsum(rng.normal(0, 0.005, rows) * scale))
+    iv = np.clip(0.2 + np.cumsum(rng.normal(0, 0.001, rows) * scale), 0.05, 1.0)
+    years = (expiration - date) / 365.0
+    return {
+        'date': date.astype(np.int64),
+        'underlying_price': price,
+        'strike_price': np.full(rows, 100.0),
+        'option_price': np.full(rows, 5.0),
+        'iv': iv,
+        'delta': bs_delta(price, 100.0, years, iv, True),
+        'expiration': expiration.astype(np.int64),
+        'option_type': np.zeros(rows, dtype=np.int8),
+        'position_size': np.full(rows, 10, dtype=np.int64)
+    }
+
+
+def build_hedger(directory: str, rows: int) -> DeltaHedger:
+    hedger = DeltaHedger(os.path.join(directory, f"bench-{rows}.store"))
+    hedger.set_transaction_costs(1.0, 0.0005)
+    hedger.ingest_options(synthetic_columns(rows))
+    hedger.snapshot()
+    return hedger
+
+
+def next_tick(hedger: DeltaHedger, shift: float) -> OptionData:
+    last = hedger.options_data[-1]
+    return OptionData(last.date, last.underlying_price + shift, last.strike_price, last.option_price,
+                      last.iv, min(max(last.delta + shift / 100, 0.0), 1.0), last.expiration,
+                      last.option_type, last.position_size)
+
+
+def timed(function, repeat: int) -> float:
+    """Best wall time of `repeat` calls"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_size(label: str, rows: int, repeat: int, only) -> dict:
+    directory = tempfile.mkdtemp()
+    try:
+        hedger = build_hedger(directory, rows)
+        shifts = iter(np.random.default_rng(1).normal(0, 1, 10 * repeat + 10))
+
+        def update_hedge():
+            hedger.add_option_data(next_tick(hedger, next(shifts)))
+            hedger.update_hedge()
+
+        def recalculate():
+            # Edit a row a quarter from the end, then replay the tail
+            index = len(hedger.options_data) * 3 // 4
+            hedger.edit_option_data(index, next_tick(hedger, next(shifts)))
+            hedger.apply_pending_edits()
+
+        def save_data():
+            hedger.add_option_data(next_tick(hedger, next(shifts)))
+            hedger.update_hedge()
+            hedger.save_data()
+
+        def rolling_analytics():
+            # A new tick, then the analytics extended by its row
+            hedger.add_option_data(next_tick(hedger, next(shifts)))
+            hedger.update_hedge()
+            hedger.rolling_analytics()
+
+        quiet = synthetic_columns(rows, seed=2, quiet=0.1)
+
+        def replay_dead_band():
+            # Replay engine alone over a walk where about a tenth of the ticks are skipped
+            replay_hedge(quiet['delta'], quiet['position_size'], quiet['underlying_price'],
+                         0.0, 100000.0, 1.0, 0.0005)
+
+        def plots():
+            hedger.version += 1  # defeat the per-version plot cache
+            hedger.generate_dashboard_plots()
+
+        benchmarks = {
+            'update_hedge': update_hedge,
+            'recalculate_position_history': recalculate,
+            'save_data': save_data,
+            'snapshot': hedger.snapshot,
+            'load_data': lambda: DeltaHedger(hedger.filename),
+            'get_history_as_df': hedger.get_history_as_df,
+            'get_summary_data': hedger.get_summary_data,
+            'rolling_analytics': rolling_analytics,
+            'replay_dead_band': replay_dead_band,
+            'plots': plots
+        }
+        results = {}
+        for name, function in benchmarks.items():
+            if only and name not in only:
+                continue
+            results[name] = timed(function, repeat)
+            print(f"  {label:>5} {name:<30} {results[name] * 1000:10.3f} ms", flush=True)
+        return results
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(SIZES), help="comma separated, of " + ', '.join(SIZES))
+    parser.add_argument('--only', default='', help="comma separated benchmark names")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--threshold', type=float, default=0.25, help="allowed slowdown (0.25 = 25%%)")
+    parser.add_argument('--min-delta', type=float, default=0.1,
+                        help="slowdowns under this many ms are timer noise, never regressions")
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    args = parser.parse_args()
+
+    only = set(filter(None, args.only.split(',')))
+    results = {}
+    for label in args.sizes.split(','):
+        results[label] = run_size(label, SIZES[label], args.repeat, only)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({'machine': platform.platform(), 'python': platform.python_version(),
+                       'results': results}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare against (run with --save-baseline)")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+
+    regressions, missing = [], []
+    for label, timings in results.items():
+        for name, seconds in timings.items():
+            before = baseline.get(label, {}).get(name)
+            if before is None:
+                missing.append(f"{label} {name}")
+            elif seconds > before * (1 + args.threshold) and (seconds - before) * 1000 > args.min_delta:
+                regressions.append(f"{label} {name}: {before * 1000:.3f} ms -> {seconds * 1000:.3f} ms "
+                                   f"(+{(seconds / before - 1) * 100:.0f}%)")
+    for regression in regressions:
+        print("REGRESSION", regression)
+    for name in missing:
+        print("MISSING", name, "has no baseline (run with --save-baseline)")
+    print(f"{len(regressions)} regressions beyond {args.threshold:.0%}, {len(missing)} without a baseline")
+    return 1 if regressions or missing else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
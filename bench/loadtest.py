@@ -0,0 +1,245 @@
+# bench/loadtest.py - HTTP load test: a live tick feed plus polling dashboards
+"""Measure endpoint latency and throughput as a book's history grows.
+
+Starts the app on a fresh data file in a separate process. For each
+history size in --stages, it bulk-loads ticks up to that size, then runs
+for --duration seconds:
+
+- a feed posting ticks to /api/option-data (--rate per second, 0 for as
+  fast as the server takes them) with an occasional /api/stock-position
+- --clients dashboards polling /api/summary, the recent and full
+  /api/transactions, and /api/plots and /api/analytics (revalidated by
+  ETag, switching between the full history and a zoomed range), like the
+  pages do
+
+p50/p95/p99 latency and requests/s are reported per endpoint and stage.
+Errors count failed statuses, 200 bodies reporting status "error" and
+304s that don't confirm the ETag sent for that exact query.
+A stage whose p95 exceeds --slo ms on any endpoint is flagged as the
+size where the book stops being usable.
+
+    python bench/loadtest.py --stages 1000,10000,100000 --clients 8 --duration 10
+"""
+import argparse
+import datetime as dt
+import gzip
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+START_DATE = dt.date(2000, 1, 3)
+
+# Rows per bulk request while growing the history
+BULK_ROWS = 50_000
+
+
+def serve(filename, ports):
+    """Server process: the app's routes on a threaded server over the data file"""
+    import logging
+    from flask import Flask
+    from werkzeug.serving import make_server
+
+    from hedger import DeltaHedger
+    from routes import configure_routes
+
+    flask_app = Flask(__name__, template_folder=os.path.join(os.path.dirname(__file__), '..', 'templates'))
+    configure_routes(flask_app, DeltaHedger(filename))
+    server = make_server('127.0.0.1', 0, flask_app, threaded=True)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)  # no per-request log lines
+    ports.put(server.server_port)
+    server.serve_forever()
+
+
+class Feed:
+    """Synthetic market: one call on a random walk, four ticks a day"""
+
+    def __init__(self, seed: int = 0):
+        self.rng = np.random.default_rng(seed)
+        self.row = 0
+        self.price = 100.0
+        self.lock = threading.Lock()
+
+    def ticks(self, count: int):
+        with self.lock:
+            rows = self.row + np.arange(count)
+            prices = self.price * np.exp(np.cumsum(self.rng.normal(0, 0.005, count)))
+            deltas = np.clip(0.5 + (prices - 100) / 50, 0.01, 0.99)
+            self.row += count
+            self.price = float(prices[-1])
+        return [{
+            'date': (START_DATE + dt.timedelta(days=int(row) // 4)).isoformat(),
+            'underlying_price': float(price),
+            'strike_price': 100,
+            'option_price': 5,
+            'iv': 0.2,
+            'delta': float(delta),
+            'expiration': '2100-01-01',
+            'option_type': 'call',
+            'position_size': 10
+        } for row, price, delta in zip(rows, prices, deltas)]
+
+
+class Recorder:
+    """Latencies per endpoint, kept by the threads that make the requests"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def request(self, base, name, path, body=None, headers=None, data=None, etag=None):
+        """Time one request; etag is sent as If-None-Match and must come back on a 304"""
+        headers = dict(headers or {}, **{'Accept-Encoding': 'gzip'})
+        if etag:
+            headers['If-None-Match'] = etag
+        if body is not None:
+            data = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        request = urllib.request.Request(base + path, data, headers)
+        start = time.perf_counter()
+        status, response_headers, content = 200, {}, b''
+        try:
+            with urllib.request.urlopen(request) as response:
+                content = response.read()
+                response_headers = response.headers
+        except urllib.error.HTTPError as e:
+            status, response_headers = e.code, e.headers
+        elapsed = time.perf_counter() - start
+        if status == 200:
+            failed = self.reports_error(content, response_headers)
+        else:
+            failed = status != 304 or not etag or response_headers.get('ETag') != etag
+        with self.lock:
+            self.latencies[name].append(elapsed)
+            if failed:
+                self.errors[name] += 1
+        return response_headers
+
+    @staticmethod
+    def reports_error(content, headers) -> bool:
+        """Whether a 200 body is the app's {"status": "error"} reply"""
+        if headers.get('Content-Encoding') == 'gzip':
+            content = gzip.decompress(content)
+        # Row listings are arrays; only objects carry a status
+        if not content.lstrip().startswith(b'{'):
+            return False
+        return json.loads(content).get('status') == 'error'
+
+
+def feeder(base, feed, recorder, stop, rate):
+    interval = 1.0 / rate if rate else 0.0
+    next_at = time.perf_counter()
+    count = 0
+    while not stop.is_set():
+        count += 1
+        if count % 20 == 0:
+            recorder.request(base, 'POST /api/stock-position', '/api/stock-position', {
+                'date': feed.ticks(1)[0]['date'], 'price': feed.price, 'position_type': 'LONG', 'shares': 10})
+        else:
+            recorder.request(base, 'POST /api/option-data', '/api/option-data', feed.ticks(1)[0])
+        if interval:
+            next_at += interval
+            time.sleep(max(0.0, next_at - time.perf_counter()))
+
+
+def dashboard(base, recorder, stop, poll_seconds):
+    # ETags per exact query: a tag is only good for the range it was sent with
+    etags = {}
+    zoom = f"start={START_DATE.isoformat()}&end={(START_DATE + dt.timedelta(days=90)).isoformat()}"
+    polls = 0
+    while not stop.is_set():
+        recorder.request(base, 'GET /api/summary', '/api/summary')
+        recorder.request(base, 'GET /api/transactions (recent)', '/api/transactions?limit=5&order=desc')
+        recorder.request(base, 'GET /api/transactions', '/api/transactions')
+        query = zoom if polls % 2 else ''
+        for name, path in (('GET /api/plots', f'/api/plots?{query}'), ('GET /api/analytics', f'/api/analytics?{query}')):
+            headers = recorder.request(base, name, path, etag=etags.get(path))
+            etags[path] = headers.get('ETag', etags.get(path))
+        polls += 1
+        stop.wait(poll_seconds)
+
+
+def grow(base, feed, rows):
+    """Bulk-load ticks until the history holds `rows` option rows"""
+    while feed.row < rows:
+        batch = feed.ticks(min(BULK_ROWS, rows - feed.row))
+        body = '\n'.join(json.dumps(tick) for tick in batch).encode()
+        request = urllib.request.Request(base + '/api/option-data/bulk', body,
+                                         {'Content-Type': 'application/x-ndjson'})
+        with urllib.request.urlopen(request) as response:
+            result = json.loads(response.read())
+        if result.get('status') == 'error':
+            raise RuntimeError(result['message'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--stages', default='1000,10000,100000', help="history sizes (option rows) to test at")
+    parser.add_argument('--clients', type=int, default=8, help="polling dashboards")
+    parser.add_argument('--poll', type=float, default=1.0, help="seconds between a dashboard's polls")
+    parser.add_argument('--rate', type=float, default=20, help="ticks per second (0: as fast as possible)")
+    parser.add_argument('--duration', type=float, default=10, help="seconds per stage")
+    parser.add_argument('--slo', type=float, default=500, help="p95 latency (ms) a usable book stays under")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context('spawn')
+    ports = context.Queue()
+    server = context.Process(target=serve, args=(os.path.join(tempfile.mkdtemp(), 'load.store'), ports),
+                             daemon=True)
+    server.start()
+    base = f"http://127.0.0.1:{ports.get(timeout=60)}"
+
+    feed = Feed()
+    unusable = None
+    try:
+        for stage in map(int, args.stages.split(',')):
+            start = time.perf_counter()
+            grow(base, feed, stage)
+            print(f"\n{stage} rows (loaded in {time.perf_counter() - start:.1f}s)")
+
+            recorder, stop = Recorder(), threading.Event()
+            threads = [threading.Thread(target=feeder, args=(base, feed, recorder, stop, args.rate))]
+            threads += [threading.Thread(target=dashboard, args=(base, recorder, stop, args.poll))
+                        for _ in range(args.clients)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            time.sleep(args.duration)
+            stop.set()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+
+            print(f"  {'endpoint':<32} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6}")
+            worst = 0.0
+            for name, latencies in sorted(recorder.latencies.items()):
+                p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+                worst = max(worst, p95)
+                print(f"  {name:<32} {len(latencies) / elapsed:8.1f} {p50:8.1f} {p95:8.1f} {p99:8.1f} "
+                      f"{recorder.errors[name]:6d}")
+            if worst > args.slo and unusable is None:
+                unusable = stage
+                print(f"  p95 above {args.slo:.0f} ms")
+    finally:
+        server.terminate()
+
+    if unusable is None:
+        print(f"\nEvery stage stayed under a p95 of {args.slo:.0f} ms")
+    else:
+        print(f"\nUnusable from {unusable} rows (p95 above {args.slo:.0f} ms)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,186 @@
+# bench/stress_concurrency.py - Concurrent writers and readers against one hedger
+"""Fire concurrent writes and reads at a threaded server and check the result.
+
+Writers post option ticks, stock positions and edits; readers poll the
+summary, history, transactions and plots and check every response is
+internally consistent. Afterwards the in-memory state must match a
+hedger reloaded from disk and account for every accepted write.
+
+With --processes above 1, further server processes share the same data
+files (as gunicorn workers would) and requests are spread across them.
+
+    python bench/stress_concurrency.py --writers 8 --readers 8 --requests 200
+    python bench/stress_concurrency.py --processes 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask import Flask
+from werkzeug.serving import make_server
+
+from hedger import DeltaHedger
+from routes import configure_routes
+
+
+def start_server(filename):
+    """Serve a hedger on the data file from a background thread; returns (hedger, server, base URL)"""
+    hedger = DeltaHedger(filename)
+    app = Flask(__name__, template_folder=os.path.join(os.path.dirname(__file__), '..', 'templates'))
+    configure_routes(app, hedger)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return hedger, server, f"http://127.0.0.1:{server.server_port}"
+
+
+def worker_process(filename, bases, stop):
+    _, server, base = start_server(filename)
+    bases.put(base)
+    stop.wait()
+    server.shutdown()
+
+
+def call(base, path, body=None, method=None):
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(base + path, data, {'Content-Type': 'application/json'}, method=method)
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def tick(rng, day):
+    price = 100 + rng.uniform(-10, 10)
+    return {
+        'date': f"2024-{1 + day // 28:02d}-{1 + day % 28:02d}",
+        'underlying_price': price,
+        'strike_price': 100,
+        'option_price': 5,
+        'iv': 0.2,
+        'delta': rng.uniform(0.1, 0.9),
+        'expiration': '2025-01-01',
+        'option_type': 'call',
+        'position_size': 10
+    }
+
+
+def writer(base, seed, count, accepted, errors):
+    rng = random.Random(seed)
+    for i in range(count):
+        kind = rng.random()
+        try:
+            if kind < 0.8:
+                result = call(base, '/api/option-data', tick(rng, rng.randrange(300)))
+                key = 'ticks'
+            elif kind < 0.9:
+                result = call(base, '/api/stock-position', {
+                    'date': '2024-06-01', 'price': 100, 'position_type': rng.choice(['LONG', 'SHORT']),
+                    'shares': rng.randint(1, 50)})
+                key = 'stock'
+            else:
+                result = call(base, f"/api/option-data/{rng.randrange(10)}", tick(rng, rng.randrange(300)), 'PUT')
+                key = 'edits'
+            if result.get('status') == 'error':
+                errors.append(result['message'])
+            else:
+                accepted[key] += 1
+        except Exception as e:
+            errors.append(repr(e))
+
+
+def reader(base, stop, reads, errors):
+    while not stop.is_set():
+        try:
+            history = call(base, '/api/history?shape=columns')
+            lengths = {len(values) for values in history.values()}
+            if len(lengths) != 1:
+                errors.append(f"ragged history columns: {lengths}")
+            transactions = call(base, '/api/transactions?shape=columns')
+            if transactions['row'] and max(transactions['row']) > len(history['date']) + 1000:
+                errors.append("transaction points past the history")
+            summary = call(base, '/api/summary')
+            if not isinstance(summary['total_trades'], int):
+                errors.append(f"bad summary {summary}")
+            call(base, '/api/plots')
+            reads[0] += 1
+        except Exception as e:
+            errors.append(repr(e))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200, help="writes per writer")
+    parser.add_argument('--processes', type=int, default=1, help="server processes sharing the data files")
+    args = parser.parse_args()
+
+    filename = os.path.join(tempfile.mkdtemp(), 'stress.store')
+    hedger, server, base = start_server(filename)
+
+    context = multiprocessing.get_context('spawn')
+    bases, process_stop = context.Queue(), context.Event()
+    processes = [context.Process(target=worker_process, args=(filename, bases, process_stop))
+                 for _ in range(args.processes - 1)]
+    for process in processes:
+        process.start()
+    servers = [base] + [bases.get() for _ in processes]
+
+    # Edits need rows to edit
+    call(base, '/api/option-data', tick(random.Random(0), 0))
+    for i in range(10):
+        call(base, '/api/option-data', tick(random.Random(i + 1), i + 1))
+
+    accepted = {'ticks': 11, 'stock': 0, 'edits': 0}
+    errors, reads, stop = [], [0], threading.Event()
+    writers = [threading.Thread(target=writer, args=(servers[seed % len(servers)], seed, args.requests,
+                                                     accepted, errors))
+               for seed in range(args.writers)]
+    readers = [threading.Thread(target=reader, args=(servers[i % len(servers)], stop, reads, errors))
+               for i in range(args.readers)]
+    start = time.perf_counter()
+    for thread in writers + readers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    stop.set()
+    for thread in readers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    process_stop.set()
+    for process in processes:
+        process.join()
+
+    # Every accepted write is accounted for, and the journal replays to the same state
+    with hedger.reading():
+        if len(hedger.options_data) != accepted['ticks']:
+            errors.append(f"{len(hedger.options_data)} option rows for {accepted['ticks']} ticks")
+        # One history row per tick and per stock position; edits replay both
+        if len(hedger.position_history) != accepted['ticks'] + accepted['stock']:
+            errors.append(f"{len(hedger.position_history)} history rows for "
+                          f"{accepted['ticks']} ticks and {accepted['stock']} stock positions")
+        reloaded = DeltaHedger(filename)
+        for name in ('current_capital', 'current_stock_units'):
+            if getattr(reloaded, name) != getattr(hedger, name):
+                errors.append(f"reloaded {name} {getattr(reloaded, name)} != {getattr(hedger, name)}")
+        if reloaded.stock_transactions.to_records() != hedger.stock_transactions.to_records():
+            errors.append("reloaded transactions differ")
+
+    writes = sum(accepted.values()) - 11
+    print(f"{writes} writes and {reads[0]} read rounds in {elapsed:.2f}s "
+          f"({writes / elapsed:.0f} writes/s), {len(errors)} errors")
+    for error in errors[:20]:
+        print("  ", error)
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
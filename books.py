@@ -0,0 +1,146 @@
+# books.py - Independent hedge books, loaded on first use and evicted when idle
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from hedger import DeltaHedger
+
+# Total bytes of column data the loaded books may hold
+BOOK_MEMORY_BUDGET = 512 << 20
+
+# Books untouched for this long are flushed and evicted
+BOOK_IDLE_SECONDS = 15 * 60
+
+BOOK_ID = re.compile(r'[A-Za-z0-9_-]{1,64}')
+
+
+@dataclass
+class Book:
+    """A loaded book and what it cost to load"""
+    hedger: DeltaHedger
+    load_seconds: float
+    last_used: float
+    hits: int = 0
+
+
+class BookRegistry:
+    """Hedgers by book ID, each stored as <directory>/<book_id>.store.
+
+    Books load on first access and are kept in LRU order. Loading a book
+    evicts the least recently used ones while the loaded books exceed the
+    memory budget; books idle for longer than idle_seconds go as well.
+    Evicted books are snapshotted first, so they load without a replay.
+
+    A request still holding an evicted hedger keeps working on it: its
+    writes go to the journal, which the next instance of the book picks up
+    like a change from another process (see DeltaHedger.sync).
+    """
+
+    def __init__(self, directory: str, memory_budget: int = BOOK_MEMORY_BUDGET,
+                 idle_seconds: float = BOOK_IDLE_SECONDS):
+        self.directory = directory
+        self.memory_budget = memory_budget
+        self.idle_seconds = idle_seconds
+        self._books: 'OrderedDict[str, Book]' = OrderedDict()
+        self._lock = threading.Lock()
+        # Per book: serializes its loads and flushes without holding up other books
+        self._book_locks: Dict[str, threading.Lock] = {}
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, book_id: str) -> str:
+        if not BOOK_ID.fullmatch(book_id):
+            raise ValueError(f"Invalid book ID: {book_id!r}")
+        return os.path.join(self.directory, f"{book_id}.store")
+
+    def get(self, book_id: str) -> DeltaHedger:
+        """The book's hedger, loading it (and evicting others) if needed"""
+        path = self.path(book_id)
+        with self._lock:
+            book = self._books.get(book_id)
+            book_lock = self._book_locks.setdefault(book_id, threading.Lock())
+        if book is None:
+            # Loaded outside the registry lock, so other books stay available;
+            # the book lock keeps a book from loading twice or mid-flush
+            with book_lock:
+                with self._lock:
+                    book = self._books.get(book_id)
+                if book is None:
+                    start = time.perf_counter()
+                    hedger = DeltaHedger(path)
+                    book = Book(hedger, time.perf_counter() - start, time.monotonic())
+                    with self._lock:
+                        book = self._books.setdefault(book_id, book)
+        now = time.monotonic()
+        with self._lock:
+            if book_id in self._books:
+                self._books.move_to_end(book_id)
+            book.last_used = now
+            book.hits += 1
+            evicted = self._evict(now, keep=book_id)
+        self._flush(evicted)
+        return book.hedger
+
+    def _evict(self, now: float, keep: Optional[str] = None) -> Dict[str, DeltaHedger]:
+        """Drop idle books, then least recently used ones while over budget.
+
+        The `keep` book, the one being served, always stays.
+        Returns the dropped hedgers; callers flush them once the lock is released.
+        """
+        evicted = {}
+        for book_id, book in list(self._books.items()):
+            if book_id != keep and now - book.last_used > self.idle_seconds:
+                evicted[book_id] = self._books.pop(book_id).hedger
+        total = sum(book.hedger.memory_bytes() for book in self._books.values())
+        while total > self.memory_budget and len(self._books) > 1:
+            book_id, book = self._books.popitem(last=False)
+            total -= book.hedger.memory_bytes()
+            evicted[book_id] = book.hedger
+        self.evictions += len(evicted)
+        return evicted
+
+    def _flush(self, evicted: Dict[str, DeltaHedger]) -> None:
+        """Snapshot evicted hedgers, each under its book lock so a reload waits for it"""
+        for book_id, hedger in evicted.items():
+            with self._book_locks[book_id]:
+                with hedger.writing():
+                    hedger.flush()
+
+    def evict_idle(self) -> None:
+        with self._lock:
+            evicted = self._evict(time.monotonic())
+        self._flush(evicted)
+
+    def flush_all(self) -> None:
+        """Snapshot and drop every loaded book (e.g. at shutdown)"""
+        with self._lock:
+            evicted = {book_id: book.hedger for book_id, book in self._books.items()}
+            self._books.clear()
+            self.evictions += len(evicted)
+        self._flush(evicted)
+
+    def stats(self) -> Dict:
+        """Load latency, memory and use of every loaded book"""
+        now = time.monotonic()
+        with self._lock:
+            books = {
+                book_id: {
+                    "load_seconds": book.load_seconds,
+                    "memory_bytes": book.hedger.memory_bytes(),
+                    "rows": len(book.hedger.position_history),
+                    "hits": book.hits,
+                    "idle_seconds": now - book.last_used
+                }
+                for book_id, book in self._books.items()
+            }
+        return {
+            "loaded": len(books),
+            "memory_bytes": sum(book["memory_bytes"] for book in books.values()),
+            "memory_budget": self.memory_budget,
+            "evictions": self.evictions,
+            "books": books
+        }
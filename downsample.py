@@ -0,0 +1,66 @@
+# downsample.py - Point reduction for plotting long series
+from typing import Optional
+
+import numpy as np
+
+
+def lttb(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """Indices picked by largest-triangle-three-buckets.
+
+    The first and last points are kept; every bucket in between contributes
+    the point spanning the largest triangle with the previously picked point
+    and the average of the next bucket.
+    """
+    size = len(x)
+    if points >= size or points < 3:
+        return np.arange(size)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # points - 2 buckets over the interior; the last point acts as the final bucket
+    edges = np.append(np.linspace(1, size - 1, points - 1).astype(np.int64), size)
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(x, edges[:-1]) / counts
+    avg_y = np.add.reduceat(y, edges[:-1]) / counts
+
+    picked = np.empty(points, dtype=np.int64)
+    picked[0], picked[-1] = 0, size - 1
+    a = 0
+    for i in range(points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs((x[a] - avg_x[i + 1]) * (y[lo:hi] - y[a])
+                      - (x[a] - x[lo:hi]) * (avg_y[i + 1] - y[a]))
+        a = lo + int(np.argmax(area))
+        picked[i + 1] = a
+    return picked
+
+
+def minmax(y: np.ndarray, points: int) -> np.ndarray:
+    """Indices of the minimum and maximum of each of points // 2 equal buckets"""
+    size = len(y)
+    if points >= size:
+        return np.arange(size)
+    starts = np.linspace(0, size, max(1, points // 2), endpoint=False).astype(np.int64)
+    bucket = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, size)))
+    picked = []
+    for reduce in (np.minimum, np.maximum):
+        hits = np.flatnonzero(y == reduce.reduceat(y, starts)[bucket])
+        _, first = np.unique(bucket[hits], return_index=True)
+        picked.append(hits[first])
+    return np.union1d(*picked)
+
+
+def downsample(x: np.ndarray, y: np.ndarray, points: int, keep: Optional[np.ndarray] = None,
+               method: str = 'lttb') -> np.ndarray:
+    """Sorted indices of a series reduced to about `points` points.
+
+    The series minimum and maximum are always kept, as are the indices in
+    `keep` (e.g. trade rows).
+    """
+    if not points or len(y) <= points:
+        return np.arange(len(y))
+    picked = minmax(y, points) if method == 'minmax' else lttb(x, y, points)
+    extremes = [np.argmin(y), np.argmax(y)]
+    if keep is not None:
+        extremes = np.concatenate((extremes, keep))
+    return np.union1d(picked, extremes)
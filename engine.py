@@ -0,0 +1,174 @@
+# engine.py - Vectorized hedge replay
+from bisect import bisect_left, bisect_right
+from typing import Dict
+
+import numpy as np
+
+# Hedge errors at or below this many shares are left alone
+DEAD_BAND = 0.01
+
+# Initial window for the run searches; doubles while nothing is found
+_SEARCH_WINDOW = 256
+
+# Rows past a dead-band skip compared one at a time before searching in windows
+_SKIP_SCAN = 4
+
+# With more than one skip per this many rows, walking the rows one by one is cheaper
+_DENSE_SKIPS = 8
+
+
+def hedge_units(delta: np.ndarray, position_size: np.ndarray) -> np.ndarray:
+    """Array version of DeltaHedger.calculate_hedge_units"""
+    return -delta * position_size * 100
+
+
+def _first_hit(condition, lo: int, hi: int) -> int:
+    """First index in [lo, hi) where condition(lo, hi) is true, else hi.
+
+    The condition is evaluated over doubling windows so finding a hit costs
+    time proportional to its distance from lo, not to the remaining length.
+    """
+    size = _SEARCH_WINDOW
+    while lo < hi:
+        end = min(hi, lo + size)
+        hits = np.flatnonzero(condition(lo, end))
+        if len(hits):
+            return lo + int(hits[0])
+        lo = end
+        size *= 2
+    return hi
+
+
+def _walk_rows(target: np.ndarray, held: float, band: float) -> np.ndarray:
+    """The sequential rule row by row, for targets that keep stepping inside the band"""
+    trade = np.zeros(len(target), dtype=bool)
+    for row, value in enumerate(target.tolist()):
+        if abs(value - held) > band:
+            trade[row] = True
+            held = value
+    return trade
+
+
+def find_trades(target: np.ndarray, held: float, band: float = DEAD_BAND) -> np.ndarray:
+    """Boolean mask of the rows that trade when tracking `target` from `held`.
+
+    Matches the sequential rule exactly: a row trades when it is more than
+    `band` shares away from the currently held position, which then becomes
+    the row's target. While every row trades (or repeats its predecessor's
+    target) the held position is simply the previous target, so such a run
+    is decided by each row's step from the previous one. A run ends at a
+    skip, a row inside the band with a different target.
+
+    After a skip the next run starts on the following row unless that row is
+    also inside the band around the held position. Those slow skips are the
+    only ones searched one at a time; the rest are resolved in one pass.
+    Consecutive skips chain: a run starting on a skipped row ends at the
+    next one, so within a block of consecutive skips every other one ends a
+    run, counted from where the chain enters the block.
+    """
+    n = len(target)
+    step = np.abs(np.diff(target))
+    skips = np.flatnonzero((step <= band) & (step != 0)) + 1
+    if len(skips) * _DENSE_SKIPS > n:
+        return _walk_rows(target, held, band)
+
+    trade = np.zeros(n, dtype=bool)
+    start = _first_hit(lambda a, b: np.abs(target[a:b] - held) > band, 0, n)
+    if start == n:
+        return trade
+    trade[start + 1:] = step[start:] > band
+
+    count = len(skips)
+    after = np.minimum(skips + 1, n - 1)
+    fast = (skips + 1 >= n) | (np.abs(target[after] - target[skips - 1]) > band)
+    index = np.arange(count)
+    block_first = np.ones(count, dtype=bool)
+    block_first[1:] = np.diff(skips) > 1
+    block_start = np.maximum.accumulate(np.where(block_first, index, 0))
+    block_end = np.empty(count, dtype=np.int64)
+    block_end[block_first] = np.append(np.flatnonzero(block_first)[1:], count)
+    block_end = block_end[block_start]
+    # Skips ending a run when the chain enters each block at its first skip
+    ends = (index - block_start) % 2 == 0
+    slow = np.flatnonzero(ends & ~fast).tolist()
+    skip_rows = skips.tolist()
+
+    # Ranges of skips where a search moved the chain off that parity or past them
+    flip_from, flip_to = [], []
+    drop_from, drop_to = [0], []
+    starts, quiet_from, quiet_to = [start], [], []
+    k = bisect_right(skip_rows, start)
+    drop_to.append(k)
+    while k < count:
+        end = int(block_end[k])
+        stop = None
+        if not ends[k]:
+            hits = np.flatnonzero(~fast[k:end:2])
+            last = k + 2 * int(hits[0]) if len(hits) else end
+            flip_from.append(k)
+            flip_to.append(min(last + 1, end))
+            if len(hits):
+                stop = last
+        if stop is None:
+            i = bisect_left(slow, k if ends[k] else end)
+            if i == len(slow):
+                break
+            stop = slow[i]
+
+        # Past a slow skip the held position stays at the previous target
+        # until a row leaves the band around it
+        row = skip_rows[stop]
+        held = target[row - 1]
+        next_start, limit = row + 2, min(n, row + 2 + _SKIP_SCAN)
+        while next_start < limit and abs(target[next_start] - held) <= band:
+            next_start += 1
+        if next_start == limit < n:
+            next_start = _first_hit(lambda a, b: np.abs(target[a:b] - held) > band, limit, n)
+        quiet_from.append(row + 1)
+        quiet_to.append(next_start)
+        k = bisect_right(skip_rows, next_start, k)
+        drop_from.append(stop + 1)
+        drop_to.append(k)
+        if next_start == n:
+            break
+        starts.append(next_start)
+
+    def ranges(lo, hi, size):
+        return np.cumsum(np.bincount(lo, minlength=size + 1) - np.bincount(hi, minlength=size + 1))[:size] > 0
+
+    ends ^= ranges(flip_from, flip_to, count)
+    ends &= ~ranges(drop_from, drop_to, count)
+    after_skip = skips[ends & fast] + 1
+    trade &= ~ranges(quiet_from, quiet_to, n)
+    trade[after_skip[after_skip < n]] = True
+    trade[starts] = True
+    return trade
+
+
+def replay_hedge(delta: np.ndarray, position_size: np.ndarray, price: np.ndarray,
+                 held: float, capital: float, fixed_cost: float = 0.0,
+                 percentage_cost: float = 0.0, band: float = DEAD_BAND) -> Dict[str, np.ndarray]:
+    """Replay the hedging rule over whole arrays of option ticks.
+
+    Starts from `held` shares and `capital` and returns per-row arrays:
+    stock_position and capital after each row, plus the trade mask and each
+    row's adjustment and fee (zero where no trade happened).
+    """
+    target = hedge_units(delta, position_size)
+    trade = find_trades(target, held, band)
+
+    # Held position after each row is the target of the most recent trade
+    last = np.maximum.accumulate(np.where(trade, np.arange(len(target)), -1))
+    stock_position = np.where(last >= 0, target[np.maximum(last, 0)], held)
+    held_before = np.concatenate(([held], stock_position[:-1]))
+
+    adjustment = np.where(trade, target - held_before, 0.0)
+    fee = np.where(trade, fixed_cost + np.abs(adjustment) * price * percentage_cost, 0.0)
+    capital = capital - np.cumsum(adjustment * price + fee)
+    return {
+        'stock_position': stock_position,
+        'capital': capital,
+        'trade': trade,
+        'adjustment': adjustment,
+        'fee': fee
+    }
@@ -0,0 +1,139 @@
+# events.py - In-process publish/subscribe for live dashboard updates
+import json
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+# Events a subscriber may fall behind by before its backlog is replaced by a reset
+SUBSCRIBER_BACKLOG = 256
+
+# Seconds between keep-alive comments on an idle stream
+KEEPALIVE_SECONDS = 15
+
+# Seconds between on_idle calls while a stream waits for events
+IDLE_POLL_SECONDS = 1
+
+# Live-update streams one process keeps open at once; each holds a server
+# thread while it is open, so this stays below the threads per worker
+# (gunicorn.conf.py sets it from there)
+MAX_STREAMS = int(os.environ.get('MAX_STREAMS', 4))
+
+# Milliseconds a client turned away at MAX_STREAMS waits before reconnecting
+BUSY_RETRY_MS = 30000
+
+
+class StreamSlots:
+    """Counts the open streams of this process against a limit"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.open = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        """Take a slot for a new stream; False when all of them are in use"""
+        with self._lock:
+            if self.open >= self.limit:
+                return False
+            self.open += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self.open = max(0, self.open - 1)
+
+
+# Shared by every hedger and book of the process: they all draw on the same threads
+stream_slots = StreamSlots(MAX_STREAMS)
+
+
+class EventBus:
+    """Fan out events to every subscribed stream.
+
+    Each subscriber gets its own bounded queue, so publishing never blocks on
+    a slow client; a subscriber that falls too far behind is sent a single
+    'reset' event instead of its backlog and reloads in full.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: List[queue.Queue] = []
+
+    def __bool__(self) -> bool:
+        return bool(self._subscribers)
+
+    def subscribe(self) -> queue.Queue:
+        subscriber = queue.Queue(maxsize=SUBSCRIBER_BACKLOG)
+        with self._lock:
+            self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: queue.Queue) -> None:
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def publish(self, event: str, data: Dict, event_id: Optional[int] = None) -> None:
+        message = format_event(event, data, event_id)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                _drain(subscriber)
+                try:
+                    subscriber.put_nowait(format_event('reset', {}, event_id))
+                except queue.Full:
+                    pass
+
+    def stream(self, subscriber: queue.Queue, on_idle: Optional[Callable[[], None]] = None):
+        """Yield Server-Sent Events text for one subscriber until the client goes away.
+
+        `on_idle` is called every IDLE_POLL_SECONDS without events, e.g. to
+        look for changes made outside this process (which it then publishes).
+        """
+        try:
+            yield 'retry: 3000\n\n'
+            timeout = KEEPALIVE_SECONDS if on_idle is None else IDLE_POLL_SECONDS
+            last_sent = time.monotonic()
+            while True:
+                try:
+                    yield subscriber.get(timeout=timeout)
+                    last_sent = time.monotonic()
+                except queue.Empty:
+                    if on_idle is not None:
+                        on_idle()
+                    if time.monotonic() - last_sent >= KEEPALIVE_SECONDS:
+                        yield ': keep-alive\n\n'
+                        last_sent = time.monotonic()
+        finally:
+            self.unsubscribe(subscriber)
+
+
+def busy_stream() -> str:
+    """A stream that only asks the client to reconnect later, for when every slot is taken.
+
+    EventSource gives up for good on an error status, but reconnects after
+    `retry` once an event stream ends.
+    """
+    return f"retry: {BUSY_RETRY_MS}\n\n"
+
+
+def format_event(event: str, data: Dict, event_id: Optional[int] = None) -> str:
+    """One Server-Sent Events message"""
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return '\n'.join(lines) + '\n\n'
+
+
+def _drain(subscriber: queue.Queue) -> None:
+    try:
+        while True:
+            subscriber.get_nowait()
+    except queue.Empty:
+        pass
@@ -0,0 +1,28 @@
+# gunicorn.conf.py - Production server settings (gunicorn -c gunicorn.conf.py)
+import multiprocessing
+import os
+
+# The app is built once in the master, so the imports and data load are
+# paid once and the workers fork with them already in memory; workers then
+# keep in step through the data files (see DeltaHedger.sync)
+wsgi_app = 'app:create_app()'
+preload_app = True
+
+bind = os.environ.get('BIND', '127.0.0.1:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+
+# Threads per worker. An open live-update stream (/api/events) holds a
+# thread for as long as its page stays open, so each worker keeps at most
+# MAX_STREAMS of them (half its threads unless set) and tells further
+# clients to reconnect later; the other threads stay free for requests
+worker_class = 'gthread'
+threads = int(os.environ.get('THREADS', 8))
+os.environ.setdefault('MAX_STREAMS', str(max(1, threads // 2)))
+timeout = 120
+
+
+def worker_exit(server, worker):
+    """Snapshot the books this worker loaded, so their journals don't grow across restarts"""
+    app = getattr(worker, 'wsgi', None)  # unset if the worker died before loading the app
+    if app is not None:
+        app.extensions['delta_hedging']['books'].flush_all()
@@ -1,34 +1,171 @@
 # hedger.py - DeltaHedger class
-import pandas as pd
 import numpy as np
-import json
+import logging
 import os
 import datetime as dt
-from dataclasses import dataclass, asdict
+import threading
+from collections import deque
+from contextlib import contextmanager
 from typing import List, Dict, Optional, Tuple
-import plotly.graph_objects as go
-import plotly.express as px
-from plotly.subplots import make_subplots
 
 # Import OptionData class
-from app import OptionData
+from models import OptionData
+from store import ColumnStore, DateIndex, ordinals_to_datetime64, OPTION_SCHEMA, HISTORY_SCHEMA, TRANSACTION_SCHEMA, CHECKPOINT_SCHEMA, TRADE_TOTALS
+from analytics import DEFAULT_WINDOW, RollingAnalytics
+from engine import replay_hedge
+from events import EventBus
+from downsample import downsample
+from pricing import missing_greeks
+from journal import Journal
+from locks import FileLock, RWLock
+from metrics import HEDGERS, timed
+from serialize import ResponseCache
+from storage import open_backend
+
+logger = logging.getLogger(__name__)
+
+# Number of history rows between replay checkpoints
+CHECKPOINT_INTERVAL = 1024
+
+# Option rows handed to the replay engine at a time
+REPLAY_CHUNK = 65536
+
+# The journal is compacted into a snapshot once it outgrows both of these
+SNAPSHOT_MIN_BYTES = 1 << 20
+
+# Default points per dashboard chart; longer histories are downsampled
+PLOT_POINTS = 2000
+
+# Plot payloads kept for the current version (full view plus zoomed ranges)
+PLOT_CACHE_SIZE = 16
+
+# Rows sent inline with a live update; larger changes are announced as a reset
+EVENT_MAX_ROWS = 1000
+
+# Versions remembered for incremental chart updates
+VERSION_LOG_SIZE = 1024
+
+# Tolerances of check_aggregates (maintained and recomputed sums add in different orders)
+AGGREGATE_RTOL = 1e-9
+AGGREGATE_ATOL = 1e-6
+
+
+def trade_totals(columns: Dict[str, np.ndarray], ends=None) -> Dict[str, np.ndarray]:
+    """TRADE_TOTALS of the first ends[i] rows of encoded transaction columns, for each i.
+
+    Without ends, the totals of every row (arrays of length one). Each
+    measure is one bincount keyed by (segment, action) and a cumsum over
+    the segments, so checkpoints cost a pass over the trades, not per total.
+    """
+    actions = TRANSACTION_SCHEMA['action']
+    if ends is None:
+        segments, count = 1, len(columns['action'])
+        key = columns['action']
+        totals = {'fees': np.array([columns['transaction_fee'].sum()])}
+    else:
+        segments, count = len(ends), int(ends[-1]) if len(ends) else 0
+        segment = np.repeat(np.arange(segments), np.diff(ends, prepend=0))
+        key = segment * len(actions) + columns['action'][:count]
+        totals = {'fees': np.cumsum(np.bincount(segment, columns['transaction_fee'][:count], segments))}
+    for measure, weights in (('trades', None), ('shares', columns['shares']), ('notional', columns['cost'])):
+        weights = None if weights is None else weights[:count]
+        sums = np.bincount(key, weights, segments * len(actions)).reshape(segments, len(actions))
+        if segments > 1:
+            sums = np.cumsum(sums, axis=0)
+        for code, action in enumerate(actions):
+            totals[f"{action.lower()}_{measure}"] = sums[:, code]
+    return totals
+
 
 class DeltaHedger:
-    def __init__(self, filename):
-        self.options_data: List[OptionData] = []
-        self.position_history: List[Dict] = []
+    def __init__(self, filename, backend=None):
+        self.options_data = ColumnStore(OPTION_SCHEMA, record_type=OptionData)
+        self.position_history = ColumnStore(HISTORY_SCHEMA)
         self.current_stock_units: float = 0
-        self.stock_transactions: List[Dict] = []
+        self.stock_transactions = ColumnStore(TRANSACTION_SCHEMA)
         self.initial_capital: Optional[float] = None
         self.current_capital: float = 0
         self.transaction_costs: Dict = {'stock_fixed': 0, 'stock_percentage': 0}
         self.filename = filename
+
+        # Sums over stock_transactions (TRADE_TOTALS) and the option position's
+        # mark-to-market P&L, kept up to date by every change (see check_aggregates)
+        self.totals: Dict[str, float] = dict.fromkeys(TRADE_TOTALS, 0.0)
+        self.option_pnl: float = 0.0
+
+        # Replay state snapshots and the pending (lo, hi, shift) edit range
+        self._checkpoints = ColumnStore(CHECKPOINT_SCHEMA)
+        self._dirty: Optional[Tuple[int, int, int]] = None
+
+        # Changes are appended to the journal; the backend holds the last snapshot
+        self._backend = backend or open_backend(filename)
+        self._journal = Journal(os.path.splitext(filename)[0] + '.journal')
+        self._snapshot_bytes = 0
+        self._replaying = False
+
+        # Worker processes sharing the data files coordinate through a lock
+        # file and catch up on each other's changes (see sync)
+        self._file_lock = FileLock(os.path.splitext(filename)[0] + '.lock')
+        self._backend_token = None
+
+        # Bumped on every mutation; derived views such as the plots are cached per version
+        self.version = 0
+        self._plot_cache: Dict[Tuple, Optional[Dict]] = {}
+        self._plot_cache_version = 0
+        self._plot_lock = threading.Lock()
+
+        # Serialized API responses by version; versions restart with every
+        # instance, so ETags also carry a per-instance tag (see etag_prefix)
+        self.responses = ResponseCache()
+        self._etag_tag = os.urandom(4).hex()
+
+        # Counters read by the /metrics scrape
+        self.metrics_label = os.path.basename(os.path.splitext(filename)[0])
+        self.plot_cache_hits = 0
+        self.plot_cache_misses = 0
+        self.snapshot_bytes_written = 0
+        self.journal_entries_skipped = 0
+        HEDGERS[self.metrics_label] = self
+
+        # Routes read under lock.read() (see reading) and mutate under lock.write()
+        self.lock = RWLock()
+
+        # Date-ordered views for range queries and paging
+        self._date_indexes = {
+            'position_history': DateIndex(self.position_history),
+            'stock_transactions': DateIndex(self.stock_transactions)
+        }
+
+        # Rolling risk analytics, extended as ticks arrive
+        self.analytics = RollingAnalytics(self.position_history, self.options_data)
         
+        # Live update subscribers and the state they were last told about
+        self.events = EventBus()
+        self._published: Tuple = ()
+
+        # (version, history generation, history length) of recent versions
+        self._version_log: deque = deque(maxlen=VERSION_LOG_SIZE)
+
         # Load data if exists
-        self.load_data()
+        with self._file_lock.exclusive():
+            self.load_data()
+        self._published = self._publish_marks()
+        self._log_version()
         
     def add_stock_position(self, date, price, position_type, shares):
         """Add a direct stock position (long or short)"""
+        # Check everything before any state changes, so a bad position is never journaled
+        if not isinstance(date, dt.date):
+            raise ValueError("date must be a date")
+        if position_type not in ('LONG', 'SHORT'):
+            raise ValueError(f"position_type must be LONG or SHORT, not {position_type!r}")
+        if not (np.isfinite(price) and price > 0):
+            raise ValueError("price must be a positive number")
+        if not (np.isfinite(shares) and shares > 0):
+            raise ValueError("shares must be a positive number")
+        self.apply_pending_edits()
+        self._maybe_checkpoint()
+
         # Convert shares to positive or negative based on position type
         actual_shares = shares if position_type == 'LONG' else -shares
         
@@ -44,130 +181,533 @@ class DeltaHedger:
         
         # Record the transaction
         transaction = {
-            'date': date.isoformat(),
+            'date': date,
             'shares': abs(actual_shares),
             'price': price,
             'action': position_type,
             'cost': position_cost,
             'transaction_fee': transaction_cost,
-            'type': 'MANUAL'  # Flag to indicate a manual position vs. a hedge adjustment
+            'type': 'MANUAL',  # Flag to indicate a manual position vs. a hedge adjustment
+            'row': len(self.position_history)
         }
         
         self.stock_transactions.append(transaction)
+        self._add_trade(transaction)
     
-    # Add to position history
-    if self.position_history:
-        latest = self.position_history[-1]
-        new_position = latest.copy()
-        new_position['date'] = date.isoformat()
-        new_position['stock_position'] = self.current_stock_units
-        new_position['capital'] = self.current_capital
-        new_position['transaction_type'] = 'MANUAL'
-        self.position_history.append(new_position)
-    else:
-        # If no history exists yet, create initial entry
-        self.position_history.append({
-            'date': date.isoformat(),
-            'underlying_price': price,
-            'iv': 0.0,
-            'delta': 0.0,
-            'stock_position': self.current_stock_units,
-            'capital': self.current_capital,
-            'transaction_type': 'MANUAL'
-        })
+        # Add to position history
+        if self.position_history:
+            new_position = self.position_history[-1]
+            new_position['date'] = date
+            new_position['stock_position'] = self.current_stock_units
+            new_position['capital'] = self.current_capital
+            new_position['transaction_type'] = 'MANUAL'
+            self.position_history.append(new_position)
+        else:
+            # If no history exists yet, create initial entry
+            self.position_history.append({
+                'date': date,
+                'underlying_price': price,
+                'iv': 0.0,
+                'delta': 0.0,
+                'stock_position': self.current_stock_units,
+                'capital': self.current_capital,
+                'transaction_type': 'MANUAL'
+            })
+        self._record('stock', date=date.isoformat(), price=price, position_type=position_type, shares=shares)
     
-    # Save data
-    self.save_data()
+        # Save data
+        self.save_data()
     
-    return {
-        "status": "success",
-        "message": f"{position_type} position: {shares} shares at ${price:.2f}",
-        "action": position_type,
-        "shares": shares,
-        "price": price,
-        "fee": transaction_cost
-    }
-        
-        # Load data if exists
-        self.load_data()
-        
+        return {
+            "status": "success",
+            "message": f"{position_type} position: {shares} shares at ${price:.2f}",
+            "action": position_type,
+            "shares": shares,
+            "price": price,
+            "fee": transaction_cost
+        }
+
+    @timed
     def add_option_data(self, option_data: OptionData) -> None:
         """Add new option data to the history"""
+        # Pending edits must be replayed before the new row is hedged
+        self.apply_pending_edits()
         self.options_data.append(option_data)
+        if not self._fill_greeks(len(self.options_data) - 1, len(self.options_data)):
+            self.options_data.truncate(len(self.options_data) - 1)
+            raise ValueError("Option price admits no implied volatility")
+        self.option_pnl += self._option_pnl(len(self.options_data) - 1, len(self.options_data))
         
+    @timed
     def edit_option_data(self, index: int, option_data: OptionData) -> None:
-        """Edit existing option data entry"""
+        """Edit existing option data entry (replayed lazily, see apply_pending_edits)"""
         if 0 <= index < len(self.options_data):
+            previous = self.options_data[index]
+            before = self._option_pnl(index, index + 2)
             self.options_data[index] = option_data
-            # Recalculate all position history after this point
-            self._recalculate_position_history(index)
+            if not self._fill_greeks(index, index + 1):
+                self.options_data[index] = previous
+                raise ValueError("Option price admits no implied volatility")
+            self.option_pnl += self._option_pnl(index, index + 2) - before
+            self._record('edit', index=index, option=self.options_data[index].to_dict())
+            self._mark_dirty(index, index + 1)
             return True
         return False
-            
-    def _recalculate_position_history(self, start_index: int) -> None:
-        """Recalculate position history after editing an entry"""
-        # Clear position history from this point forward
-        self.position_history = self.position_history[:start_index]
-        
-        # Reset to the state at start_index
-        if start_index > 0:
-            prev_position = self.position_history[start_index-1]
+
+    def delete_option_data(self, index: int) -> bool:
+        """Delete an option data entry (replayed lazily, see apply_pending_edits)"""
+        if 0 <= index < len(self.options_data):
+            self._record('delete', index=index)
+            before = self._option_pnl(index, index + 2)
+            self.options_data.pop(index)
+            self.option_pnl += self._option_pnl(index, index + 1) - before
+            # Rows after the deleted one now sit one position earlier
+            lo, hi, shift = self._dirty or (index, index, 0)
+            if hi > index:
+                hi -= 1
+            self._dirty = (min(lo, index), max(hi, index), shift + 1)
+            return True
+        return False
+
+    def set_initial_capital(self, initial_capital: float) -> None:
+        """Change the starting capital by shifting every recorded capital value"""
+        initial_capital = float(initial_capital)
+        # Edits made before the change are replayed under the old capital
+        self.apply_pending_edits()
+        self._record('capital', value=initial_capital)
+        if self.initial_capital is not None and self.position_history:
+            change = initial_capital - self.initial_capital
+            self.position_history.add_to_column('capital', change)
+            self._checkpoints.add_to_column('capital', change)
+            self.current_capital += change
+            self.initial_capital = initial_capital
+        else:
+            self.initial_capital = initial_capital
+            if self.options_data:
+                self._mark_dirty(0, 0)
+
+    def delete_transaction(self, index: int) -> bool:
+        """Delete a stock transaction and recalculate the history after it"""
+        if not 0 <= index < len(self.stock_transactions):
+            return False
+        self._record('delete_transaction', index=index)
+        self.apply_pending_edits()
+
+        # Remove the transaction, keeping its data
+        transaction = self.stock_transactions.delete(index)
+
+        # Replay from the trade's row: the hedge after it and any later manual trades follow
+        self._recalculate_position_history(start_row=transaction['row'])
+        return True
+
+    def _fill_greeks(self, start: int, end: int) -> bool:
+        """Compute missing iv and delta for option rows [start, end); False if any stay unsolved"""
+        columns = {name: column[start:end] for name, column in self.options_data.columns().items()}
+        rows, iv, delta = missing_greeks(columns)
+        if not len(rows):
+            return True
+        self.options_data.put('iv', start + rows, iv)
+        self.options_data.put('delta', start + rows, delta)
+        return not (np.isnan(iv).any() or np.isnan(delta).any())
+
+    def _mark_dirty(self, lo: int, hi: int) -> None:
+        """Extend the pending replay range [lo, hi) so several edits share one replay.
+
+        Rows from hi onward are unchanged inputs found `shift` rows later in
+        the old history (shift counts the deletes folded into the range).
+        """
+        shift = 0
+        if self._dirty:
+            old_lo, old_hi, shift = self._dirty
+            lo, hi = min(lo, old_lo), max(hi, old_hi)
+        self._dirty = (lo, hi, shift)
+
+    @contextmanager
+    def reading(self):
+        """Hold the read lock over an up-to-date state with no pending edits.
+
+        Catching up with other processes and applying edits both mutate the
+        state, so when either is needed the read runs under the write lock.
+        """
+        with self.lock.read():
+            if not self._dirty and not self.is_stale():
+                yield
+                return
+        with self.lock.write():
+            with self._file_lock.shared():
+                self.sync()
+            self.apply_pending_edits()
+            yield
+
+    @contextmanager
+    def writing(self):
+        """Exclusive access for a change, across threads and worker processes.
+
+        The change starts from the latest state any process committed and is
+        committed before another process can write.
+        """
+        with self.lock.write():
+            with self._file_lock.exclusive():
+                self.sync()
+                try:
+                    yield
+                finally:
+                    self.save_data()
+
+    def catch_up(self) -> None:
+        """Apply (and publish) changes other processes have committed, if any"""
+        if self.is_stale():
+            with self.reading():
+                pass
+
+    @property
+    def etag_prefix(self) -> str:
+        """Per instance and process: workers forked from a preloaded hedger
+        count versions independently, so they mustn't share ETags"""
+        return f"{self._etag_tag}{os.getpid():x}"
+
+    def is_stale(self) -> bool:
+        """Whether another process has committed changes this one hasn't applied"""
+        return self._journal.size != self._journal.offset or self._backend.token() != self._backend_token
+
+    @timed
+    def sync(self) -> None:
+        """Catch up with changes other processes committed to the shared data files.
+
+        A new snapshot means the journal was compacted, so the state is
+        reloaded (cheap with mapped columns); otherwise only the new journal
+        entries are replayed. Callers hold the write lock.
+        """
+        if self._backend.token() != self._backend_token:
+            self.load_data()
+        elif self._journal.size != self._journal.offset:
+            self._replay_journal(self._journal.read_new())
+        else:
+            return
+        self._publish_changes()
+
+    @timed
+    def apply_pending_edits(self) -> None:
+        """Replay the dirty range collected by edits and deletes, if any"""
+        if self._dirty:
+            lo, hi, shift = self._dirty
+            self._dirty = None
+            self._recalculate_position_history(lo, clean_from=hi, shift=shift)
+
+    def _maybe_checkpoint(self) -> None:
+        """Record replay state before every CHECKPOINT_INTERVAL-th history row"""
+        row = len(self.position_history)
+        if row and row % CHECKPOINT_INTERVAL == 0:
+            self._checkpoints.append({
+                'row': row,
+                'stock_units': self.current_stock_units,
+                'capital': self.current_capital,
+                'transactions': len(self.stock_transactions),
+                **self.totals
+            })
+
+    def _rebuild_checkpoints(self, from_row: int = 0) -> None:
+        """Recompute checkpoints at and after from_row from the stored rows"""
+        rows_kept = np.searchsorted(self._checkpoints.column('row'), from_row)
+        self._checkpoints.truncate(rows_kept)
+        first = max(CHECKPOINT_INTERVAL, -(-from_row // CHECKPOINT_INTERVAL) * CHECKPOINT_INTERVAL)
+        rows = np.arange(first, len(self.position_history), CHECKPOINT_INTERVAL)
+        if not len(rows):
+            return
+        transactions = np.searchsorted(self.stock_transactions.column('row'), rows)
+
+        # Totals carry on from the last kept checkpoint
+        base = self._checkpoints[rows_kept - 1] if rows_kept else dict.fromkeys(CHECKPOINT_SCHEMA, 0)
+        first_tx = int(base['transactions'])
+        trades = {name: column[first_tx:] for name, column in self.stock_transactions.columns().items()}
+        totals = {name: base[name] + sums for name, sums in trade_totals(trades, transactions - first_tx).items()}
+        self._checkpoints.extend({
+            'row': rows,
+            'stock_units': self.position_history.column('stock_position')[rows - 1],
+            'capital': self.position_history.column('capital')[rows - 1],
+            'transactions': transactions,
+            **totals
+        })
+
+    def _restore_state(self, row: int) -> None:
+        """Restore replay state as it was just before history row `row`.
+
+        Stock units and capital come from the previous history row; the trade
+        totals and transaction count start from the nearest checkpoint and only
+        scan the trades recorded since then.
+        """
+        checkpoints = self._checkpoints.column('row')
+        k = np.searchsorted(checkpoints, row) - 1
+        base = self._checkpoints[k] if k >= 0 else dict.fromkeys(CHECKPOINT_SCHEMA, 0)
+        start_tx = int(base['transactions'])
+        tx_rows = self.stock_transactions.column('row')
+        end_tx = start_tx + int(np.searchsorted(tx_rows[start_tx:], row))
+        self.totals = {name: float(base[name]) for name in TRADE_TOTALS}
+        self._add_trades(start_tx, end_tx)
+        self._checkpoints.truncate(k + 1)
+        self.stock_transactions.truncate(end_tx)
+        self.position_history.truncate(row)
+        if row > 0:
+            prev_position = self.position_history[row - 1]
             self.current_stock_units = prev_position['stock_position']
             self.current_capital = prev_position['capital']
+
+    def _hedge_rows(self) -> np.ndarray:
+        """History rows recorded by hedging option rows, one per option row in order.
+
+        Manual trades add rows of their own, so option indices only map onto
+        history rows through these.
+        """
+        hedge = HISTORY_SCHEMA['transaction_type'].index('HEDGE')
+        return np.flatnonzero(self.position_history.column('transaction_type') == hedge)
+
+    @timed
+    def _recalculate_position_history(self, start_index: int = 0, clean_from: Optional[int] = None,
+                                      shift: int = 0, start_row: Optional[int] = None) -> None:
+        """Recalculate position history after editing an entry.
+
+        Replays option rows from start_index on (or everything from history
+        row start_row on), re-applying the manual trades recorded in between
+        after the same option rows as before. When clean_from is given, option
+        rows from there on are unchanged and sit `shift` rows later in the old
+        history. As soon as the replayed hedge matches the old one on such a
+        row, the old tail is reused with its capital shifted instead of being
+        replayed.
+        """
+        hedge_rows = self._hedge_rows()
+        if start_row is None:
+            start_index = max(0, min(start_index, len(self.options_data), len(hedge_rows)))
+            start_row = int(hedge_rows[start_index - 1]) + 1 if start_index else 0
         else:
-            # If editing the first entry, use initial values
-            latest = self.options_data[0]
-            self.current_stock_units = self.calculate_hedge_units(latest.delta, latest.position_size)
-            if self.initial_capital is None:
-                self.initial_capital = 100000  # Default value
-            self.current_capital = self.initial_capital - (self.current_stock_units * latest.underlying_price)
-                
-        # Recalculate each position from start_index onward
-        for i in range(start_index, len(self.options_data)):
-            option_data = self.options_data[i]
-            new_hedge_units = self.calculate_hedge_units(option_data.delta, option_data.position_size)
-            
-            # Calculate adjustment needed
-            adjustment = new_hedge_units - self.current_stock_units
-            
-            if abs(adjustment) > 0.01:  # Only adjust if meaningful change
-                # Update capital and position
-                transaction_cost = self._calculate_transaction_cost(adjustment, option_data.underlying_price)
-                self.current_capital -= (adjustment * option_data.underlying_price + transaction_cost)
-                self.current_stock_units = new_hedge_units
-                
-                if i > 0:  # Skip recording transaction for initial position
-                    action = "BUY" if adjustment > 0 else "SELL"
-                    self.stock_transactions.append({
-                        'date': option_data.date.isoformat(),
-                        'shares': abs(adjustment),
-                        'price': option_data.underlying_price,
-                        'action': action,
-                        'cost': abs(adjustment) * option_data.underlying_price,
-                        'transaction_fee': transaction_cost
-                    })
-            
-            # Record the position
-            self.position_history.append({
-                'date': option_data.date.isoformat(),
-                'underlying_price': option_data.underlying_price,
-                'iv': option_data.iv,
-                'delta': option_data.delta,
-                'stock_position': self.current_stock_units,
-                'capital': self.current_capital
-            })
-            
+            start_row = max(0, min(start_row, len(self.position_history)))
+            start_index = min(int(np.searchsorted(hedge_rows, start_row)), len(self.options_data))
+
+        # Manual trades from start_row on, and how many option rows are hedged before each
+        actions = TRANSACTION_SCHEMA['action']
+        old_tx = self.stock_transactions.columns()
+        manual = np.isin(old_tx['action'], (actions.index('LONG'), actions.index('SHORT')))
+        first_tx = int(np.searchsorted(old_tx['row'], start_row))
+        trades = [self.stock_transactions[i] for i in first_tx + np.flatnonzero(manual[first_tx:])]
+        rows = [self.position_history[trade['row']] for trade in trades]
+        hedged = np.searchsorted(hedge_rows, [trade['row'] for trade in trades]).astype(np.int64)
+        anchors = np.minimum(np.maximum(start_index, hedged - shift), len(self.options_data))
+
+        # Keep the old tail around when its hedge rows map one-to-one onto options_data
+        can_splice = (clean_from is not None and clean_from < len(self.options_data)
+                      and len(hedge_rows) == len(self.options_data) + shift)
+        if can_splice:
+            tail_row = int(hedge_rows[clean_from + shift])
+            old_rows = {name: column[tail_row:].copy() for name, column in self.position_history.columns().items()}
+            # Positions in old_rows of the hedge rows of options clean_from onward
+            old_hedge = hedge_rows[clean_from + shift:] - tail_row
+            tail_tx = int(np.searchsorted(old_tx['row'], tail_row))
+            manual_tail = manual[tail_tx:]
+            old_tx = {name: column[tail_tx:].copy() for name, column in old_tx.items()}
+            old_tx['row'] -= tail_row
+            # Old hedge trades priced under other transaction costs are replayed, not reused
+            fees = (self.transaction_costs['stock_fixed']
+                    + old_tx['shares'] * old_tx['price'] * self.transaction_costs['stock_percentage'])
+            stale = np.flatnonzero(~manual_tail & ~np.isclose(fees, old_tx['transaction_fee']))
+            converge_from = clean_from
+            if len(stale):
+                converge_from += int(np.searchsorted(old_hedge, old_tx['row'][stale[-1]]))
+
+        self._fill_greeks(start_index, len(self.options_data))
+        self._restore_state(start_row)
+        if start_row == 0:
+            self.current_stock_units = 0
+            self.current_capital = self.initial_capital or 0
+
+        # Replay the rest in vectorized chunks broken at the manual trades,
+        # stopping early once the hedge converges back onto the old history
+        end_index = len(self.options_data)
+        pos, next_trade = start_index, 0
+        while True:
+            while next_trade < len(trades) and anchors[next_trade] <= pos:
+                self._apply_manual_trade(trades[next_trade], rows[next_trade])
+                next_trade += 1
+            if pos >= end_index:
+                break
+            end = min(end_index, pos + REPLAY_CHUNK)
+            if next_trade < len(trades):
+                end = min(end, int(anchors[next_trade]))
+            if not self.position_history:
+                # The first option row opens the hedge
+                self._open_initial_hedge(self.options_data[pos])
+            result = self._replay_options(pos, end)
+            count = end - pos
+            converged = False
+            if can_splice and end > converge_from:
+                first = max(pos, converge_from)
+                old_position = old_rows['stock_position'][old_hedge[first - clean_from:end - clean_from]]
+                same = np.flatnonzero(result['stock_position'][first - pos:] == old_position)
+                if len(same):
+                    count = first - pos + int(same[0]) + 1
+                    converged = True
+            self._append_replayed(pos, result, count)
+            pos += count
+            if converged:
+                self._splice_tail(old_rows, old_tx, int(old_hedge[pos - 1 - clean_from]) + 1)
+                break
+        self._rebuild_checkpoints(start_row)
+
+    def _apply_manual_trade(self, trade: Dict, row: Dict) -> None:
+        """Re-apply a recorded manual trade and its history row at the end of the history"""
+        self.current_stock_units += trade['shares'] if trade['action'] == 'LONG' else -trade['shares']
+        self.current_capital -= trade['cost'] + trade['transaction_fee']
+        trade['row'] = len(self.position_history)
+        self.stock_transactions.append(trade)
+        self._add_trade(trade)
+        row['stock_position'] = self.current_stock_units
+        row['capital'] = self.current_capital
+        self.position_history.append(row)
+
+    def _open_initial_hedge(self, option_data: OptionData) -> None:
+        """Set up the initial hedge for the first option row"""
+        self.current_stock_units = self.calculate_hedge_units(option_data.delta, option_data.position_size)
+        if self.initial_capital is None:
+            self.initial_capital = 100000  # Default value
+        self.current_capital = self.initial_capital - (self.current_stock_units * option_data.underlying_price)
+
+    def _replay_options(self, start: int, end: int) -> Dict:
+        """Run the replay engine over option rows [start, end) from the current state"""
+        options = self.options_data
+        return replay_hedge(options.column('delta')[start:end],
+                            options.column('position_size')[start:end],
+                            options.column('underlying_price')[start:end],
+                            self.current_stock_units, self.current_capital,
+                            self.transaction_costs['stock_fixed'],
+                            self.transaction_costs['stock_percentage'])
+
+    @timed
+    def ingest_options(self, columns: Dict[str, np.ndarray]) -> Dict:
+        """Append a batch of encoded option rows and hedge them in one vectorized pass.
+
+        Equivalent to add_option_data + update_hedge per row. The batch is not
+        journaled: callers commit bulk loads with snapshot() once they are done.
+        """
+        self.apply_pending_edits()
+        self.version += 1
+        start = len(self.options_data)
+        first_row = len(self.position_history)
+        self.options_data.extend(columns)
+        self._fill_greeks(start, len(self.options_data))
+        self.option_pnl += self._option_pnl(start, len(self.options_data))
+        if not self.position_history and len(self.options_data) > start:
+            self._open_initial_hedge(self.options_data[start])
+
+        summary = {"rows": len(self.options_data) - start, "trades": 0,
+                   "shares_bought": 0.0, "shares_sold": 0.0, "fees": 0.0}
+        pos = start
+        while pos < len(self.options_data):
+            end = min(len(self.options_data), pos + REPLAY_CHUNK)
+            result = self._replay_options(pos, end)
+            self._append_replayed(pos, result, end - pos)
+            adjustment = result['adjustment']
+            summary["trades"] += int(result['trade'].sum())
+            summary["shares_bought"] += float(adjustment[adjustment > 0].sum())
+            summary["shares_sold"] -= float(adjustment[adjustment < 0].sum())
+            summary["fees"] += float(result['fee'].sum())
+            pos = end
+        self._rebuild_checkpoints(first_row)
+        return summary
+
+    def _append_replayed(self, start: int, result: Dict, count: int) -> None:
+        """Append the first `count` rows of an engine replay of options from `start`"""
+        options = self.options_data
+        rows = slice(start, start + count)
+        first_row = len(self.position_history)
+        self.position_history.extend({
+            'date': options.column('date')[rows],
+            'underlying_price': options.column('underlying_price')[rows],
+            'iv': options.column('iv')[rows],
+            'delta': options.column('delta')[rows],
+            'stock_position': result['stock_position'][:count],
+            'capital': result['capital'][:count]
+        })
+
+        first_tx = len(self.stock_transactions)
+        trades = np.flatnonzero(result['trade'][:count])
+        adjustment = result['adjustment'][trades]
+        price = options.column('underlying_price')[start + trades]
+        actions = TRANSACTION_SCHEMA['action']
+        self.stock_transactions.extend({
+            'date': options.column('date')[start + trades],
+            'shares': np.abs(adjustment),
+            'price': price,
+            'action': np.where(adjustment > 0, actions.index('BUY'), actions.index('SELL')),
+            'cost': np.abs(adjustment) * price,
+            'transaction_fee': result['fee'][trades],
+            'row': first_row + trades
+        })
+        self._add_trades(first_tx)
+        self.current_stock_units = float(result['stock_position'][count - 1])
+        self.current_capital = float(result['capital'][count - 1])
+
+    def _splice_tail(self, old_rows: Dict, old_tx: Dict, offset: int) -> None:
+        """Append the unchanged old tail from old_rows[offset] on once the replay has converged onto it.
+
+        old_tx holds the old trades from the first old row on, with rows counted from there.
+        """
+        row = len(self.position_history)
+        change = self.current_capital - old_rows['capital'][offset - 1]
+        tail = {name: column[offset:] for name, column in old_rows.items()}
+        if not len(tail['capital']):
+            return
+        tail['capital'] = tail['capital'] + change
+        self.position_history.extend(tail)
+
+        # Trades on the reused rows move with them
+        tx_tail = {name: column[np.searchsorted(old_tx['row'], offset):] for name, column in old_tx.items()}
+        tx_tail['row'] = tx_tail['row'] - offset + row
+        first_tx = len(self.stock_transactions)
+        self.stock_transactions.extend(tx_tail)
+        self._add_trades(first_tx)
+        self.current_stock_units = float(tail['stock_position'][-1])
+        self.current_capital = float(tail['capital'][-1])
+
+    def _add_trade(self, transaction: Dict) -> None:
+        """Add one trade record, as appended to stock_transactions, to the trade totals"""
+        action = transaction['action'].lower()
+        self.totals['fees'] += transaction['transaction_fee']
+        self.totals[f"{action}_trades"] += 1
+        self.totals[f"{action}_shares"] += transaction['shares']
+        self.totals[f"{action}_notional"] += transaction['cost']
+
+    def _add_trades(self, start: int, end: Optional[int] = None) -> None:
+        """Add stock_transactions [start, end) to the trade totals"""
+        trades = {name: column[start:end] for name, column in self.stock_transactions.columns().items()}
+        for name, sums in trade_totals(trades).items():
+            self.totals[name] += float(sums[0])
+
+    def _option_pnl(self, lo: int, hi: int) -> float:
+        """Mark-to-market P&L of the option position over option rows [lo, hi).
+
+        Row i earns the position held at row i - 1 times the option price
+        change, so an edited row only touches its own and the next row's share.
+        """
+        price = self.options_data.column('option_price')
+        size = self.options_data.column('position_size')
+        lo, hi = max(lo, 1), min(hi, len(price))
+        if hi <= lo:
+            return 0.0
+        return float((np.diff(price[lo - 1:hi]) * size[lo - 1:hi - 1]).sum() * 100)
+
     def _calculate_transaction_cost(self, shares: float, price: float) -> float:
         """Calculate transaction cost based on settings"""
         volume = abs(shares) * price
         return self.transaction_costs['stock_fixed'] + (volume * self.transaction_costs['stock_percentage'])
             
+    @timed
     def update_hedge(self) -> Tuple[float, float, Dict]:
         """Update hedge based on latest option data"""
         if not self.options_data:
             return 0, 0, {"status": "error", "message": "No option data available"}
-            
+
+        self.apply_pending_edits()
+        self._maybe_checkpoint()
         latest = self.options_data[-1]
+        self._record('tick', option=latest.to_dict())
         
         # For the first entry, set initial position if not already set
         if len(self.position_history) == 0:
@@ -202,14 +742,17 @@ class DeltaHedger:
                 self.current_capital -= (adjustment * latest.underlying_price + transaction_cost)
                 self.current_stock_units = new_hedge_units
                 
-                self.stock_transactions.append({
-                    'date': latest.date.isoformat(),
+                transaction = {
+                    'date': latest.date,
                     'shares': abs(adjustment),
                     'price': latest.underlying_price,
                     'action': action,
                     'cost': abs(adjustment) * latest.underlying_price,
-                    'transaction_fee': transaction_cost
-                })
+                    'transaction_fee': transaction_cost,
+                    'row': len(self.position_history)
+                }
+                self.stock_transactions.append(transaction)
+                self._add_trade(transaction)
                 
                 result = {
                     "status": "success",
@@ -228,7 +771,7 @@ class DeltaHedger:
                 }
                 
         self.position_history.append({
-            'date': latest.date.isoformat(),
+            'date': latest.date,
             'underlying_price': latest.underlying_price,
             'iv': latest.iv,
             'delta': latest.delta,
@@ -248,26 +791,53 @@ class DeltaHedger:
         # For a long option position, we need to take the opposite position in stock
         return -delta * num_options * 100
     
+    @timed
     def get_history_as_df(self):
         """Return position history as DataFrame"""
-        if not self.position_history:
-            return pd.DataFrame()
-            
-        df = pd.DataFrame(self.position_history)
-        df['date'] = pd.to_datetime(df['date'])
-        return df
+        self.apply_pending_edits()
+        return self.position_history.to_frame()
     
     def get_transactions_as_df(self):
         """Return stock transactions as DataFrame"""
-        if not self.stock_transactions:
-            return pd.DataFrame()
-            
-        df = pd.DataFrame(self.stock_transactions)
-        df['date'] = pd.to_datetime(df['date'])
-        return df
+        self.apply_pending_edits()
+        return self.stock_transactions.to_frame()
     
+    @timed
+    def query_rows(self, name: str, start: Optional[dt.date] = None, end: Optional[dt.date] = None,
+                   limit: Optional[int] = None, cursor: int = 0,
+                   descending: bool = False) -> Tuple[np.ndarray, Optional[int]]:
+        """Rows of position_history or stock_transactions dated from start to end.
+
+        Returns up to `limit` row numbers in date order (newest first when
+        descending) starting `cursor` rows into the range, and the cursor
+        of the next page (None on the last page). Uses bisection on a date
+        index, so the cost depends on the page size, not the history length.
+        Without a date range or descending order, rows come in storage
+        order, so a row's position is the index delete_transaction takes.
+        """
+        self.apply_pending_edits()
+        index = self._date_indexes[name]
+        by_date = start is not None or end is not None or descending
+        lo, hi = index.span(start, end) if by_date else (0, len(self.stores()[name]))
+        count = hi - lo - cursor if limit is None else min(limit, hi - lo - cursor)
+        count = max(count, 0)
+        if not by_date:
+            rows = np.arange(cursor, cursor + count)
+        elif descending:
+            rows = index.rows(hi - cursor - count, hi - cursor)[::-1]
+        else:
+            rows = index.rows(lo + cursor, lo + cursor + count)
+        next_cursor = cursor + count if cursor + count < hi - lo else None
+        return rows, next_cursor
+
+    @property
+    def cumulative_fees(self) -> float:
+        return self.totals['fees']
+
+    @timed
     def get_summary_data(self):
-        """Get summary statistics for the dashboard"""
+        """Get summary statistics for the dashboard (O(1): read off the running totals)"""
+        self.apply_pending_edits()
         if not self.position_history:
             return {
                 "current_stock": 0,
@@ -276,14 +846,13 @@ class DeltaHedger:
                 "pnl": 0,
                 "pnl_percent": 0,
                 "current_price": 0,
-                "latest_date": "N/A"
+                "latest_date": "N/A",
+                **self._pnl_breakdown(0.0)
             }
             
         latest = self.position_history[-1]
-        initial = self.position_history[0]
         
         # Calculate P&L
-        stock_pl = self.current_stock_units * (latest['underlying_price'] - initial['underlying_price'])
         capital_change = latest['capital'] - self.initial_capital if self.initial_capital else 0
         
         return {
@@ -293,21 +862,203 @@ class DeltaHedger:
             "pnl": capital_change,
             "pnl_percent": (capital_change / self.initial_capital * 100) if self.initial_capital else 0,
             "current_price": latest['underlying_price'],
-            "latest_date": latest['date']
+            "latest_date": latest['date'],
+            **self._pnl_breakdown(latest['underlying_price'])
+        }
+
+    def _pnl_breakdown(self, price: float) -> Dict:
+        """P&L split and trading activity from the running totals.
+
+        Stock P&L uses the average price method: shares bought and sold (the
+        opening hedge included) are matched at their average prices for the
+        realized part and the open remainder is marked at `price`.
+        """
+        totals = self.totals
+        bought, sold = totals['buy_shares'] + totals['long_shares'], totals['sell_shares'] + totals['short_shares']
+        bought_notional = totals['buy_notional'] + totals['long_notional']
+        sold_notional = totals['sell_notional'] + totals['short_notional']
+        turnover_shares, turnover_notional = bought + sold, bought_notional + sold_notional
+        if self.position_history:
+            # The opening hedge is the first history row's position, not a recorded trade
+            opening = self.position_history[0]
+            if opening['transaction_type'] == 'HEDGE':
+                units, opening_price = opening['stock_position'], opening['underlying_price']
+                if units > 0:
+                    bought, bought_notional = bought + units, bought_notional + units * opening_price
+                else:
+                    sold, sold_notional = sold - units, sold_notional - units * opening_price
+        average_buy = bought_notional / bought if bought else 0.0
+        average_sell = sold_notional / sold if sold else 0.0
+        held = bought - sold
+
+        option = self.options_data[-1] if self.options_data else None
+        counts = {action: int(totals[f"{action.lower()}_trades"]) for action in TRANSACTION_SCHEMA['action']}
+        return {
+            "realized_pnl": min(bought, sold) * (average_sell - average_buy),
+            "unrealized_stock_pnl": held * (price - (average_buy if held > 0 else average_sell)),
+            "option_mtm": self.option_pnl,
+            "option_value": option.option_price * option.position_size * 100 if option else 0,
+            "cumulative_fees": totals['fees'],
+            "turnover_shares": turnover_shares,
+            "turnover_notional": turnover_notional,
+            "trades_by_type": {"HEDGE": counts['BUY'] + counts['SELL'], "MANUAL": counts['LONG'] + counts['SHORT']},
+            "trades_by_action": counts
         }
+
+    def recompute_aggregates(self) -> Tuple[Dict[str, float], float]:
+        """Trade totals and option P&L recomputed from the full stores (O(n))"""
+        totals = {name: float(sums[0]) for name, sums in trade_totals(self.stock_transactions.columns()).items()}
+        return totals, self._option_pnl(0, len(self.options_data))
+
+    @timed
+    def check_aggregates(self) -> Dict:
+        """Verify the running totals against a full recompute"""
+        self.apply_pending_edits()
+        totals, option_pnl = self.recompute_aggregates()
+        recomputed = {**totals, 'option_pnl': option_pnl}
+        maintained = {**self.totals, 'option_pnl': self.option_pnl}
+        mismatches = {
+            name: {"maintained": maintained[name], "recomputed": value}
+            for name, value in recomputed.items()
+            if not np.isclose(maintained[name], value, rtol=AGGREGATE_RTOL, atol=AGGREGATE_ATOL)
+        }
+        if mismatches:
+            return {"status": "error", "message": f"{len(mismatches)} aggregates differ from a full recompute",
+                    "mismatches": mismatches}
+        return {"status": "success", "message": f"All {len(recomputed)} aggregates match a full recompute",
+                "transactions": len(self.stock_transactions), "option_rows": len(self.options_data)}
     
-    def generate_dashboard_plots(self):
-        """Generate JSON-serializable plot data for the dashboard"""
+    @timed
+    def rolling_analytics(self, window: int = DEFAULT_WINDOW, points: int = PLOT_POINTS,
+                          start: Optional[dt.date] = None, end: Optional[dt.date] = None) -> Optional[Dict]:
+        """Rolling volatility, hedge error and P&L attribution (see analytics.py).
+
+        Evaluated at up to `points` evenly spaced history rows dated from
+        start to end (0 for every row), each over the `window` rows ending
+        there. None when there are fewer than two history rows.
+        """
+        self.apply_pending_edits()
         if len(self.position_history) < 2:
             return None
-            
-        df = self.get_history_as_df()
+        index = self._date_indexes['position_history']
+        lo, hi = index.span(start, end)
+        if points and hi - lo > points:
+            rows = index.take(lo + np.unique(np.linspace(0, hi - lo - 1, points).round().astype(np.int64)))
+        else:
+            rows = index.rows(lo, hi)
+        dates = ordinals_to_datetime64(self.position_history.column('date')[rows])
+        analytics = {'window': window, 'x': dates.astype(str).tolist()}
+        for name, values in self.analytics.series(rows, window).items():
+            # NaN (e.g. no time elapsed in the window) is sent as null
+            values = values.astype(object)
+            values[values != values] = None
+            analytics[name] = values.tolist()
+        return analytics
+
+    @timed
+    def generate_dashboard_plots(self, points: int = PLOT_POINTS, start: Optional[dt.date] = None,
+                                 end: Optional[dt.date] = None):
+        """Generate JSON-serializable plot data for the dashboard (cached per version).
+
+        Charts show the history between start and end (inclusive dates),
+        downsampled to about `points` points each; 0 sends every point.
+        """
+        self.apply_pending_edits()
+        self._log_version()
+        with self._plot_lock:
+            if self._plot_cache_version != self.version:
+                self._plot_cache = {}
+                self._plot_cache_version = self.version
+            key = (points, start, end)
+            if key in self._plot_cache:
+                self.plot_cache_hits += 1
+            else:
+                self.plot_cache_misses += 1
+                if len(self._plot_cache) >= PLOT_CACHE_SIZE:
+                    self._plot_cache.pop(next(iter(self._plot_cache)))
+                plots = self._build_dashboard_plots(points, start, end)
+                if plots is not None:
+                    plots['version'] = self.version
+                self._plot_cache[key] = plots
+            return self._plot_cache[key]
+
+    @timed
+    def plot_delta(self, since: int) -> Dict:
+        """History points added since an earlier version, as columns for Plotly.extendTraces.
+
+        Sets 'reset' instead when that version's rows have been rewritten
+        since, the version is too old to be known, or more than PLOT_POINTS
+        rows were added.
+        """
+        self.apply_pending_edits()
+        self._log_version()
+        _, generation, length = self._version_log[-1]
+        for version, old_generation, old_length in reversed(self._version_log):
+            if version == since:
+                break
+        else:
+            return {'version': self.version, 'reset': True}
+        if old_generation != generation or length - old_length > PLOT_POINTS:
+            return {'version': self.version, 'reset': True}
+
+        history = self.position_history
+        rows = slice(old_length, length)
+        delta = {'version': self.version, 'reset': False,
+                 'x': [d.isoformat() for d in ordinals_to_datetime64(history.column('date')[rows]).astype(object)]}
+        for name in ('underlying_price', 'iv', 'delta', 'stock_position', 'capital'):
+            delta[name] = history.column(name)[rows].tolist()
+        return delta
+
+    def _log_version(self) -> None:
+        if not self._version_log or self._version_log[-1][0] != self.version:
+            self._version_log.append((self.version, self.position_history.generation, len(self.position_history)))
+
+    def _plot_series(self, points: int, start: Optional[dt.date], end: Optional[dt.date]) -> Dict:
+        """Per chart (dates, values) of the history in range, downsampled.
+
+        Every series keeps its extremes; trade rows are kept too, the largest
+        first when there are more than a quarter of the point budget.
+        """
+        history = self.position_history
+        dates = history.column('date')
+        in_range = np.ones(len(dates), dtype=bool)
+        if start is not None:
+            in_range &= dates >= start.toordinal()
+        if end is not None:
+            in_range &= dates <= end.toordinal()
+        rows = np.flatnonzero(in_range)
+
+        trades = self.stock_transactions.column('row')
+        trade_mask = (trades >= 0) & (trades < len(dates))
+        trades, shares = trades[trade_mask], self.stock_transactions.column('shares')[trade_mask]
+        trade_in_range = in_range[trades]
+        trades, shares = trades[trade_in_range], shares[trade_in_range]
+        if points and len(trades) > points // 4:
+            trades = trades[np.argsort(shares)[len(trades) - points // 4:]]
+        keep = np.searchsorted(rows, trades)
+
+        x = dates[rows].astype(np.float64)
+        series = {}
+        for name in ('underlying_price', 'iv', 'delta', 'stock_position', 'capital'):
+            y = history.column(name)[rows]
+            picked = rows[downsample(x, y, points, keep)]
+            series[name] = (ordinals_to_datetime64(dates[picked]), history.column(name)[picked])
+        return series
+
+    @timed
+    def _build_dashboard_plots(self, points: int, start: Optional[dt.date], end: Optional[dt.date]):
+        if len(self.position_history) < 2:
+            return None
+
+        import plotly.graph_objects as go  # loaded on the first chart, not at startup
+
+        series = self._plot_series(points, start, end)
         
         # Create figures
         fig_price = go.Figure()
         fig_price.add_trace(go.Scatter(
-            x=df['date'], 
-            y=df['underlying_price'], 
+            x=series['underlying_price'][0],
+            y=series['underlying_price'][1],
             mode='lines+markers',
             name='Stock Price',
             line=dict(color='rgb(49, 130, 189)', width=2)
@@ -324,8 +1075,8 @@ class DeltaHedger:
         # IV Chart
         fig_iv = go.Figure()
         fig_iv.add_trace(go.Scatter(
-            x=df['date'], 
-            y=df['iv'], 
+            x=series['iv'][0],
+            y=series['iv'][1],
             mode='lines+markers',
             name='IV',
             line=dict(color='rgb(214, 39, 40)', width=2)
@@ -342,8 +1093,8 @@ class DeltaHedger:
         # Delta Chart
         fig_delta = go.Figure()
         fig_delta.add_trace(go.Scatter(
-            x=df['date'], 
-            y=df['delta'], 
+            x=series['delta'][0],
+            y=series['delta'][1],
             mode='lines+markers',
             name='Delta',
             line=dict(color='rgb(44, 160, 44)', width=2)
@@ -360,8 +1111,8 @@ class DeltaHedger:
         # Position Chart
         fig_position = go.Figure()
         fig_position.add_trace(go.Scatter(
-            x=df['date'], 
-            y=df['stock_position'], 
+            x=series['stock_position'][0],
+            y=series['stock_position'][1],
             mode='lines+markers',
             name='Stock Position',
             line=dict(color='rgb(148, 103, 189)', width=2)
@@ -378,8 +1129,8 @@ class DeltaHedger:
         # Capital Chart
         fig_capital = go.Figure()
         fig_capital.add_trace(go.Scatter(
-            x=df['date'], 
-            y=df['capital'], 
+            x=series['capital'][0],
+            y=series['capital'][1],
             mode='lines+markers',
             name='Capital',
             line=dict(color='rgb(140, 86, 75)', width=2)
@@ -402,54 +1153,254 @@ class DeltaHedger:
             'capital': fig_capital.to_json()
         }
         
-    def save_data(self) -> None:
-        """Save all data to a JSON file"""
-        data_dict = {
-            'options_data': [option.to_dict() for option in self.options_data],
-            'position_history': self.position_history,
-            'stock_transactions': self.stock_transactions,
-            'initial_capital': self.initial_capital,
-            'current_capital': self.current_capital,
-            'current_stock_units': self.current_stock_units,
-            'transaction_costs': self.transaction_costs
-        }
+    @timed
+    def to_dict(self) -> Dict:
+        """Full state as a JSON-ready dictionary (snapshot and export format)"""
+        self.apply_pending_edits()
+        data_dict = {name: store.to_records() for name, store in self.stores().items()}
+        data_dict.update(self.settings())
+        return data_dict
+
+    @timed
+    def save_data(self) -> Dict:
+        """Commit journaled changes, compacting them into a snapshot when the journal has grown"""
+        if self._replaying:
+            return {"status": "info", "message": "Replaying journal"}
+        self.apply_pending_edits()
         
         try:
-            with open(self.filename, 'w') as f:
-                json.dump(data_dict, f, indent=2)
+            self._journal.commit()
+            if self._journal.size >= max(SNAPSHOT_MIN_BYTES, self._snapshot_bytes):
+                self.snapshot()
+            self._publish_changes()
             return {"status": "success", "message": f"Data saved successfully"}
         except Exception as e:
             return {"status": "error", "message": f"Error saving data: {str(e)}"}
+
+    def flush(self) -> None:
+        """Compact the journal into a snapshot, so the next load needs no replay"""
+        self.save_data()
+        if self._journal.size:
+            self.snapshot()
+
+    @timed
+    def snapshot(self) -> None:
+        """Atomically write the full state and start a fresh journal"""
+        self.apply_pending_edits()
+        self._snapshot_bytes = self._backend.save(self, self._journal.seq)
+        self.snapshot_bytes_written += self._snapshot_bytes
+        self._backend_token = self._backend.token()
+        self._journal.truncate()
+        self._publish_changes()
+
+    def _publish_marks(self) -> Tuple:
+        return (self.position_history.generation, len(self.position_history),
+                self.stock_transactions.generation, len(self.stock_transactions))
+
+    def _publish_changes(self) -> None:
+        """Push what changed since the last event to live subscribers.
+
+        Appended rows and trades are sent inline ('append'); anything else,
+        such as an edit replaying the history, is sent as a 'reset' so
+        clients reload.
+        """
+        self._log_version()
+        previous, current = self._published, self._publish_marks()
+        self._published = current
+        if not self.events or previous == current:
+            return
+        history_generation, history_len, tx_generation, tx_len = previous
+        summary = self.get_summary_data()
+        if (current[0] == history_generation and current[2] == tx_generation
+                and current[1] - history_len + current[3] - tx_len <= EVENT_MAX_ROWS):
+            self.events.publish('append', {
+                'version': self.version,
+                'summary': summary,
+                'history': self.position_history.to_records(np.arange(history_len, current[1])),
+                'transactions': self.stock_transactions.to_records(np.arange(tx_len, current[3]))
+            }, self.version)
+        else:
+            self.events.publish('reset', {'version': self.version, 'summary': summary}, self.version)
             
+    @timed
     def load_data(self) -> Dict:
-        """Load data from a JSON file"""
-        if not os.path.exists(self.filename):
+        """Load the latest snapshot and replay the journal written since"""
+        if not self._backend.exists() and not self._journal.size:
             return {"status": "info", "message": "No saved data found."}
             
         try:
-            with open(self.filename, 'r') as f:
-                data_dict = json.load(f)
-                
-            # Restore options data
-            self.options_data = [OptionData.from_dict(data) for data in data_dict.get('options_data', [])]
-            
-            # Restore other data
-            self.position_history = data_dict.get('position_history', [])
-            self.stock_transactions = data_dict.get('stock_transactions', [])
-            self.initial_capital = data_dict.get('initial_capital')
-            self.current_capital = data_dict.get('current_capital', 0)
-            self.current_stock_units = data_dict.get('current_stock_units', 0)
-            self.transaction_costs = data_dict.get('transaction_costs', {'stock_fixed': 0, 'stock_percentage': 0})
-            
+            journal_seq = 0
+            self._backend_token = self._backend.token()
+            if self._backend.exists():
+                journal_seq = self._backend.load(self)
+                self._snapshot_bytes = self._backend.size()
+
+            self._journal.seq = max(self._journal.seq, journal_seq)
+            self._replay_journal(self._journal.read(after_seq=journal_seq))
             return {"status": "success", "message": "Data loaded successfully"}
         except Exception as e:
             return {"status": "error", "message": f"Error loading data: {str(e)}"}
-    
+
+    def import_data(self, data_dict: Dict) -> None:
+        """Replace all data with an imported dictionary and snapshot it right away"""
+        self.load_state(data_dict)
+        self.snapshot()
+
+    def _record(self, op: str, **payload) -> None:
+        """Journal a mutating operation unless it is itself being replayed"""
+        self.version += 1
+        if not self._replaying:
+            self._journal.record(op, **payload)
+
+    @timed
+    def _replay_journal(self, entries: List[Dict]) -> None:
+        """Re-apply journaled operations on top of the loaded snapshot"""
+        self._replaying = True
+        try:
+            for entry in entries:
+                try:
+                    self._replay_entry(entry)
+                except Exception as e:
+                    # One bad entry must not cost the ones after it
+                    self.journal_entries_skipped += 1
+                    logger.warning("Skipped journal entry %s (%s): %s", entry.get('seq'), entry.get('op'), e)
+                # Live, every request commits its edits before the next change
+                # (see save_data), so replay must not coalesce them across entries
+                self.apply_pending_edits()
+        finally:
+            self._replaying = False
+
+    def _replay_entry(self, entry: Dict) -> None:
+        """Apply one journaled operation"""
+        op = entry['op']
+        if op == 'tick':
+            self.add_option_data(OptionData.from_dict(entry['option']))
+            self.update_hedge()
+        elif op == 'stock':
+            self.add_stock_position(dt.date.fromisoformat(entry['date']), entry['price'],
+                                    entry['position_type'], entry['shares'])
+        elif op == 'edit':
+            self.edit_option_data(entry['index'], OptionData.from_dict(entry['option']))
+        elif op == 'delete':
+            self.delete_option_data(entry['index'])
+        elif op == 'delete_transaction':
+            self.delete_transaction(entry['index'])
+        elif op == 'capital':
+            self.set_initial_capital(entry['value'])
+        elif op == 'costs':
+            self.set_transaction_costs(entry['fixed'], entry['percentage'])
+        elif op == 'clear':
+            self.clear_data()
+
+    def load_state(self, data_dict: Dict) -> None:
+        """Replace the hedger state with a saved or imported data dictionary"""
+        # Restore options data
+        self.options_data.load_records(data_dict.get('options_data', []))
+        
+        # Restore other data
+        self.position_history.load_records(data_dict.get('position_history', []))
+        transactions = data_dict.get('stock_transactions', [])
+        self.stock_transactions.load_records(transactions)
+
+        if transactions and 'row' not in transactions[0]:
+            # Older files don't link trades to rows; match them up by date
+            history_dates = np.maximum.accumulate(self.position_history.column('date'))
+            rows = np.searchsorted(history_dates, self.stock_transactions.column('date'))
+            self.stock_transactions.set_column('row', np.maximum.accumulate(rows))
+        self._load_settings(data_dict)
+
+    def load_columns(self, columns: Dict[str, Dict[str, np.ndarray]], settings: Dict) -> None:
+        """Replace the hedger state with stored (possibly memory-mapped) column arrays.
+
+        Snapshots that kept the checkpoints and option P&L (see
+        snapshot_stores) load them as they are instead of rescanning every row.
+        """
+        for name, store in self.snapshot_stores().items():
+            store.adopt(columns.get(name, {}))
+        self._load_settings(settings, derived=bool(columns.get('checkpoints')) and 'option_pnl' in settings)
+
+    def _load_settings(self, data_dict: Dict, derived: bool = False) -> None:
+        self.version += 1
+        self.initial_capital = data_dict.get('initial_capital')
+        self.current_capital = data_dict.get('current_capital', 0)
+        self.current_stock_units = data_dict.get('current_stock_units', 0)
+        self.transaction_costs = data_dict.get('transaction_costs', {'stock_fixed': 0, 'stock_percentage': 0})
+        self._dirty = None
+        if not derived:
+            self._rebuild_checkpoints()
+        # The last checkpoint already sums most of the trades
+        last = self._checkpoints[-1] if self._checkpoints else dict.fromkeys(CHECKPOINT_SCHEMA, 0)
+        self.totals = {name: float(last[name]) for name in TRADE_TOTALS}
+        self._add_trades(int(last['transactions']))
+        self.option_pnl = data_dict['option_pnl'] if derived else self._option_pnl(0, len(self.options_data))
+
+    def stats(self) -> Dict:
+        """Sizes and counters for the metrics endpoint"""
+        return {
+            'book': self.metrics_label,
+            'rows': {name: len(store) for name, store in self.stores().items()},
+            'version': self.version,
+            'journal_bytes': self._journal.size,
+            'journal_bytes_written': self._journal.bytes_written,
+            'snapshot_bytes_written': self.snapshot_bytes_written,
+            'journal_entries_skipped': self.journal_entries_skipped,
+            'caches': {
+                'plots': (self.plot_cache_hits, self.plot_cache_misses),
+                'responses': (self.responses.hits, self.responses.misses)
+            }
+        }
+
+    def memory_bytes(self) -> int:
+        """Bytes held by the column stores (mapped columns count in full)"""
+        return (sum(store.nbytes for store in self.stores().values()) + self._checkpoints.nbytes
+                + self.analytics.nbytes)
+
+    def stores(self) -> Dict[str, ColumnStore]:
+        """The column stores that make up the persisted state, by name"""
+        return {
+            'options_data': self.options_data,
+            'position_history': self.position_history,
+            'stock_transactions': self.stock_transactions
+        }
+
+    def snapshot_stores(self) -> Dict[str, ColumnStore]:
+        """stores() plus the replay checkpoints, kept by column snapshots so loads skip rebuilding them"""
+        return dict(self.stores(), checkpoints=self._checkpoints)
+
+    def settings(self) -> Dict:
+        """Scalar part of the persisted state"""
+        return {
+            'initial_capital': self.initial_capital,
+            'current_capital': self.current_capital,
+            'current_stock_units': self.current_stock_units,
+            'transaction_costs': self.transaction_costs,
+            'option_pnl': self.option_pnl
+        }
+
+    def clear_data(self) -> None:
+        """Reset to an empty book with default settings"""
+        self._record('clear')
+        self.options_data.clear()
+        self.position_history.clear()
+        self.stock_transactions.clear()
+        self._checkpoints.clear()
+        self._dirty = None
+        self.initial_capital = 100000
+        self.current_capital = 100000
+        self.current_stock_units = 0
+        self.totals = dict.fromkeys(TRADE_TOTALS, 0.0)
+        self.option_pnl = 0.0
+        self.transaction_costs = {'stock_fixed': 0, 'stock_percentage': 0}
+
     def set_transaction_costs(self, fixed: float, percentage: float) -> Dict:
         """Set transaction cost parameters"""
         try:
+            # Edits made before the change are replayed under the old costs
+            self.apply_pending_edits()
             self.transaction_costs['stock_fixed'] = float(fixed)
             self.transaction_costs['stock_percentage'] = float(percentage)
+            self._record('costs', fixed=self.transaction_costs['stock_fixed'],
+                         percentage=self.transaction_costs['stock_percentage'])
             self.save_data()
             return {
                 "status": "success",
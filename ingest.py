@@ -0,0 +1,143 @@
+# ingest.py - Streaming bulk ingestion of option data (CSV or NDJSON)
+import csv
+import io
+import json
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from pricing import missing_greeks
+from store import EPOCH_ORDINAL, OPTION_SCHEMA
+
+# Rows parsed, validated and hedged together
+BATCH_SIZE = 50000
+
+# Row errors listed in the response; the rest are only counted
+MAX_REPORTED_ERRORS = 20
+
+FLOAT_FIELDS = ['underlying_price', 'strike_price', 'option_price']
+
+# May be left empty and are then computed from the option price
+GREEK_FIELDS = ['iv', 'delta']
+
+
+def iter_rows(stream, fmt: str) -> Iterator[Tuple[int, Dict]]:
+    """Yield (line number, row dict) from a binary stream without reading it whole"""
+    text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_num, line in enumerate(text, 1):
+            if not line.strip():
+                continue
+            try:
+                yield line_num, json.loads(line)
+            except ValueError:
+                yield line_num, None
+
+
+def encode_rows(rows: List[Dict]) -> Dict[str, np.ndarray]:
+    """Validate rows and encode them as OPTION_SCHEMA columns; raises on any bad row"""
+    if any(not isinstance(row, dict) for row in rows):
+        raise ValueError("invalid JSON object")
+    columns = {}
+    for name in FLOAT_FIELDS:
+        columns[name] = np.asarray([float(row[name]) for row in rows], dtype=np.float64)
+        if not np.isfinite(columns[name]).all():
+            raise ValueError(f"{name} must be a finite number")
+    for name in GREEK_FIELDS:
+        values = [row.get(name) for row in rows]
+        columns[name] = np.asarray([np.nan if v is None or v == '' else float(v) for v in values],
+                                   dtype=np.float64)
+        if np.isinf(columns[name]).any():
+            raise ValueError(f"{name} must be a finite number")
+    for name in ('date', 'expiration'):
+        dates = np.asarray([str(row[name]) for row in rows], dtype='datetime64[D]')
+        if np.isnat(dates).any():
+            raise ValueError(f"{name} is required")
+        columns[name] = dates.astype(np.int64) + EPOCH_ORDINAL
+    option_types = OPTION_SCHEMA['option_type']
+    types = [str(row['option_type']).lower() for row in rows]
+    if any(option_type not in option_types for option_type in types):
+        raise ValueError("option_type must be 'call' or 'put'")
+    columns['option_type'] = np.asarray([option_types.index(t) for t in types], dtype=np.int8)
+    columns['position_size'] = np.asarray([int(row['position_size']) for row in rows], dtype=np.int64)
+    return columns
+
+
+def encode_batch(batch: List[Tuple[int, Dict]]) -> Tuple[Dict[str, np.ndarray], List[Dict]]:
+    """Encode a batch at once, falling back to row by row to pinpoint bad rows.
+
+    Missing greeks are solved for the whole batch; rows whose option price
+    admits no implied volatility are rejected too.
+    """
+    try:
+        columns, lines, errors = encode_rows([row for _, row in batch]), [line for line, _ in batch], []
+    except (KeyError, ValueError, TypeError):
+        good, lines, errors = [], [], []
+        for line_num, row in batch:
+            try:
+                encode_rows([row])
+                good.append(row)
+                lines.append(line_num)
+            except KeyError as e:
+                errors.append({"line": line_num, "error": f"missing field {e}"})
+            except (ValueError, TypeError) as e:
+                errors.append({"line": line_num, "error": str(e)})
+        if not good:
+            return {}, errors
+        columns = encode_rows(good)
+
+    rows, iv, delta = missing_greeks(columns)
+    columns['iv'][rows], columns['delta'][rows] = iv, delta
+    unsolved = rows[np.isnan(iv) | np.isnan(delta)]
+    if len(unsolved):
+        errors.extend({"line": lines[i], "error": "option_price admits no implied volatility"}
+                      for i in unsolved.tolist())
+        errors.sort(key=lambda error: error["line"])
+        keep = np.ones(len(lines), dtype=bool)
+        keep[unsolved] = False
+        columns = {name: column[keep] for name, column in columns.items()}
+    return columns, errors
+
+
+def ingest_stream(hedger, stream, fmt: str, batch_size: int = BATCH_SIZE) -> Dict:
+    """Parse, validate and hedge a stream of option rows batch by batch.
+
+    Memory stays bounded by the batch size. All batches are committed with
+    one snapshot at the end, including when the stream breaks off midway.
+    """
+    summary = {"status": "success", "rows_received": 0, "rows_ingested": 0, "rows_rejected": 0,
+               "trades": 0, "shares_bought": 0.0, "shares_sold": 0.0, "fees": 0.0, "errors": []}
+
+    def apply(batch):
+        columns, errors = encode_batch(batch)
+        summary["rows_received"] += len(batch)
+        summary["rows_rejected"] += len(errors)
+        summary["errors"].extend(errors[:MAX_REPORTED_ERRORS - len(summary["errors"])])
+        if columns:
+            result = hedger.ingest_options(columns)
+            summary["rows_ingested"] += result["rows"]
+            for key in ("trades", "shares_bought", "shares_sold", "fees"):
+                summary[key] += result[key]
+
+    batch = []
+    try:
+        for line_num, row in iter_rows(stream, fmt):
+            batch.append((line_num, row))
+            if len(batch) >= batch_size:
+                apply(batch)
+                batch = []
+        if batch:
+            apply(batch)
+    finally:
+        if summary["rows_ingested"]:
+            hedger.snapshot()
+
+    summary["message"] = (f"Ingested {summary['rows_ingested']} rows "
+                          f"({summary['rows_rejected']} rejected), {summary['trades']} trades")
+    summary["current_stock"] = hedger.current_stock_units
+    summary["current_capital"] = hedger.current_capital
+    return summary
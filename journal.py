@@ -0,0 +1,126 @@
+# journal.py - Append-only operation journal and atomic snapshot writes
+import json
+import os
+from typing import Dict, List, Tuple
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    """Write a file so readers see either the old or the new contents, never a mix"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class Journal:
+    """Append-only log of hedger operations, one JSON object per line.
+
+    Every entry carries an increasing `seq` so entries already folded into a
+    snapshot can be skipped after a crash between the snapshot and truncate().
+    Operations are buffered by record() and written together by commit().
+    """
+
+    def __init__(self, path: str, fsync: bool = True):
+        self.path = path
+        self.fsync = fsync
+        self.seq = 0
+        # Bytes of the file already applied by this process (see read_new)
+        self.offset = 0
+        self.bytes_written = 0
+        self._pending: List[bytes] = []
+
+    @property
+    def size(self) -> int:
+        """Bytes currently on disk"""
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def record(self, op: str, **payload) -> None:
+        self.seq += 1
+        entry = {'seq': self.seq, 'op': op, **payload}
+        self._pending.append(json.dumps(entry, separators=(',', ':')).encode() + b'\n')
+
+    def commit(self) -> int:
+        """Append buffered entries in a single write; returns bytes written.
+
+        A failed write is cut back off the file, so the next append doesn't
+        run on from a torn line; the entries stay buffered for the next commit.
+        """
+        if not self._pending:
+            return 0
+        data = b''.join(self._pending)
+        with open(self.path, 'ab') as f:
+            end = f.tell()
+            try:
+                f.write(data)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            except BaseException:
+                f.truncate(end)
+                raise
+        self._pending = []
+        self.offset += len(data)
+        self.bytes_written += len(data)
+        return len(data)
+
+    def read(self, after_seq: int = 0) -> List[Dict]:
+        """Return entries newer than after_seq.
+
+        A torn or corrupt tail left by a crashed write is cut off the file so
+        later appends start on a clean line.
+        """
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, 'rb') as f:
+            data = f.read()
+
+        entries, valid = self._parse(data)
+        if valid < len(data):
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid)
+        self.offset = valid
+        if entries:
+            self.seq = max(self.seq, entries[-1]['seq'])
+        return [entry for entry in entries if entry['seq'] > after_seq]
+
+    def read_new(self) -> List[Dict]:
+        """Return entries appended by other processes since this one last read or wrote"""
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(self.offset)
+                data = f.read()
+        except OSError:
+            return []
+        entries, valid = self._parse(data)
+        self.offset += valid
+        if entries:
+            self.seq = max(self.seq, entries[-1]['seq'])
+        return entries
+
+    @staticmethod
+    def _parse(data: bytes) -> Tuple[List[Dict], int]:
+        entries, valid = [], 0
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b'\n'):
+                break
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                break
+            valid += len(line)
+        return entries, valid
+
+    def truncate(self) -> None:
+        """Drop all entries once they are covered by a snapshot"""
+        self._pending = []
+        self.offset = 0
+        if os.path.exists(self.path):
+            with open(self.path, 'r+b') as f:
+                f.truncate(0)
+                if self.fsync:
+                    os.fsync(f.fileno())
@@ -0,0 +1,158 @@
+# metrics.py - Hot-path timings and counters in the Prometheus text format
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from functools import wraps
+from typing import Dict, List, Tuple
+
+from pricing import greeks_cache
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_labels(self.labels, key)} {value}" for key, value in values]
+        return lines
+
+
+class Histogram:
+    """Latency histogram; each observation is a bisect and three increments"""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        # label values -> [count per bucket (+Inf last), sum]
+        self._series: Dict[Tuple, List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = [(key, list(counts), total) for key, (counts, total) in self._series.items()]
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), key + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+CALL_SECONDS = Histogram('hedger_call_seconds', "Time spent in instrumented hot-path functions", ('function',))
+REQUEST_SECONDS = Histogram('http_request_seconds', "Time to build each response, by route", ('endpoint',))
+REQUESTS = Counter('http_requests_total', "Requests answered, by route, method and status",
+                   ('endpoint', 'method', 'status'))
+
+METRICS = [CALL_SECONDS, REQUEST_SECONDS, REQUESTS]
+
+# Hedgers whose sizes and cache counters are read at scrape time, by book
+# label; a reloaded book replaces the instance it was evicted from, which
+# may live on in a request still holding it
+HEDGERS: 'weakref.WeakValueDictionary' = weakref.WeakValueDictionary()
+
+
+def timed(function):
+    """Record every call's duration in hedger_call_seconds"""
+    name = function.__qualname__
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            CALL_SECONDS.observe(time.perf_counter() - start, name)
+    return wrapper
+
+
+def instrument(app) -> None:
+    """Count and time every request the app answers"""
+    from flask import g, request
+
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        start = g.pop('request_start', None)
+        if start is not None:
+            endpoint = request.endpoint or 'unmatched'
+            REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint)
+            REQUESTS.inc(endpoint, request.method, str(response.status_code))
+        return response
+
+
+def render() -> str:
+    """Every metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in METRICS:
+        lines += metric.render()
+    lines += _hedger_lines()
+    return '\n'.join(lines) + '\n'
+
+
+def _hedger_lines() -> List[str]:
+    samples = {
+        'hedger_rows': ('gauge', "Rows per store", []),
+        'hedger_version': ('gauge', "Mutation counter", []),
+        'hedger_journal_bytes': ('gauge', "Current journal size", []),
+        'hedger_journal_bytes_written_total': ('counter', "Bytes appended to the journal", []),
+        'hedger_snapshot_bytes_written_total': ('counter', "Bytes written by snapshots", []),
+        'hedger_journal_entries_skipped_total': ('counter', "Journal entries that failed to replay", []),
+        'hedger_cache_requests_total': ('counter', "Plot and response cache lookups", []),
+        'greeks_cache_requests_total': ('counter', "Implied volatility cache lookups", [])
+    }
+    for hedger in list(HEDGERS.values()):
+        stats = hedger.stats()
+        book = (('book',), (stats['book'],))
+        for store, rows in stats['rows'].items():
+            samples['hedger_rows'][2].append((('book', 'store'), (stats['book'], store), rows))
+        for name in ('version', 'journal_bytes', 'journal_bytes_written', 'snapshot_bytes_written',
+                     'journal_entries_skipped'):
+            metric = f"hedger_{name}" + ('_total' if name.endswith(('written', 'skipped')) else '')
+            samples[metric][2].append((*book, stats[name]))
+        for cache, (hits, misses) in stats['caches'].items():
+            for result, value in (('hit', hits), ('miss', misses)):
+                samples['hedger_cache_requests_total'][2].append(
+                    (('book', 'cache', 'result'), (stats['book'], cache, result), value))
+    for result, value in (('hit', greeks_cache.hits), ('miss', greeks_cache.misses)):
+        samples['greeks_cache_requests_total'][2].append((('result',), (result,), value))
+
+    lines = []
+    for name, (kind, help, values) in samples.items():
+        lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+        lines += [f"{name}{_labels(labels, key)} {value}" for labels, key, value in values]
+    return lines
+
+
+def _labels(names: Tuple[str, ...], values: Tuple) -> str:
+    if not names:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
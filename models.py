@@ -0,0 +1,33 @@
+# models.py - Plain data types shared by the hedger, portfolio and routes
+import datetime as dt
+from dataclasses import dataclass, asdict
+
+
+@dataclass
+class OptionData:
+    date: dt.date
+    underlying_price: float
+    strike_price: float
+    option_price: float
+    iv: float
+    delta: float
+    expiration: dt.date
+    option_type: str  # 'call' or 'put'
+    position_size: int  # number of contracts
+    
+    @property
+    def days_to_expiration(self) -> int:
+        return (self.expiration - self.date).days
+    
+    def to_dict(self):
+        data = asdict(self)
+        data['date'] = self.date.isoformat()
+        data['expiration'] = self.expiration.isoformat()
+        return data
+    
+    @classmethod
+    def from_dict(cls, data):
+        # Convert string dates back to date objects
+        data['date'] = dt.date.fromisoformat(data['date'])
+        data['expiration'] = dt.date.fromisoformat(data['expiration'])
+        return cls(**data)
@@ -0,0 +1,312 @@
+# portfolio.py - Option positions netted per underlying
+import json
+import math
+import os
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from models import OptionData
+from engine import DEAD_BAND
+from journal import Journal, write_atomic
+from locks import FileLock, RWLock
+from pricing import missing_greeks
+from store import OPTION_SCHEMA
+
+# Net deltas are re-summed from scratch after this many incremental updates
+# to keep floating point drift from accumulating
+RESYNC_INTERVAL = 4096
+
+# The journal is compacted into a snapshot once it outgrows this
+SNAPSHOT_MIN_BYTES = 1 << 20
+
+
+def contract_key(underlying: str, option: OptionData) -> Tuple:
+    """Positions are identified by underlying, expiration, strike and type"""
+    return (underlying, option.expiration.isoformat(), option.strike_price, option.option_type)
+
+
+@dataclass
+class UnderlyingBook:
+    """Positions on one underlying and the stock hedging their net delta"""
+    underlying: str
+    positions: Dict[Tuple, OptionData] = field(default_factory=dict)
+    net_hedge: float = 0.0  # sum of -delta * position_size * 100 over the positions
+    stock_units: float = 0.0
+    price: float = 0.0
+    hedged: bool = False
+    transactions: List[Dict] = field(default_factory=list)
+    updates: int = 0
+
+    def mark(self, key: Tuple, option: OptionData) -> None:
+        """Replace a position's mark, moving the net hedge by the difference only"""
+        previous = self.positions.get(key)
+        if previous is not None:
+            self.net_hedge += previous.delta * previous.position_size * 100
+        if option.position_size:
+            self.positions[key] = option
+            self.net_hedge -= option.delta * option.position_size * 100
+        elif previous is not None:
+            del self.positions[key]
+        self.price = option.underlying_price
+
+        self.updates += 1
+        if self.updates % RESYNC_INTERVAL == 0:
+            self.net_hedge = math.fsum(-p.delta * p.position_size * 100 for p in self.positions.values())
+
+
+class Portfolio:
+    """Option positions across contracts and underlyings, hedged per underlying.
+
+    Marks update a single position and its underlying's net hedge in O(1);
+    each underlying then rebalances with the same rule as DeltaHedger.update_hedge.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.books: Dict[str, UnderlyingBook] = {}
+        self.initial_capital: float = 100000
+        self.current_capital: float = 100000
+        self.transaction_costs: Dict = {'stock_fixed': 0, 'stock_percentage': 0}
+        self._journal = Journal(os.path.splitext(filename)[0] + '.journal')
+        self._replaying = False
+        self.lock = RWLock()
+        self._file_lock = FileLock(os.path.splitext(filename)[0] + '.lock')
+        self._snapshot_token = None
+        with self._file_lock.exclusive():
+            self.load_data()
+
+    @contextmanager
+    def reading(self):
+        """Read lock over the positions, caught up with other processes first"""
+        with self.lock.read():
+            if not self.is_stale():
+                yield
+                return
+        with self.lock.write():
+            with self._file_lock.shared():
+                self.sync()
+            yield
+
+    @contextmanager
+    def writing(self):
+        """Exclusive access for a change, across threads and worker processes"""
+        with self.lock.write():
+            with self._file_lock.exclusive():
+                self.sync()
+                try:
+                    yield
+                finally:
+                    self.save_data()
+
+    def is_stale(self) -> bool:
+        return self._journal.size != self._journal.offset or _file_token(self.filename) != self._snapshot_token
+
+    def sync(self) -> None:
+        """Catch up with marks other processes committed: replay new journal
+        entries, or reload after a snapshot compacted the journal"""
+        if _file_token(self.filename) != self._snapshot_token:
+            self.books = {}
+            self.initial_capital = self.current_capital = 100000
+            self.transaction_costs = {'stock_fixed': 0, 'stock_percentage': 0}
+            self.load_data()
+        elif self._journal.size != self._journal.offset:
+            self._replay(self._journal.read_new())
+
+    def mark(self, underlying: str, option: OptionData) -> Tuple[float, float, Dict]:
+        """Apply one option mark and rehedge its underlying"""
+        return self.apply_marks([(underlying, option)])[underlying]
+
+    def apply_marks(self, marks: List[Tuple[str, OptionData]]) -> Dict[str, Tuple[float, float, Dict]]:
+        """Apply a batch of marks, then rehedge each touched underlying once.
+
+        Missing greeks are solved for the whole batch in one vectorized call.
+        Returns update_hedge style (stock units, adjustment, result) per underlying.
+        """
+        self._fill_greeks([option for _, option in marks])
+        touched: Dict[str, OptionData] = {}
+        for underlying, option in marks:
+            self._record('mark', underlying=underlying, option=option.to_dict())
+            book = self.books.get(underlying)
+            if book is None:
+                book = self.books[underlying] = UnderlyingBook(underlying)
+            book.mark(contract_key(underlying, option), option)
+            touched[underlying] = option
+
+        results = {underlying: self._rehedge(self.books[underlying], option)
+                   for underlying, option in touched.items()}
+        self.save_data()
+        return results
+
+    def _fill_greeks(self, options: List[OptionData]) -> None:
+        """Compute iv and delta for marks that came without them"""
+        missing = [option for option in options if math.isnan(option.iv) or math.isnan(option.delta)]
+        if not missing:
+            return
+        option_types = OPTION_SCHEMA['option_type']
+        columns = {
+            'date': np.asarray([o.date.toordinal() for o in missing], dtype=np.int64),
+            'expiration': np.asarray([o.expiration.toordinal() for o in missing], dtype=np.int64),
+            'option_type': np.asarray([option_types.index(o.option_type) for o in missing], dtype=np.int8)
+        }
+        for name in ('underlying_price', 'strike_price', 'option_price', 'iv', 'delta'):
+            columns[name] = np.asarray([getattr(o, name) for o in missing], dtype=np.float64)
+        _, iv, delta = missing_greeks(columns)
+        if np.isnan(iv).any() or np.isnan(delta).any():
+            raise ValueError("Option price admits no implied volatility")
+        for option, option_iv, option_delta in zip(missing, iv.tolist(), delta.tolist()):
+            option.iv, option.delta = option_iv, option_delta
+
+    def _rehedge(self, book: UnderlyingBook, option: OptionData) -> Tuple[float, float, Dict]:
+        """Bring an underlying's stock position to its net hedge"""
+        price = option.underlying_price
+        adjustment = book.net_hedge - book.stock_units
+        if not book.hedged:
+            book.hedged = True
+            action = "BUY" if adjustment > 0 else "SELL"
+            message = f"Initial hedge: {action} {abs(adjustment):.2f} shares"
+        elif abs(adjustment) > DEAD_BAND:
+            action = "BUY" if adjustment > 0 else "SELL"
+            message = f"Hedge adjustment: {action} {abs(adjustment):.2f} shares at ${price:.2f}"
+        else:
+            return book.stock_units, adjustment, {
+                "status": "success",
+                "message": "No significant hedge adjustment needed",
+                "action": "NONE",
+                "shares": 0
+            }
+
+        fee = self.transaction_costs['stock_fixed'] + abs(adjustment) * price * self.transaction_costs['stock_percentage']
+        self.current_capital -= adjustment * price + fee
+        book.stock_units = book.net_hedge
+        book.transactions.append({
+            'date': option.date.isoformat(),
+            'shares': abs(adjustment),
+            'price': price,
+            'action': action,
+            'cost': abs(adjustment) * price,
+            'transaction_fee': fee,
+            'type': 'HEDGE'
+        })
+        return book.stock_units, adjustment, {
+            "status": "success",
+            "message": message,
+            "action": action,
+            "shares": abs(adjustment),
+            "price": price,
+            "fee": fee
+        }
+
+    def get_summary_data(self) -> Dict:
+        """Net delta, hedge and positions per underlying"""
+        return {
+            "current_capital": self.current_capital,
+            "initial_capital": self.initial_capital,
+            "underlyings": {
+                underlying: {
+                    "positions": len(book.positions),
+                    "net_delta": -book.net_hedge / 100,
+                    "current_stock": book.stock_units,
+                    "current_price": book.price,
+                    "total_trades": len(book.transactions)
+                }
+                for underlying, book in self.books.items()
+            }
+        }
+
+    def set_transaction_costs(self, fixed: float, percentage: float) -> None:
+        self.transaction_costs = {'stock_fixed': float(fixed), 'stock_percentage': float(percentage)}
+        self._record('costs', fixed=self.transaction_costs['stock_fixed'],
+                     percentage=self.transaction_costs['stock_percentage'])
+        self.save_data()
+
+    def clear_data(self) -> None:
+        """Drop every position and reset the capital"""
+        self._record('clear')
+        self.books = {}
+        self.current_capital = self.initial_capital
+
+    def to_dict(self) -> Dict:
+        return {
+            'initial_capital': self.initial_capital,
+            'current_capital': self.current_capital,
+            'transaction_costs': self.transaction_costs,
+            'books': [{
+                'underlying': book.underlying,
+                'positions': [option.to_dict() for option in book.positions.values()],
+                'net_hedge': book.net_hedge,
+                'updates': book.updates,
+                'stock_units': book.stock_units,
+                'price': book.price,
+                'hedged': book.hedged,
+                'transactions': book.transactions
+            } for book in self.books.values()]
+        }
+
+    def save_data(self) -> None:
+        """Commit journaled marks, compacting them into a snapshot when the journal has grown"""
+        if self._replaying:
+            return
+        self._journal.commit()
+        if self._journal.size >= SNAPSHOT_MIN_BYTES:
+            self.snapshot()
+
+    def snapshot(self) -> None:
+        data_dict = self.to_dict()
+        data_dict['journal_seq'] = self._journal.seq
+        write_atomic(self.filename, json.dumps(data_dict, separators=(',', ':')).encode())
+        self._snapshot_token = _file_token(self.filename)
+        self._journal.truncate()
+
+    def load_data(self) -> Dict:
+        """Load the latest snapshot and replay the marks journaled since"""
+        journal_seq = 0
+        self._snapshot_token = _file_token(self.filename)
+        if os.path.exists(self.filename):
+            with open(self.filename) as f:
+                data_dict = json.load(f)
+            self.initial_capital = data_dict['initial_capital']
+            self.current_capital = data_dict['current_capital']
+            self.transaction_costs = data_dict['transaction_costs']
+            for saved in data_dict['books']:
+                book = self.books[saved['underlying']] = UnderlyingBook(
+                    saved['underlying'], stock_units=saved['stock_units'], price=saved['price'],
+                    hedged=saved['hedged'], transactions=saved['transactions'])
+                for record in saved['positions']:
+                    option = OptionData.from_dict(record)
+                    book.positions[contract_key(book.underlying, option)] = option
+                # Restored as saved so replayed marks round exactly as they did before
+                book.net_hedge, book.updates = saved['net_hedge'], saved['updates']
+            journal_seq = data_dict.get('journal_seq', 0)
+
+        self._journal.seq = max(self._journal.seq, journal_seq)
+        self._replay(self._journal.read(after_seq=journal_seq))
+        return {"status": "success", "message": "Portfolio loaded"}
+
+    def _replay(self, entries: List[Dict]) -> None:
+        self._replaying = True
+        try:
+            for entry in entries:
+                if entry['op'] == 'mark':
+                    self.mark(entry['underlying'], OptionData.from_dict(entry['option']))
+                elif entry['op'] == 'costs':
+                    self.set_transaction_costs(entry['fixed'], entry['percentage'])
+                elif entry['op'] == 'clear':
+                    self.clear_data()
+        finally:
+            self._replaying = False
+
+    def _record(self, op: str, **payload) -> None:
+        if not self._replaying:
+            self._journal.record(op, **payload)
+
+
+def _file_token(path: str):
+    """Identifies the snapshot file; snapshots are replaced atomically, so a new one changes it"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
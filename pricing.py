@@ -0,0 +1,202 @@
+# pricing.py - Vectorized Black-Scholes greeks and implied volatility
+import threading
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+import numpy as np
+
+from store import OPTION_SCHEMA
+
+# Continuously compounded risk-free rate used when none is given
+RISK_FREE_RATE = 0.0
+
+# Volatility search bracket for the implied-vol solver
+MIN_VOL, MAX_VOL = 1e-4, 5.0
+
+DAYS_PER_YEAR = 365.0
+
+
+def norm_cdf(x: np.ndarray) -> np.ndarray:
+    """Standard normal CDF via a Chebyshev erfc fit (fractional error below 1.2e-7)"""
+    z = np.abs(x) / np.sqrt(2.0)
+    t = 1.0 / (1.0 + 0.5 * z)
+    poly = (-z * z - 1.26551223 + t * (1.00002368 + t * (0.37409196 + t * (0.09678418
+            + t * (-0.18628806 + t * (0.27886807 + t * (-1.13520398 + t * (1.48851587
+            + t * (-0.82215223 + t * 0.17087277)))))))))
+    erfc = t * np.exp(poly)
+    return np.where(x >= 0, 1.0 - 0.5 * erfc, 0.5 * erfc)
+
+
+def norm_pdf(x: np.ndarray) -> np.ndarray:
+    return np.exp(-0.5 * x * x) / np.sqrt(2.0 * np.pi)
+
+
+def _d1_d2(spot, strike, years, vol, rate):
+    sqrt_t = np.sqrt(years)
+    d1 = (np.log(spot / strike) + (rate + 0.5 * vol * vol) * years) / (vol * sqrt_t)
+    return d1, d1 - vol * sqrt_t
+
+
+def bs_price(spot, strike, years, vol, is_call, rate=RISK_FREE_RATE) -> np.ndarray:
+    """Black-Scholes price of European calls (is_call True) and puts"""
+    d1, d2 = _d1_d2(spot, strike, years, vol, rate)
+    discount = strike * np.exp(-rate * years)
+    call = spot * norm_cdf(d1) - discount * norm_cdf(d2)
+    return np.where(is_call, call, call - spot + discount)
+
+
+def bs_delta(spot, strike, years, vol, is_call, rate=RISK_FREE_RATE) -> np.ndarray:
+    """Black-Scholes delta; expired options get their intrinsic delta"""
+    years = np.asarray(years, dtype=np.float64)
+    live = years > 0
+    d1, _ = _d1_d2(spot, strike, np.where(live, years, 1.0), vol, rate)
+    call = np.where(live, norm_cdf(d1), (np.asarray(spot) > strike).astype(np.float64))
+    return np.where(is_call, call, call - 1.0)
+
+
+def bs_vega(spot, strike, years, vol, rate=RISK_FREE_RATE) -> np.ndarray:
+    d1, _ = _d1_d2(spot, strike, years, vol, rate)
+    return spot * norm_pdf(d1) * np.sqrt(years)
+
+
+def bs_gamma(spot, strike, years, vol, rate=RISK_FREE_RATE) -> np.ndarray:
+    d1, _ = _d1_d2(spot, strike, years, vol, rate)
+    return norm_pdf(d1) / (spot * vol * np.sqrt(years))
+
+
+def implied_vol(price, spot, strike, years, is_call, rate=RISK_FREE_RATE,
+                tol: float = 1e-8, max_iter: int = 100) -> np.ndarray:
+    """Batched implied volatility by Newton steps safeguarded with bisection.
+
+    Every contract keeps a [lo, hi] bracket around its root; a Newton step
+    that leaves the bracket (or has no vega to work with) is replaced by the
+    bracket midpoint. Prices outside the no-arbitrage bounds give NaN, and
+    so do prices no volatility in [MIN_VOL, MAX_VOL] reaches, whose bracket
+    collapses onto an edge without matching the price.
+    """
+    price, spot, strike, years, is_call = np.broadcast_arrays(
+        *(np.asarray(a, dtype=np.float64) for a in (price, spot, strike, years, is_call)))
+    is_call = is_call.astype(bool)
+    discount = strike * np.exp(-rate * years)
+    lower = np.where(is_call, np.maximum(spot - discount, 0.0), np.maximum(discount - spot, 0.0))
+    upper = np.where(is_call, spot, discount)
+    valid = (years > 0) & (price > lower) & (price < upper)
+
+    vol = np.full(price.shape, np.nan)
+    idx = np.flatnonzero(valid)
+    lo = np.full(len(idx), MIN_VOL)
+    hi = np.full(len(idx), MAX_VOL)
+    sigma = np.full(len(idx), 0.3)
+    p, s, k, t, c = price.flat[idx], spot.flat[idx], strike.flat[idx], years.flat[idx], is_call.flat[idx]
+    for _ in range(max_iter):
+        if not len(idx):
+            break
+        diff = bs_price(s, k, t, sigma, c, rate) - p
+        done = np.abs(diff) < tol
+        vol.flat[idx[done]] = sigma[done]
+        keep = ~done
+        idx, lo, hi, sigma, diff = idx[keep], lo[keep], hi[keep], sigma[keep], diff[keep]
+        p, s, k, t, c = p[keep], s[keep], k[keep], t[keep], c[keep]
+
+        # Price rises with vol, so the sign of the error says which side the root is on
+        hi = np.where(diff > 0, sigma, hi)
+        lo = np.where(diff < 0, sigma, lo)
+        vega = bs_vega(s, k, t, sigma, rate)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = sigma - diff / vega
+        bisect = ~np.isfinite(step) | (step <= lo) | (step >= hi)
+        sigma = np.where(bisect, 0.5 * (lo + hi), step)
+        converged = (hi - lo) < tol
+        if converged.any():
+            # The bracket is tol wide in vol, so a real root misses the price by at most about vega * tol
+            at = np.flatnonzero(converged)
+            error = np.abs(bs_price(s[at], k[at], t[at], sigma[at], c[at], rate) - p[at])
+            found = error <= tol * np.maximum(1.0, 2.0 * bs_vega(s[at], k[at], t[at], sigma[at], rate))
+            vol.flat[idx[at]] = np.where(found, sigma[at], np.nan)
+        keep = ~converged
+        idx, lo, hi, sigma = idx[keep], lo[keep], hi[keep], sigma[keep]
+        p, s, k, t, c = p[keep], s[keep], k[keep], t[keep], c[keep]
+    return vol
+
+
+class GreeksCache:
+    """LRU cache of (iv, delta) per contract quote, shared across threads"""
+
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def solve(self, spot, strike, option_price, days, is_call, iv,
+              rate=RISK_FREE_RATE) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (iv, delta) arrays, implying iv where it is NaN.
+
+        Inputs are 1-D arrays of equal length; only quotes not seen before are
+        priced, all of them in one vectorized call.
+        """
+        # Unknown ivs are keyed as None since NaN never compares equal
+        given_iv = [None if v != v else v for v in iv.tolist()]
+        keys = list(zip(spot.tolist(), strike.tolist(), option_price.tolist(), days.tolist(),
+                        is_call.tolist(), given_iv, [rate] * len(spot)))
+        out_iv = np.empty(len(keys))
+        out_delta = np.empty(len(keys))
+        missing, first_seen, repeats = [], {}, []
+        with self._lock:
+            for i, key in enumerate(keys):
+                cached = self._entries.get(key)
+                if cached is not None:
+                    self._entries.move_to_end(key)
+                    out_iv[i], out_delta[i] = cached
+                elif key in first_seen:
+                    # Repeated quote within this call; copied once it is solved
+                    repeats.append((i, first_seen[key]))
+                else:
+                    first_seen[key] = i
+                    missing.append(i)
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            m = np.asarray(missing)
+            years = days[m] / DAYS_PER_YEAR
+            vol = iv[m].astype(np.float64)
+            unknown = np.isnan(vol)
+            if unknown.any():
+                vol[unknown] = implied_vol(option_price[m][unknown], spot[m][unknown], strike[m][unknown],
+                                           years[unknown], is_call[m][unknown], rate)
+            delta = bs_delta(spot[m], strike[m], years, vol, is_call[m], rate)
+            out_iv[m], out_delta[m] = vol, delta
+            # Solved outside the lock; another thread may have stored the same quotes meanwhile
+            with self._lock:
+                for i, v, d in zip(missing, vol.tolist(), delta.tolist()):
+                    self._entries[keys[i]] = (v, d)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            if repeats:
+                to, source = np.asarray(repeats).T
+                out_iv[to], out_delta[to] = out_iv[source], out_delta[source]
+        return out_iv, out_delta
+
+
+# Shared by the hedger and ingestion
+greeks_cache = GreeksCache()
+
+
+def missing_greeks(columns: Dict[str, np.ndarray], rate: float = RISK_FREE_RATE
+                   ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Solve the rows of encoded OPTION_SCHEMA columns that lack iv or delta.
+
+    Returns (rows, iv, delta) for those rows. A given iv or delta is kept;
+    rows whose option price admits no implied volatility come back as NaN.
+    """
+    iv, delta = columns['iv'], columns['delta']
+    rows = np.flatnonzero(np.isnan(iv) | np.isnan(delta))
+    if not len(rows):
+        return rows, iv[rows], delta[rows]
+    solved_iv, solved_delta = greeks_cache.solve(
+        columns['underlying_price'][rows], columns['strike_price'][rows], columns['option_price'][rows],
+        columns['expiration'][rows] - columns['date'][rows],
+        columns['option_type'][rows] == OPTION_SCHEMA['option_type'].index('call'), iv[rows], rate)
+    return rows, solved_iv, np.where(np.isnan(delta[rows]), solved_delta, delta[rows])
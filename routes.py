@@ -1,16 +1,72 @@
 # routes.py - Flask routes
-from flask import render_template, request, jsonify, redirect, url_for
+from flask import Blueprint, Response, g, render_template, request, jsonify
 import datetime as dt
-from app import OptionData
+import hashlib
+import os
+from functools import wraps
+from werkzeug.local import LocalProxy
+from models import OptionData
+from analytics import DEFAULT_WINDOW
+from backtest import MAX_POLICIES, policy_grid, run_backtest, valid_workers
+from hedger import PLOT_POINTS
+from simulate import SimulationParams, simulate, simulation_plot, summarize
+from ingest import ingest_stream
+from events import busy_stream, stream_slots
+import metrics
+from serialize import available_encodings, columns_json, compress, records_json
+
+def reading(shared):
+    """Run a view under the shared object's read lock (see DeltaHedger.reading)"""
+    def decorate(view):
+        @wraps(view)
+        def locked(*args, **kwargs):
+            with shared.reading():
+                return view(*args, **kwargs)
+        return locked
+    return decorate
+
+def writing(shared):
+    """Run a view with exclusive access, serialized with every other write in any worker"""
+    def decorate(view):
+        @wraps(view)
+        def locked(*args, **kwargs):
+            with shared.writing():
+                return view(*args, **kwargs)
+        return locked
+    return decorate
+
+def optional_float(value):
+    """NaN for a missing field, which the hedger then computes (see pricing.py)"""
+    return float('nan') if value is None or value == '' else float(value)
+
+def parse_option_data(data):
+    """Build an OptionData from a JSON payload"""
+    # Convert string dates to date objects
+    date = dt.datetime.strptime(data['date'], "%Y-%m-%d").date()
+    expiration = dt.datetime.strptime(data['expiration'], "%Y-%m-%d").date()
+    
+    return OptionData(
+        date=date,
+        underlying_price=float(data['underlying_price']),
+        strike_price=float(data['strike_price']),
+        option_price=float(data['option_price']),
+        iv=optional_float(data.get('iv')),
+        delta=optional_float(data.get('delta')),
+        expiration=expiration,
+        option_type=data['option_type'],
+        position_size=int(data['position_size'])
+    )
 
 def configure_routes(app, hedger):
     @app.route('/')
+    @reading(hedger)
     def index():
         """Render dashboard homepage"""
         summary = hedger.get_summary_data()
         return render_template('index.html', summary=summary)
     
     @app.route('/data')
+    @reading(hedger)
     def data():
         """Data management page"""
         return render_template('data.html', 
@@ -23,6 +79,7 @@ def configure_routes(app, hedger):
         return render_template('analysis.html')
     
     @app.route('/settings')
+    @reading(hedger)
     def settings():
         """Settings page"""
         return render_template('settings.html', 
@@ -30,55 +87,232 @@ def configure_routes(app, hedger):
                                initial_capital=hedger.initial_capital)
     
     @app.route('/api/summary')
+    @reading(hedger)
     def api_summary():
         """API endpoint for summary data"""
         return jsonify(hedger.get_summary_data())
+
+    @app.route('/api/summary/check')
+    @reading(hedger)
+    def api_summary_check():
+        """Verify the summary's running totals against a full recompute"""
+        return jsonify(hedger.check_aggregates())
     
+    def rows_response(name):
+        """Records filtered by the from/to/limit/cursor/order query parameters.
+
+        shape=columns returns one array per field instead of row objects.
+        The next page's cursor is sent in the X-Next-Cursor header. Bodies
+        are cached per version and query, compressed when the client accepts it.
+        """
+        encoding = request.accept_encodings.best_match(available_encodings())
+        version = hedger.version
+        key = (name, request.query_string, encoding)
+        cached = hedger.responses.get(version, key)
+        if cached is None:
+            cached = serialize_rows(name, encoding)
+            if isinstance(cached, Response):
+                return cached
+            hedger.responses.put(version, key, cached)
+        body, content_encoding, next_cursor = cached
+        response = Response(body, mimetype='application/json')
+        response.vary.add('Accept-Encoding')
+        if content_encoding:
+            response.headers['Content-Encoding'] = content_encoding
+        if next_cursor is not None:
+            response.headers['X-Next-Cursor'] = str(next_cursor)
+        return response
+
+    def serialize_rows(name, encoding):
+        try:
+            args = request.args
+            start, end = (dt.date.fromisoformat(args[key][:10]) if args.get(key) else None
+                          for key in ('from', 'to'))
+            limit = int(args['limit']) if args.get('limit') else None
+            cursor = int(args.get('cursor') or 0)
+            if (limit is not None and limit < 0) or cursor < 0:
+                raise ValueError("limit and cursor must not be negative")
+        except ValueError as e:
+            return jsonify({"status": "error", "message": f"Invalid query: {str(e)}"})
+        rows, next_cursor = hedger.query_rows(name, start, end, limit, cursor,
+                                              descending=args.get('order') == 'desc')
+        serializer = columns_json if args.get('shape') == 'columns' else records_json
+        body, content_encoding = compress(serializer(hedger.stores()[name], rows), encoding)
+        return body, content_encoding, next_cursor
+
     @app.route('/api/history')
+    @reading(hedger)
     def api_history():
         """API endpoint for position history"""
-        df = hedger.get_history_as_df()
-        if df.empty:
-            return jsonify([])
-        return jsonify(df.to_dict(orient='records'))
+        return rows_response('position_history')
     
     @app.route('/api/transactions')
+    @reading(hedger)
     def api_transactions():
         """API endpoint for stock transactions"""
-        df = hedger.get_transactions_as_df()
-        if df.empty:
-            return jsonify([])
-        return jsonify(df.to_dict(orient='records'))
+        return rows_response('stock_transactions')
     
+    def query_etag(*params):
+        """ETag for the current version and a view's parsed query parameters"""
+        digest = hashlib.blake2b(repr(params).encode(), digest_size=8).hexdigest()
+        return f"{hedger.etag_prefix}-{hedger.version}-{digest}"
+
     @app.route('/api/plots')
+    @reading(hedger)
     def api_plots():
-        """API endpoint for plot data"""
-        plots = hedger.generate_dashboard_plots()
+        """API endpoint for plot data, answering 304 while the history is unchanged.
+
+        Optional query parameters: points (per chart, 0 for all) and the
+        start/end dates (YYYY-MM-DD) of the range to show.
+        """
+        try:
+            points = request.args.get('points', PLOT_POINTS, type=int)
+            start, end = (dt.date.fromisoformat(request.args[name][:10]) if request.args.get(name) else None
+                          for name in ('start', 'end'))
+        except ValueError as e:
+            return jsonify({"status": "error", "message": f"Invalid plot range: {str(e)}"})
+        etag = query_etag(points, start, end)
+        if etag in request.if_none_match:
+            return '', 304, {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'}
+        plots = hedger.generate_dashboard_plots(points, start, end)
         if plots is None:
-            return jsonify({"status": "error", "message": "Not enough data points for plotting"})
-        return jsonify(plots)
+            response = jsonify({"status": "error", "message": "Not enough data points for plotting"})
+        else:
+            response = jsonify(plots)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    
+    @app.route('/api/analytics')
+    @reading(hedger)
+    def api_analytics():
+        """API endpoint for rolling risk analytics, answering 304 while the history is unchanged.
+
+        Optional query parameters: window (rows per window), points (0 for
+        every row) and the start/end dates (YYYY-MM-DD) of the range.
+        """
+        try:
+            window = request.args.get('window', DEFAULT_WINDOW, type=int)
+            points = request.args.get('points', PLOT_POINTS, type=int)
+            start, end = (dt.date.fromisoformat(request.args[name][:10]) if request.args.get(name) else None
+                          for name in ('start', 'end'))
+            if window < 2 or points < 0:
+                raise ValueError("window must be at least 2 and points not negative")
+        except ValueError as e:
+            return jsonify({"status": "error", "message": f"Invalid analytics query: {str(e)}"})
+        etag = query_etag(window, points, start, end)
+        if etag in request.if_none_match:
+            return '', 304, {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'}
+        analytics = hedger.rolling_analytics(window, points, start, end)
+        if analytics is None:
+            response = jsonify({"status": "error", "message": "Not enough data points for analytics"})
+        else:
+            response = jsonify({"status": "success", **analytics})
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    
+    @app.route('/api/events')
+    def api_events():
+        """Server-Sent Events stream of history appends and resets"""
+        headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        if not stream_slots.acquire():
+            # Every stream slot of this worker is taken; the client comes back later
+            return Response(busy_stream(), mimetype='text/event-stream', headers=headers)
+        events = hedger.events
+        subscriber = events.subscribe()
+        # Writes made by other worker processes are picked up while the stream idles
+        response = Response(events.stream(subscriber, on_idle=hedger.catch_up), mimetype='text/event-stream',
+                            headers=headers)
+
+        @response.call_on_close
+        def close():
+            events.unsubscribe(subscriber)
+            stream_slots.release()
+        return response
+    
+    @app.route('/api/plots/delta')
+    @reading(hedger)
+    def api_plots_delta():
+        """API endpoint for chart points added since the `since` version"""
+        return jsonify(hedger.plot_delta(request.args.get('since', -1, type=int)))
+    
+    def workers_error():
+        """400 for a workers value other than an integer from 1 to the CPU count"""
+        message = f"workers must be an integer from 1 to {os.cpu_count() or 1}"
+        return jsonify({"status": "error", "message": message}), 400
+
+    @app.route('/api/backtest', methods=['POST'])
+    def api_backtest():
+        """API endpoint to replay the stored option ticks under many rebalancing policies.
+
+        The body lists the parameters to sweep: bands (shares), vol_bands
+        (multiples of iv-scaled delta-shares) and intervals (days), plus
+        optional fixed/percentage costs (default: the current ones) and workers.
+        """
+        try:
+            data = request.json or {}
+            if not valid_workers(data.get('workers')):
+                return workers_error()
+            policies = policy_grid(data.get('bands', ()), data.get('vol_bands', ()), data.get('intervals', ()))
+            if not 0 < len(policies['kind']) <= MAX_POLICIES:
+                return jsonify({"status": "error", "message": f"Give between 1 and {MAX_POLICIES} policies"})
+            with hedger.reading():
+                columns = {name: hedger.options_data.column(name).copy()
+                           for name in ('date', 'expiration', 'delta', 'iv', 'position_size', 'underlying_price')}
+                costs = dict(hedger.transaction_costs)
+            results = run_backtest(columns, policies,
+                                   float(data.get('fixed', costs['stock_fixed'])),
+                                   float(data.get('percentage', costs['stock_percentage'])),
+                                   data.get('workers'))
+            names = list(results)
+            values = [results[name].tolist() for name in names]
+            return jsonify({
+                "status": "success",
+                "rows": len(columns['delta']),
+                "policies": [dict(zip(names, row), kind=kind, param=param)
+                             for kind, param, *row in zip(policies['kind'], policies['param'].tolist(), *values)]
+            })
+        except Exception as e:
+            return jsonify({"status": "error", "message": f"Error running backtest: {str(e)}"})
+    
+    @app.route('/api/simulate', methods=['POST'])
+    def api_simulate():
+        """API endpoint for the Monte Carlo distribution of hedge P&L and costs.
+
+        The body takes any SimulationParams field (plus workers); the option,
+        position and costs default to the latest stored tick and the
+        current transaction costs.
+        """
+        try:
+            data = dict(request.json or {})
+            workers = data.pop('workers', None)
+            if not valid_workers(workers):
+                return workers_error()
+            with hedger.reading():
+                defaults = {
+                    'fixed_cost': hedger.transaction_costs['stock_fixed'],
+                    'percentage_cost': hedger.transaction_costs['stock_percentage']
+                }
+                if hedger.options_data:
+                    latest = hedger.options_data[-1]
+                    defaults.update(spot=latest.underlying_price, strike=latest.strike_price,
+                                    days=latest.days_to_expiration, iv=latest.iv,
+                                    is_call=latest.option_type == 'call', position_size=latest.position_size)
+            params = SimulationParams(**{**defaults, **data})
+            summary = summarize(simulate(params, workers))
+            return jsonify({"status": "success", **summary, "plot": simulation_plot(summary)})
+        except Exception as e:
+            return jsonify({"status": "error", "message": f"Error running simulation: {str(e)}"})
     
     @app.route('/api/option-data', methods=['POST'])
+    @writing(hedger)
     def api_add_option_data():
         """API endpoint to add new option data"""
         try:
             data = request.json
             
-            # Convert string dates to date objects
-            date = dt.datetime.strptime(data['date'], "%Y-%m-%d").date()
-            expiration = dt.datetime.strptime(data['expiration'], "%Y-%m-%d").date()
-            
-            option_data = OptionData(
-                date=date,
-                underlying_price=float(data['underlying_price']),
-                strike_price=float(data['strike_price']),
-                option_price=float(data['option_price']),
-                iv=float(data['iv']),
-                delta=float(data['delta']),
-                expiration=expiration,
-                option_type=data['option_type'],
-                position_size=int(data['position_size'])
-            )
+            option_data = parse_option_data(data)
             
             hedger.add_option_data(option_data)
             result = hedger.update_hedge()[2]
@@ -87,27 +321,24 @@ def configure_routes(app, hedger):
         except Exception as e:
             return jsonify({"status": "error", "message": f"Error adding data: {str(e)}"})
     
+    @app.route('/api/option-data/bulk', methods=['POST'])
+    @writing(hedger)
+    def api_bulk_option_data():
+        """API endpoint to ingest option data in bulk (text/csv or application/x-ndjson body)"""
+        try:
+            fmt = 'csv' if request.mimetype in ('text/csv', 'application/csv') else 'ndjson'
+            return jsonify(ingest_stream(hedger, request.stream, fmt))
+        except Exception as e:
+            return jsonify({"status": "error", "message": f"Error ingesting data: {str(e)}"})
+    
     @app.route('/api/option-data/<int:index>', methods=['PUT'])
+    @writing(hedger)
     def api_edit_option_data(index):
         """API endpoint to edit option data"""
         try:
             data = request.json
             
-            # Convert string dates to date objects
-            date = dt.datetime.strptime(data['date'], "%Y-%m-%d").date()
-            expiration = dt.datetime.strptime(data['expiration'], "%Y-%m-%d").date()
-            
-            option_data = OptionData(
-                date=date,
-                underlying_price=float(data['underlying_price']),
-                strike_price=float(data['strike_price']),
-                option_price=float(data['option_price']),
-                iv=float(data['iv']),
-                delta=float(data['delta']),
-                expiration=expiration,
-                option_type=data['option_type'],
-                position_size=int(data['position_size'])
-            )
+            option_data = parse_option_data(data)
             
             success = hedger.edit_option_data(index, option_data)
             if success:
@@ -118,13 +349,28 @@ def configure_routes(app, hedger):
         except Exception as e:
             return jsonify({"status": "error", "message": f"Error updating data: {str(e)}"})
     
+    @app.route('/api/option-data/batch', methods=['PUT'])
+    @writing(hedger)
+    def api_edit_option_data_batch():
+        """API endpoint to edit several option data entries with one recalculation"""
+        try:
+            edits = [(int(data['index']), parse_option_data(data)) for data in request.json]
+            if any(not 0 <= index < len(hedger.options_data) for index, _ in edits):
+                return jsonify({"status": "error", "message": "Invalid index"})
+            
+            for index, option_data in edits:
+                hedger.edit_option_data(index, option_data)
+            hedger.save_data()
+            return jsonify({"status": "success", "message": f"{len(edits)} entries updated successfully"})
+        except Exception as e:
+            return jsonify({"status": "error", "message": f"Error updating data: {str(e)}"})
+    
     @app.route('/api/option-data/<int:index>', methods=['DELETE'])
+    @writing(hedger)
     def api_delete_option_data(index):
         """API endpoint to delete option data"""
         try:
-            if 0 <= index < len(hedger.options_data):
-                hedger.options_data.pop(index)
-                hedger._recalculate_position_history(0)
+            if hedger.delete_option_data(index):
                 hedger.save_data()
                 return jsonify({"status": "success", "message": "Data deleted successfully"})
             else:
@@ -133,6 +379,7 @@ def configure_routes(app, hedger):
             return jsonify({"status": "error", "message": f"Error deleting data: {str(e)}"})
     
     @app.route('/api/transaction-costs', methods=['POST'])
+    @writing(hedger)
     def api_set_transaction_costs():
         """API endpoint to set transaction costs"""
         try:
@@ -146,37 +393,33 @@ def configure_routes(app, hedger):
             return jsonify({"status": "error", "message": f"Error setting transaction costs: {str(e)}"})
     
     @app.route('/api/initial-capital', methods=['POST'])
+    @writing(hedger)
     def api_set_initial_capital():
         """API endpoint to set initial capital"""
         try:
             data = request.json
-            hedger.initial_capital = float(data['initial_capital'])
-            hedger._recalculate_position_history(0)
+            hedger.set_initial_capital(data['initial_capital'])
             hedger.save_data()
             return jsonify({"status": "success", "message": "Initial capital updated"})
         except Exception as e:
             return jsonify({"status": "error", "message": f"Error setting initial capital: {str(e)}"})
 
+    # Add data management routes
+    add_data_routes(app, hedger)
+
 # Additional routes from part 8
 
 # Add these additional route handlers to routes.py
 
 def add_data_routes(app, hedger):
     @app.route('/api/export-data')
+    @reading(hedger)
     def api_export_data():
         """API endpoint to export all data"""
-        data_dict = {
-            'options_data': [option.to_dict() for option in hedger.options_data],
-            'position_history': hedger.position_history,
-            'stock_transactions': hedger.stock_transactions,
-            'initial_capital': hedger.initial_capital,
-            'current_capital': hedger.current_capital,
-            'current_stock_units': hedger.current_stock_units,
-            'transaction_costs': hedger.transaction_costs
-        }
-        return jsonify(data_dict)
+        return jsonify(hedger.to_dict())
     
     @app.route('/api/import-data', methods=['POST'])
+    @writing(hedger)
     def api_import_data():
         """API endpoint to import data"""
         try:
@@ -190,46 +433,28 @@ def add_data_routes(app, hedger):
                 if key not in data:
                     return jsonify({"status": "error", "message": f"Missing required key: {key}"})
             
-            # Reset hedger data
-            hedger.options_data = []
-            hedger.position_history = []
-            hedger.stock_transactions = []
-            
-            # Import options data
+            # Check options data before replacing anything
             for option_dict in data['options_data']:
                 try:
-                    hedger.options_data.append(OptionData.from_dict(option_dict))
+                    OptionData.from_dict(dict(option_dict))
                 except Exception as e:
                     return jsonify({"status": "error", "message": f"Error parsing option data: {str(e)}"})
             
-            # Import other data
-            hedger.position_history = data['position_history']
-            hedger.stock_transactions = data['stock_transactions']
-            hedger.initial_capital = data['initial_capital']
-            hedger.current_capital = data['current_capital']
-            hedger.current_stock_units = data['current_stock_units']
-            
-            if 'transaction_costs' in data:
-                hedger.transaction_costs = data['transaction_costs']
-            
-            # Save imported data
-            hedger.save_data()
+            # Import data
+            if 'transaction_costs' not in data:
+                data['transaction_costs'] = hedger.transaction_costs
+            hedger.import_data(data)
             
             return jsonify({"status": "success", "message": "Data imported successfully"})
         except Exception as e:
             return jsonify({"status": "error", "message": f"Error importing data: {str(e)}"})
     
     @app.route('/api/clear-data', methods=['POST'])
+    @writing(hedger)
     def api_clear_data():
         """API endpoint to clear all data"""
         try:
-            hedger.options_data = []
-            hedger.position_history = []
-            hedger.stock_transactions = []
-            hedger.initial_capital = 100000
-            hedger.current_capital = 100000
-            hedger.current_stock_units = 0
-            hedger.transaction_costs = {'stock_fixed': 0, 'stock_percentage': 0}
+            hedger.clear_data()
             
             hedger.save_data()
             
@@ -237,97 +462,129 @@ def add_data_routes(app, hedger):
         except Exception as e:
             return jsonify({"status": "error", "message": f"Error clearing data: {str(e)}"})
 
-@app.route('/api/reset-data', methods=['POST'])
-def api_reset_data():
-    try:
-        hedger.options_data = []
-        hedger.position_history = []
-        hedger.stock_transactions = []
-        hedger.initial_capital = 100000
-        hedger.current_capital = 100000
-        hedger.current_stock_units = 0
-        hedger.transaction_costs = {'stock_fixed': 0, 'stock_percentage': 0}
-        hedger.save_data()
-        return jsonify({"status": "success", "message": "All data has been reset successfully"})
-    except Exception as e:
-        return jsonify({"status": "error", "message": str(e)})
-
-# Update the configure_routes function to include data routes
-def configure_routes(app, hedger):
-    # Existing routes...
-    
-    # Add data management routes
-    add_data_routes(app, hedger)
+    @app.route('/api/reset-data', methods=['POST'])
+    @writing(hedger)
+    def api_reset_data():
+        try:
+            hedger.clear_data()
+            hedger.save_data()
+            return jsonify({"status": "success", "message": "All data has been reset successfully"})
+        except Exception as e:
+            return jsonify({"status": "error", "message": str(e)})
 
-@app.route('/api/stock-position', methods=['POST'])
-def api_add_stock_position():
-    """API endpoint to add a new direct stock position"""
-    try:
-        data = request.json
+    @app.route('/api/stock-position', methods=['POST'])
+    @writing(hedger)
+    def api_add_stock_position():
+        """API endpoint to add a new direct stock position"""
+        try:
+            data = request.json
         
-        # Convert string date to date object
-        date = dt.datetime.strptime(data['date'], "%Y-%m-%d").date()
+            # Convert string date to date object
+            date = dt.datetime.strptime(data['date'], "%Y-%m-%d").date()
         
-        # Add manual stock position
-        result = hedger.add_stock_position(
-            date=date,
-            price=float(data['price']),
-            position_type=data['position_type'],  # 'LONG' or 'SHORT'
-            shares=int(data['shares'])
-        )
+            # Add manual stock position
+            result = hedger.add_stock_position(
+                date=date,
+                price=float(data['price']),
+                position_type=data['position_type'],  # 'LONG' or 'SHORT'
+                shares=int(data['shares'])
+            )
         
-        return jsonify(result)
-    except Exception as e:
-        return jsonify({"status": "error", "message": f"Error adding stock position: {str(e)}"})
-        # Add this route to routes.py
-@app.route('/api/transaction/<int:index>', methods=['DELETE'])
-def api_delete_transaction(index):
-    """API endpoint to delete a stock transaction"""
-    try:
-        if 0 <= index < len(hedger.stock_transactions):
-            # Get the transaction data before removing
-            transaction = hedger.stock_transactions[index]
-            
-            # Remove the transaction
-            hedger.stock_transactions.pop(index)
-            
-            # Recalculate position history
-            # This is more complex as we need to undo the transaction's effect
-            # Find the first position history entry after this transaction
-            transaction_date = dt.datetime.fromisoformat(transaction['date'])
-            start_index = 0
-            
-            for i, pos in enumerate(hedger.position_history):
-                pos_date = dt.datetime.fromisoformat(pos['date'])
-                if pos_date >= transaction_date:
-                    start_index = i
-                    break
+            return jsonify(result)
+        except Exception as e:
+            return jsonify({"status": "error", "message": f"Error adding stock position: {str(e)}"})
+
+    @app.route('/api/transaction/<int:index>', methods=['DELETE'])
+    @writing(hedger)
+    def api_delete_transaction(index):
+        """API endpoint to delete a stock transaction"""
+        try:
+            if hedger.delete_transaction(index):
+                hedger.save_data()
             
-            # Undo the transaction effect (reverse the stock change and capital change)
-            shares_adjustment = transaction['shares']
-            if transaction['action'] == 'LONG' or transaction['action'] == 'BUY':
-                shares_adjustment = -shares_adjustment  # Undo a buy by removing shares
+                return jsonify({"status": "success", "message": "Transaction deleted successfully"})
             else:
-                # For SHORT or SELL transactions, we add back the shares
-                pass
-            
-            # Update current stock position
-            hedger.current_stock_units += shares_adjustment
-            
-            # Update capital (add back the cost + fee)
-            hedger.current_capital += transaction['cost'] + transaction.get('transaction_fee', 0)
-            
-            # Recalculate position history from this point
-            hedger._recalculate_position_history(start_index)
-            
-            # Save the updated data
-            hedger.save_data()
-            
-            return jsonify({"status": "success", "message": "Transaction deleted successfully"})
-        else:
-            return jsonify({"status": "error", "message": "Invalid transaction index"})
-    except Exception as e:
-        return jsonify({"status": "error", "message": f"Error deleting transaction: {str(e)}"})
+                return jsonify({"status": "error", "message": "Invalid transaction index"})
+        except Exception as e:
+            return jsonify({"status": "error", "message": f"Error deleting transaction: {str(e)}"})
+
+def add_portfolio_routes(app, portfolio):
+    @app.route('/api/portfolio')
+    @reading(portfolio)
+    def api_portfolio():
+        """API endpoint for net delta and hedge per underlying"""
+        return jsonify(portfolio.get_summary_data())
+
+    @app.route('/api/portfolio/marks', methods=['POST'])
+    @writing(portfolio)
+    def api_portfolio_marks():
+        """API endpoint to mark one or more option positions (each with an `underlying`)"""
+        try:
+            data = request.json
+            marks = data if isinstance(data, list) else [data]
+            results = portfolio.apply_marks([(str(mark['underlying']), parse_option_data(mark)) for mark in marks])
+            return jsonify({
+                "status": "success",
+                "results": {underlying: result[2] for underlying, result in results.items()}
+            })
+        except Exception as e:
+            return jsonify({"status": "error", "message": f"Error marking positions: {str(e)}"})
+
+    @app.route('/api/portfolio/transaction-costs', methods=['POST'])
+    @writing(portfolio)
+    def api_portfolio_transaction_costs():
+        """API endpoint to update the portfolio's transaction costs"""
+        try:
+            data = request.json
+            portfolio.set_transaction_costs(data['fixed'], data['percentage'])
+            return jsonify({"status": "success", "message": "Transaction costs updated"})
+        except Exception as e:
+            return jsonify({"status": "error", "message": f"Error: {str(e)}"})
+
+    @app.route('/api/portfolio/clear', methods=['POST'])
+    @writing(portfolio)
+    def api_portfolio_clear():
+        """API endpoint to drop all portfolio positions"""
+        portfolio.clear_data()
+        portfolio.save_data()
+        return jsonify({"status": "success", "message": "Portfolio cleared"})
+
+def add_book_routes(app, books):
+    """Every hedger route again under /books/<book_id>/, served by that book's hedger"""
+    blueprint = Blueprint('books', __name__, url_prefix='/books/<book_id>')
+
+    @blueprint.url_value_preprocessor
+    def pop_book_id(endpoint, values):
+        g.book_id = values.pop('book_id')
+
+    @blueprint.url_defaults
+    def add_book_id(endpoint, values):
+        values.setdefault('book_id', g.book_id)
+
+    @blueprint.before_request
+    def load_book():
+        try:
+            g.hedger = books.get(g.book_id)
+        except Exception as e:
+            return jsonify({"status": "error", "message": f"Error loading book: {str(e)}"})
+
+    configure_routes(blueprint, LocalProxy(lambda: g.hedger))
+    app.register_blueprint(blueprint)
+
+    @app.route('/api/books')
+    def api_books():
+        """API endpoint for the loaded books: load latency, memory and use"""
+        books.evict_idle()
+        return jsonify(books.stats())
+
+def add_metrics_routes(app):
+    """Time every request and serve all metrics in the Prometheus text format"""
+    metrics.instrument(app)
+
+    @app.route('/metrics')
+    def api_metrics():
+        """Prometheus scrape endpoint; gauges and cache counters are read only now"""
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 # README.md - Setup Instructions
 """
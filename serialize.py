@@ -0,0 +1,114 @@
+# serialize.py - JSON encoding of stored rows straight from the column arrays
+import gzip
+import json
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from metrics import timed
+from store import DATE, ColumnStore, ordinals_to_datetime64
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = 1024
+
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 5
+
+# Serialized responses kept for the current version
+RESPONSE_CACHE_SIZE = 64
+
+
+def encode_column(store: ColumnStore, name: str, rows: Optional[np.ndarray] = None) -> List[str]:
+    """JSON text of each value in a column, the same as json.dumps would give"""
+    kind = store.schema[name]
+    column = store.column(name) if rows is None else store.column(name)[rows]
+    if kind == DATE:
+        # Dates repeat a lot, so only the distinct ones are formatted
+        days, inverse = np.unique(column, return_inverse=True)
+        text = np.asarray([f'"{d}"' for d in ordinals_to_datetime64(days).astype(str)], dtype=object)
+        return text[inverse].tolist()
+    if isinstance(kind, tuple):
+        return np.asarray([json.dumps(code) for code in kind], dtype=object)[column].tolist()
+    values = column.tolist()
+    if column.dtype.kind == 'f':
+        if np.isfinite(column).all():
+            return list(map(float.__repr__, values))
+        return list(map(json.dumps, values))
+    return list(map(str, values))
+
+
+@timed
+def records_json(store: ColumnStore, rows: Optional[np.ndarray] = None) -> bytes:
+    """JSON array of row objects, equal to json.dumps(store.to_records(rows))"""
+    if not len(store) or (rows is not None and not len(rows)):
+        return b'[]'
+    names = list(store.schema)
+    template = '{' + ','.join(f'{json.dumps(name)}:%s' for name in names) + '}'
+    columns = [encode_column(store, name, rows) for name in names]
+    return ('[' + ','.join([template % row for row in zip(*columns)]) + ']').encode()
+
+
+@timed
+def columns_json(store: ColumnStore, rows: Optional[np.ndarray] = None) -> bytes:
+    """JSON object of column name to array of values (a more compact shape)"""
+    if not len(store) or (rows is not None and not len(rows)):
+        columns = {name: '' for name in store.schema}
+    else:
+        columns = {name: ','.join(encode_column(store, name, rows)) for name in store.schema}
+    return ('{' + ','.join(f'{json.dumps(name)}:[{text}]' for name, text in columns.items()) + '}').encode()
+
+
+def available_encodings() -> List[str]:
+    return ['br', 'gzip'] if brotli else ['gzip']
+
+
+@timed
+def compress(body: bytes, encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    """Compress a body with the negotiated encoding; returns (body, Content-Encoding)"""
+    if len(body) < COMPRESS_MIN_BYTES or encoding not in available_encodings():
+        return body, None
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY), 'br'
+    return gzip.compress(body, GZIP_LEVEL), 'gzip'
+
+
+class ResponseCache:
+    """Serialized response bodies by request key, dropped whenever the version changes"""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.version = None
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, version: int, key: Tuple):
+        with self._lock:
+            if version != self.version:
+                self.version = version
+                self._entries.clear()
+                self.misses += 1
+                return None
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return entry
+
+    def put(self, version: int, key: Tuple, entry) -> None:
+        with self._lock:
+            if version != self.version:
+                return
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -0,0 +1,172 @@
+# simulate.py - Monte Carlo distribution of delta hedge P&L
+import os
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import numpy as np
+
+from backtest import process_pool
+from engine import DEAD_BAND, hedge_units
+from pricing import RISK_FREE_RATE, bs_delta, bs_price
+
+# Paths simulated together; bounds memory at a few (paths x steps) float arrays
+CHUNK_PATHS = 8192
+
+# Paths below which a simulation runs in-process instead of on the pool
+PARALLEL_MIN_PATHS = 20_000
+
+MAX_PATHS = 1_000_000
+MAX_STEPS = 2520
+
+HISTOGRAM_BINS = 100
+
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+
+
+@dataclass
+class SimulationParams:
+    """One option position hedged along simulated price paths.
+
+    Paths follow GBM with drift `mu` and volatility `vol`, plus Merton
+    jumps when jump_intensity (jumps per year) is non-zero. Deltas are
+    Black-Scholes at `iv`, so vol != iv simulates hedging a mispriced option.
+    """
+    spot: float
+    strike: float
+    days: int
+    iv: float
+    is_call: bool = True
+    position_size: int = 1
+    vol: Optional[float] = None  # defaults to iv
+    mu: float = 0.0
+    rate: float = RISK_FREE_RATE
+    jump_intensity: float = 0.0
+    jump_mean: float = 0.0
+    jump_std: float = 0.0
+    paths: int = 10_000
+    steps: int = 252
+    band: float = DEAD_BAND
+    fixed_cost: float = 0.0
+    percentage_cost: float = 0.0
+    seed: Optional[int] = None
+
+    def __post_init__(self):
+        if self.vol is None:
+            self.vol = self.iv
+        if not 0 < self.paths <= MAX_PATHS or not 0 < self.steps <= MAX_STEPS:
+            raise ValueError(f"paths must be in 1..{MAX_PATHS} and steps in 1..{MAX_STEPS}")
+        if min(self.spot, self.strike, self.days, self.iv, self.vol) <= 0:
+            raise ValueError("spot, strike, days, iv and vol must be positive")
+
+
+def simulate_chunk(params: SimulationParams, paths: int, seed) -> Dict[str, np.ndarray]:
+    """Hedge P&L, fees and trade counts for one chunk of paths.
+
+    Prices and deltas are computed for the whole (paths x steps) block at
+    once; the rebalancing then walks the steps with the paths as arrays,
+    trading with the same band and cost rule as DeltaHedger.update_hedge.
+    As there, the opening hedge is bought at the first step without a fee
+    and isn't counted: trades and fees cover the rebalancing only.
+    """
+    rng = np.random.default_rng(seed)
+    years = params.days / 365.0
+    dt = years / params.steps
+
+    drift = params.mu - 0.5 * params.vol ** 2
+    returns = drift * dt + params.vol * np.sqrt(dt) * rng.standard_normal((paths, params.steps))
+    if params.jump_intensity:
+        # Compensated so jumps leave the expected return at mu
+        compensator = params.jump_intensity * (np.exp(params.jump_mean + 0.5 * params.jump_std ** 2) - 1)
+        jumps = rng.poisson(params.jump_intensity * dt, (paths, params.steps))
+        returns += (jumps * params.jump_mean + np.sqrt(jumps) * params.jump_std
+                    * rng.standard_normal((paths, params.steps)) - compensator * dt)
+    prices = np.empty((paths, params.steps + 1))
+    prices[:, 0] = params.spot
+    prices[:, 1:] = params.spot * np.exp(np.cumsum(returns, axis=1))
+    del returns
+
+    remaining = years - dt * np.arange(params.steps)
+    target = hedge_units(bs_delta(prices[:, :-1], params.strike, remaining, params.iv, params.is_call, params.rate),
+                         params.position_size)
+
+    held = target[:, 0].copy()
+    cash = -held * params.spot
+    fees = np.zeros(paths)
+    trades = np.zeros(paths, dtype=np.int64)
+    for step in range(1, params.steps):
+        price = prices[:, step]
+        adjustment = target[:, step] - held
+        trade = np.abs(adjustment) > params.band
+        adjustment[~trade] = 0.0
+        fee = np.where(trade, params.fixed_cost + np.abs(adjustment) * price * params.percentage_cost, 0.0)
+        held += adjustment
+        cash -= adjustment * price + fee
+        fees += fee
+        trades += trade
+
+    final = prices[:, -1]
+    premium = float(bs_price(params.spot, params.strike, years, params.iv, params.is_call, params.rate))
+    payoff = np.maximum(final - params.strike, 0.0) if params.is_call else np.maximum(params.strike - final, 0.0)
+    # Option bought at the model price, stock marked at expiry
+    pnl = (payoff - premium) * params.position_size * 100 + held * final + cash
+    return {'pnl': pnl, 'fees': fees, 'trades': trades}
+
+
+def simulate(params: SimulationParams, workers: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """Per-path hedge P&L, fees and trades; chunks run on the process pool for large runs.
+
+    Every chunk draws from its own seed spawned from params.seed, so results
+    don't depend on how the chunks are spread over workers.
+    """
+    sizes = [min(CHUNK_PATHS, params.paths - start) for start in range(0, params.paths, CHUNK_PATHS)]
+    seeds = np.random.SeedSequence(params.seed).spawn(len(sizes))
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(sizes) == 1 or params.paths < PARALLEL_MIN_PATHS:
+        results = [simulate_chunk(params, size, seed) for size, seed in zip(sizes, seeds)]
+    else:
+        with process_pool(workers) as pool:
+            futures = [pool.submit(simulate_chunk, params, size, seed) for size, seed in zip(sizes, seeds)]
+            results = [future.result() for future in futures]
+    return {name: np.concatenate([result[name] for result in results]) for name in results[0]}
+
+
+def summarize(results: Dict[str, np.ndarray]) -> Dict:
+    """Mean, deviation and percentiles of each result, plus a P&L histogram"""
+    summary = {}
+    for name, values in results.items():
+        values = values.astype(np.float64)
+        summary[name] = {
+            "mean": float(values.mean()),
+            "std": float(values.std()),
+            "min": float(values.min()),
+            "max": float(values.max()),
+            "percentiles": dict(zip(map(str, PERCENTILES), np.percentile(values, PERCENTILES).tolist()))
+        }
+    counts, edges = np.histogram(results['pnl'], bins=HISTOGRAM_BINS)
+    summary['histogram'] = {"counts": counts.tolist(), "edges": edges.tolist()}
+    return summary
+
+
+def simulation_plot(summary: Dict) -> str:
+    """Plotly JSON of the P&L histogram"""
+    import plotly.graph_objects as go
+    edges = np.asarray(summary['histogram']['edges'])
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=(edges[:-1] + edges[1:]) / 2,
+        y=summary['histogram']['counts'],
+        width=np.diff(edges),
+        name='Paths',
+        marker=dict(color='rgb(49, 130, 189)')
+    ))
+    for name, dash in (('5', 'dot'), ('50', 'dash'), ('95', 'dot')):
+        fig.add_vline(x=summary['pnl']['percentiles'][name], line=dict(color='rgb(214, 39, 40)', dash=dash))
+    fig.update_layout(
+        title='Simulated Hedge P&L',
+        xaxis_title='P&L ($)',
+        yaxis_title='Paths',
+        template='plotly_white',
+        height=300,
+        margin=dict(l=10, r=10, t=40, b=10)
+    )
+    return fig.to_json()
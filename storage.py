@@ -0,0 +1,142 @@
+# storage.py - Snapshot storage backends
+import json
+import os
+import shutil
+from typing import Dict
+
+import numpy as np
+
+from journal import write_atomic
+
+
+class JSONBackend:
+    """Snapshot as one JSON document (the original data file format)"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def size(self) -> int:
+        return os.path.getsize(self.path) if self.exists() else 0
+
+    def token(self):
+        """Changes whenever a new snapshot is written (by any process)"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def save(self, hedger, journal_seq: int) -> int:
+        """Write the hedger state atomically; returns bytes written"""
+        data_dict = hedger.to_dict()
+        data_dict['journal_seq'] = journal_seq
+        data = json.dumps(data_dict, separators=(',', ':')).encode()
+        write_atomic(self.path, data)
+        return len(data)
+
+    def load(self, hedger) -> int:
+        """Restore the hedger state; returns the journal seq the snapshot covers"""
+        with open(self.path, 'r') as f:
+            data_dict = json.load(f)
+        hedger.load_state(data_dict)
+        return data_dict.get('journal_seq', 0)
+
+
+class NpyBackend:
+    """Snapshot as a directory of .npy column files that workers map lazily.
+
+    Each snapshot is written to a new generation directory; the CURRENT file
+    is switched atomically afterwards, so a crash mid-write leaves the
+    previous generation in place. Columns are opened with mmap_mode='c', so
+    loading reads no row data and in-place edits stay private to the process.
+    """
+
+    def __init__(self, path: str, legacy_json: str = None):
+        self.path = path
+        # A JSON data file to migrate from when no snapshot has been written yet
+        self.legacy_json = legacy_json
+
+    def _current(self):
+        try:
+            with open(os.path.join(self.path, 'CURRENT')) as f:
+                return f.read().strip()
+        except OSError:
+            return None
+
+    def exists(self) -> bool:
+        return self._current() is not None or bool(self.legacy_json and os.path.exists(self.legacy_json))
+
+    def token(self):
+        """Changes whenever a new snapshot is written (by any process)"""
+        generation = self._current()
+        if generation is None and self.legacy_json:
+            return JSONBackend(self.legacy_json).token()
+        return generation
+
+    def size(self) -> int:
+        generation = self._current()
+        if generation is None:
+            return 0
+        directory = os.path.join(self.path, generation)
+        return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+    def save(self, hedger, journal_seq: int) -> int:
+        """Write a new generation of column files; returns bytes written"""
+        current = self._current()
+        generation = f"gen-{int(current.split('-')[1]) + 1 if current else 1:08d}"
+        directory = os.path.join(self.path, generation)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+
+        written = 0
+        for store_name, store in hedger.snapshot_stores().items():
+            for column_name, column in store.columns().items():
+                with open(os.path.join(directory, f"{store_name}.{column_name}.npy"), 'wb') as f:
+                    np.save(f, column)
+                    f.flush()
+                    os.fsync(f.fileno())
+                    written += f.tell()
+
+        meta = dict(hedger.settings(), journal_seq=journal_seq,
+                    lengths={name: len(store) for name, store in hedger.snapshot_stores().items()})
+        data = json.dumps(meta).encode()
+        write_atomic(os.path.join(directory, 'meta.json'), data)
+        write_atomic(os.path.join(self.path, 'CURRENT'), generation.encode())
+
+        # Older generations are no longer referenced; open maps stay valid after unlinking
+        for name in os.listdir(self.path):
+            if name.startswith('gen-') and name != generation:
+                shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+        return written + len(data)
+
+    def load(self, hedger) -> int:
+        """Map the current generation into the hedger; returns its journal seq"""
+        generation = self._current()
+        if generation is None:
+            return JSONBackend(self.legacy_json).load(hedger)
+
+        directory = os.path.join(self.path, generation)
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+
+        columns: Dict[str, Dict[str, np.ndarray]] = {}
+        for store_name, store in hedger.snapshot_stores().items():
+            columns[store_name] = {}
+            for column_name in store.schema:
+                column_path = os.path.join(directory, f"{store_name}.{column_name}.npy")
+                if os.path.exists(column_path):
+                    # Empty files can't be mapped
+                    mmap_mode = 'c' if meta['lengths'].get(store_name) else None
+                    columns[store_name][column_name] = np.load(column_path, mmap_mode=mmap_mode)
+        hedger.load_columns(columns, meta)
+        return meta.get('journal_seq', 0)
+
+
+def open_backend(path: str):
+    """Pick a backend from the data path: *.json files or *.store directories"""
+    if path.endswith('.store'):
+        return NpyBackend(path, legacy_json=path[:-len('.store')] + '.json')
+    return JSONBackend(path)
@@ -0,0 +1,367 @@
+# store.py - Columnar, array-backed record storage
+import datetime as dt
+import threading
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Column kinds: a NumPy dtype, DATE (int64 day ordinals) or a tuple of codes (int8)
+DATE = 'date'
+
+# Day ordinal of 1970-01-01, used to turn ordinals into datetime64 without copies per row
+EPOCH_ORDINAL = dt.date(1970, 1, 1).toordinal()
+
+OPTION_SCHEMA = {
+    'date': DATE,
+    'underlying_price': np.float64,
+    'strike_price': np.float64,
+    'option_price': np.float64,
+    'iv': np.float64,
+    'delta': np.float64,
+    'expiration': DATE,
+    'option_type': ('call', 'put'),
+    'position_size': np.int64,
+}
+
+HISTORY_SCHEMA = {
+    'date': DATE,
+    'underlying_price': np.float64,
+    'iv': np.float64,
+    'delta': np.float64,
+    'stock_position': np.float64,
+    'capital': np.float64,
+    'transaction_type': ('HEDGE', 'MANUAL'),
+}
+
+TRANSACTION_SCHEMA = {
+    'date': DATE,
+    'shares': np.float64,
+    'price': np.float64,
+    'action': ('BUY', 'SELL', 'LONG', 'SHORT'),
+    'cost': np.float64,
+    'transaction_fee': np.float64,
+    'type': ('HEDGE', 'MANUAL'),
+    'row': np.int64,  # position_history row the trade was recorded with
+}
+
+# Running sums over stock_transactions kept for the summary (see DeltaHedger.totals)
+TRADE_TOTALS = ('fees',) + tuple(f"{action.lower()}_{measure}" for measure in ('trades', 'shares', 'notional')
+                                  for action in TRANSACTION_SCHEMA['action'])
+
+# Replay state captured before every CHECKPOINT_INTERVAL-th history row
+CHECKPOINT_SCHEMA = {
+    'row': np.int64,
+    'stock_units': np.float64,
+    'capital': np.float64,
+    'transactions': np.int64,
+    **{name: np.float64 for name in TRADE_TOTALS}
+}
+
+
+def to_ordinal(value) -> int:
+    """Convert a date, datetime or ISO string to a day ordinal"""
+    if isinstance(value, str):
+        value = dt.date.fromisoformat(value[:10])
+    return value.toordinal()
+
+
+def ordinals_to_datetime64(ordinals: np.ndarray) -> np.ndarray:
+    """Vectorized conversion of day ordinals to datetime64[D]"""
+    return (ordinals - EPOCH_ORDINAL).astype('datetime64[D]')
+
+
+class ColumnStore:
+    """Growable NumPy columns holding one record per row.
+
+    Appends are amortized O(1) (capacity doubles when full) and readers get
+    views of the filled part of each column instead of per-row objects.
+    Indexing a single row still returns a dict so existing callers keep working,
+    or a `record_type` instance (built with its from_dict) when one is given.
+    """
+
+    def __init__(self, schema: Dict, capacity: int = 64, record_type=None):
+        self.schema = schema
+        self.record_type = record_type
+        self._size = 0
+        # Bumped by every change other than appending rows (see DateIndex)
+        self.generation = 0
+        self._data: Dict[str, np.ndarray] = {
+            name: np.empty(capacity, dtype=self._dtype(kind)) for name, kind in schema.items()
+        }
+
+    @staticmethod
+    def _dtype(kind):
+        if kind == DATE:
+            return np.int64
+        if isinstance(kind, tuple):
+            return np.int8
+        return kind
+
+    def _encode(self, name: str, value):
+        kind = self.schema[name]
+        if kind == DATE:
+            return to_ordinal(value)
+        if isinstance(kind, tuple):
+            # Missing codes fall back to the first (default) code
+            return kind.index(value) if value is not None else 0
+        return value
+
+    def _decode(self, name: str, value):
+        kind = self.schema[name]
+        if kind == DATE:
+            return dt.date.fromordinal(int(value)).isoformat()
+        if isinstance(kind, tuple):
+            return kind[value]
+        return value.item()
+
+    def _reserve(self, size: int) -> None:
+        capacity = len(next(iter(self._data.values())))
+        if size <= capacity:
+            return
+        new_capacity = max(size, capacity * 2, 64)
+        for name, column in self._data.items():
+            grown = np.empty(new_capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            self._data[name] = grown
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __bool__(self) -> bool:
+        return self._size > 0
+
+    def __getitem__(self, index: int):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._size))]
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError('row index out of range')
+        record = {name: self._decode(name, column[index]) for name, column in self._data.items()}
+        return self.record_type.from_dict(record) if self.record_type else record
+
+    def __setitem__(self, index: int, record) -> None:
+        if not isinstance(record, dict):
+            record = vars(record)
+        for name in self._data:
+            self.set_value(index, name, record[name])
+        self.generation += 1
+
+    def __iter__(self):
+        if self.record_type:
+            return (self[i] for i in range(self._size))
+        return iter(self.to_records())
+
+    def append(self, record) -> None:
+        """Append one record; missing fields default to 0 / the first code"""
+        if not isinstance(record, dict):
+            record = vars(record)
+        self._reserve(self._size + 1)
+        for name, column in self._data.items():
+            column[self._size] = self._encode(name, record.get(name)) if name in record else 0
+        self._size += 1
+
+    def extend(self, columns: Dict[str, Iterable]) -> None:
+        """Append many rows at once from already encoded column arrays"""
+        count = len(next(iter(columns.values())))
+        self._reserve(self._size + count)
+        for name, column in self._data.items():
+            column[self._size:self._size + count] = columns.get(name, 0)
+        self._size += count
+
+    def adopt(self, columns: Dict[str, np.ndarray]) -> None:
+        """Take over already encoded arrays (e.g. memory-mapped files) without copying.
+
+        Columns missing from `columns` are zero-filled; the arrays are only
+        copied once an append outgrows them.
+        """
+        size = len(next(iter(columns.values()))) if columns else 0
+        self._data = {
+            name: columns[name] if name in columns else np.zeros(size, dtype=self._dtype(kind))
+            for name, kind in self.schema.items()
+        }
+        self._size = size
+        self.generation += 1
+
+    def set_value(self, index: int, name: str, value) -> None:
+        """Overwrite a single field of an existing row"""
+        if index < 0:
+            index += self._size
+        self._data[name][index] = self._encode(name, value)
+        self.generation += 1
+
+    def set_column(self, name: str, values) -> None:
+        """Overwrite a whole column with already encoded values"""
+        self._data[name][:self._size] = values
+        self.generation += 1
+
+    def put(self, name: str, rows: np.ndarray, values) -> None:
+        """Overwrite a column at the given row indices with already encoded values"""
+        self._data[name][:self._size][rows] = values
+        self.generation += 1
+
+    def add_to_column(self, name: str, amount: float, start: int = 0) -> None:
+        """Shift a numeric column by a constant from row `start` onward"""
+        self._data[name][start:self._size] += amount
+        self.generation += 1
+
+    def delete(self, index: int):
+        """Remove a row, shifting later rows down, and return it"""
+        record = self[index]
+        if index < 0:
+            index += self._size
+        for column in self._data.values():
+            column[index:self._size - 1] = column[index + 1:self._size]
+        self._size -= 1
+        self.generation += 1
+        return record
+
+    pop = delete
+
+    def truncate(self, size: int) -> None:
+        """Drop every row from `size` onward"""
+        if size < self._size:
+            self._size = max(0, size)
+            self.generation += 1
+
+    def clear(self) -> None:
+        self._size = 0
+        self.generation += 1
+
+    def column(self, name: str) -> np.ndarray:
+        """Read-only zero-copy view of the filled part of a column"""
+        view = self._data[name][:self._size]
+        view.flags.writeable = False
+        return view
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        return {name: self.column(name) for name in self._data}
+
+    def decoded_column(self, name: str) -> np.ndarray:
+        """Column with dates as datetime64 and codes as strings"""
+        kind = self.schema[name]
+        view = self.column(name)
+        if kind == DATE:
+            return ordinals_to_datetime64(view)
+        if isinstance(kind, tuple):
+            return np.asarray(kind, dtype=object)[view]
+        return view
+
+    def to_frame(self) -> 'pd.DataFrame':
+        """DataFrame over the stored columns (numeric columns are not copied)"""
+        import pandas as pd  # only needed here; keeps it out of startup
+
+        if not self._size:
+            return pd.DataFrame()
+        data = {name: self.decoded_column(name) for name in self._data}
+        data['date'] = pd.to_datetime(data['date'])
+        return pd.DataFrame(data, copy=False)
+
+    def to_records(self, rows: Optional[np.ndarray] = None) -> List[Dict]:
+        """List of JSON-ready dicts, e.g. for export or saving (optionally only `rows`)"""
+        if not self._size or (rows is not None and not len(rows)):
+            return []
+        names = list(self._data)
+        values = []
+        for name in names:
+            kind = self.schema[name]
+            column = self.column(name) if rows is None else self.column(name)[rows]
+            if kind == DATE:
+                values.append([d.isoformat() for d in ordinals_to_datetime64(column).astype(object)])
+            elif isinstance(kind, tuple):
+                values.append(np.asarray(kind, dtype=object)[column].tolist())
+            else:
+                values.append(column.tolist())
+        return [dict(zip(names, row)) for row in zip(*values)]
+
+    def load_records(self, records: Optional[Iterable[Dict]]) -> None:
+        """Replace the contents with the given list of dicts"""
+        records = list(records or [])
+        self.clear()
+        if not records:
+            return
+        columns = {}
+        for name, kind in self.schema.items():
+            values = [record.get(name) for record in records]
+            if kind == DATE:
+                values = np.array([value[:10] if isinstance(value, str) else value for value in values],
+                                  dtype='datetime64[D]').astype(np.int64) + EPOCH_ORDINAL
+            elif isinstance(kind, tuple):
+                codes = {code: i for i, code in enumerate(kind)}
+                values = [codes[value] if value is not None else 0 for value in values]
+            else:
+                values = [0 if value is None else value for value in values]
+            columns[name] = np.asarray(values, dtype=self._dtype(kind))
+        self.extend(columns)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in self._data.values())
+
+
+class DateIndex:
+    """Rows of a ColumnStore in date order, for O(log n + k) range lookups.
+
+    While rows arrive in date order the index is the row order itself and
+    appends only check the new rows. Any other change to the store, or an
+    out-of-order append, makes the next lookup sort the dates once.
+    """
+
+    def __init__(self, store: ColumnStore, column: str = 'date'):
+        self.store = store
+        self.column = column
+        self._generation = None
+        self._size = 0
+        # Row numbers in date order and their dates; None while rows are already sorted
+        self._order: Optional[np.ndarray] = None
+        self._sorted: Optional[np.ndarray] = None
+        # Concurrent readers may both find the index stale
+        self._lock = threading.Lock()
+
+    def _sync(self) -> None:
+        with self._lock:
+            self._update()
+
+    def _update(self) -> None:
+        dates = self.store.column(self.column)
+        size = len(dates)
+        if self._generation == self.store.generation:
+            if size == self._size:
+                return
+            if self._order is None and size > self._size:
+                new = dates[max(self._size - 1, 0):]
+                if (new[1:] >= new[:-1]).all():
+                    self._size = size
+                    return
+        self._generation = self.store.generation
+        self._size = size
+        if (dates[1:] >= dates[:-1]).all():
+            self._order = self._sorted = None
+        else:
+            self._order = np.argsort(dates, kind='stable')
+            self._sorted = dates[self._order]
+
+    def __len__(self) -> int:
+        self._sync()
+        return self._size
+
+    def span(self, start=None, end=None) -> Tuple[int, int]:
+        """Positions [lo, hi) in date order of the rows dated from start to end inclusive"""
+        self._sync()
+        dates = self.store.column(self.column) if self._order is None else self._sorted
+        lo = int(np.searchsorted(dates, to_ordinal(start), 'left')) if start is not None else 0
+        hi = int(np.searchsorted(dates, to_ordinal(end), 'right')) if end is not None else self._size
+        return lo, max(lo, hi)
+
+    def rows(self, lo: int, hi: int) -> np.ndarray:
+        """Row numbers at positions [lo, hi) in date order"""
+        self._sync()
+        return np.arange(lo, hi) if self._order is None else self._order[lo:hi]
+
+    def take(self, positions: np.ndarray) -> np.ndarray:
+        """Row numbers at the given positions in date order"""
+        self._sync()
+        return positions if self._order is None else self._order[positions]
@@ -0,0 +1,144 @@
+# tests/test_analytics.py - Rolling analytics against windows summed row by row
+import datetime as dt
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+from analytics import SERIES, RollingAnalytics
+from models import OptionData
+from hedger import DeltaHedger
+from pricing import DAYS_PER_YEAR, bs_gamma
+from store import HISTORY_SCHEMA
+
+START = dt.date(2024, 1, 1)
+EXPIRATION = dt.date(2024, 6, 1)
+
+
+def option(day: int, rng) -> OptionData:
+    price = 100.0 * math.exp(rng.normal(0, 0.05))
+    return OptionData(START + dt.timedelta(days=day), price, 100.0, rng.uniform(3, 8),
+                      rng.uniform(0.15, 0.3), rng.uniform(0.3, 0.7), EXPIRATION, 'call', 10)
+
+
+def change(hedger: DeltaHedger, method, *args) -> None:
+    with hedger.writing():
+        method(*args)
+
+
+def tick(hedger: DeltaHedger, day: int, rng) -> None:
+    with hedger.writing():
+        hedger.add_option_data(option(day, rng))
+        hedger.update_hedge()
+
+
+def row_steps(hedger: DeltaHedger) -> list:
+    """Each history row's step, computed one row at a time"""
+    history, options = hedger.position_history.to_records(), hedger.options_data.to_records()
+    option_row, hedges = [], 0
+    for record in history:
+        hedges += record['transaction_type'] == 'HEDGE'
+        option_row.append(hedges - 1 if 0 < hedges <= len(options) else None)
+
+    def field(i, name):
+        k = option_row[i]
+        if k is None:
+            return 0.0
+        value = options[k][name]
+        return dt.date.fromisoformat(value).toordinal() if name == 'expiration' else value
+
+    steps = [{'return_sq': 0.0, 'years': 0.0, 'iv': history[0]['iv'], 'gamma_pnl': 0.0, 'theta_pnl': 0.0,
+              'option_pnl': 0.0, 'stock_pnl': 0.0}]
+    for i in range(1, len(history)):
+        before, row = history[i - 1], history[i]
+        p0, p1, vol = before['underlying_price'], row['underlying_price'], before['iv']
+        day0, day1 = (dt.date.fromisoformat(r['date']).toordinal() for r in (before, row))
+        years_left = (field(i - 1, 'expiration') - day0) / DAYS_PER_YEAR
+        contracts = field(i - 1, 'position_size') * 100.0
+        gamma = 0.0
+        if option_row[i - 1] is not None and years_left > 0 and vol > 0:
+            gamma = float(bs_gamma(np.array([p0]), field(i - 1, 'strike_price'), years_left, vol)[0]) * contracts
+        years = max(day1 - day0, 0) / DAYS_PER_YEAR
+        steps.append({
+            'return_sq': math.log(p1 / p0) ** 2,
+            'years': years,
+            'iv': row['iv'],
+            'gamma_pnl': 0.5 * gamma * (p1 - p0) ** 2,
+            'theta_pnl': -0.5 * vol * vol * p0 * p0 * gamma * years,
+            'option_pnl': contracts * (field(i, 'option_price') - field(i - 1, 'option_price')),
+            'stock_pnl': before['stock_position'] * (p1 - p0)
+        })
+    return steps
+
+
+def windows(steps: list, window: int) -> dict:
+    """SERIES at every row, summing its window's steps directly"""
+    series = {name: [] for name in SERIES}
+    for row in range(len(steps)):
+        part = steps[max(0, row - window + 1):row + 1]
+        total = {name: sum(step[name] for step in part) for name in steps[0]}
+        realized = math.sqrt(total['return_sq'] / total['years']) if total['years'] > 0 else math.nan
+        implied = total['iv'] / len(part)
+        hedged = total['option_pnl'] + total['stock_pnl']
+        values = {
+            'realized_vol': realized, 'implied_vol': implied, 'vol_spread': realized - implied,
+            'hedged_pnl': hedged, 'gamma_pnl': total['gamma_pnl'], 'theta_pnl': total['theta_pnl'],
+            'hedge_error': hedged - total['gamma_pnl'] - total['theta_pnl']
+        }
+        for name in SERIES:
+            series[name].append(values[name])
+    return series
+
+
+def assert_matches_windows(hedger: DeltaHedger, window: int) -> None:
+    with hedger.reading():
+        expected = windows(row_steps(hedger), window)
+        rows = np.arange(len(hedger.position_history))
+        maintained = hedger.analytics.series(rows, window)
+        fresh = RollingAnalytics(hedger.position_history, hedger.options_data).series(rows, window)
+    for name in SERIES:
+        np.testing.assert_allclose(maintained[name], expected[name], rtol=1e-7, atol=1e-6, err_msg=name)
+        np.testing.assert_allclose(fresh[name], maintained[name], rtol=1e-9, atol=1e-9, err_msg=name)
+
+
+def test_windows_follow_ticks_trades_and_edits(tmp_path):
+    rng = np.random.default_rng(0)
+    hedger = DeltaHedger(str(tmp_path / 'analytics.store'))
+    for day in range(15):
+        tick(hedger, day, rng)
+        if day % 5 == 4:
+            assert_matches_windows(hedger, 5)
+    # Manual rows sit between the option rows they don't hedge
+    change(hedger, hedger.add_stock_position, START + dt.timedelta(days=14), 101.0, 'LONG', 20)
+    for day in range(15, 25):
+        tick(hedger, day, rng)
+    change(hedger, hedger.add_stock_position, START + dt.timedelta(days=24), 99.0, 'SHORT', 7)
+    for window in (2, 5, 40):
+        assert_matches_windows(hedger, window)
+
+    change(hedger, hedger.edit_option_data, 3, option(3, rng))
+    change(hedger, hedger.delete_option_data, 10)
+    tick(hedger, 25, rng)
+    for window in (2, 7):
+        assert_matches_windows(hedger, window)
+
+
+def test_rolling_analytics_range_and_points(tmp_path):
+    rng = np.random.default_rng(1)
+    hedger = DeltaHedger(str(tmp_path / 'analytics.store'))
+    for day in range(60):
+        tick(hedger, day, rng)
+    with hedger.reading():
+        full = hedger.rolling_analytics(10, 0)
+        ranged = hedger.rolling_analytics(10, 0, START + dt.timedelta(days=20), START + dt.timedelta(days=39))
+        thinned = hedger.rolling_analytics(10, 12)
+    assert full['x'][0] == START.isoformat() and len(full['x']) == 60
+    assert ranged['x'] == full['x'][20:40]
+    assert ranged['hedged_pnl'] == full['hedged_pnl'][20:40]
+    assert len(thinned['x']) == 12
+    assert thinned['x'][0] == full['x'][0] and thinned['x'][-1] == full['x'][-1]
+    # The first row has no elapsed time, so its realized vol is sent as null
+    assert full['realized_vol'][0] is None
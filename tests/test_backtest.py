@@ -0,0 +1,43 @@
+# tests/test_backtest.py - Rebalancing policies replayed over option ticks
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+from backtest import backtest, policy_grid
+
+
+def ticks(delta):
+    """Encoded option columns for one contract, a tick a day"""
+    rows = len(delta)
+    return {
+        'delta': np.asarray(delta, dtype=np.float64),
+        'position_size': np.ones(rows, dtype=np.int64),
+        'underlying_price': np.full(rows, 100.0),
+        'date': 738000 + np.arange(rows),
+        'expiration': np.full(rows, 738400),
+        'iv': np.full(rows, 0.2)
+    }
+
+
+def test_band_policy_skips_small_first_error():
+    # Targets of -2, -4 and -9 shares; a 5 share band first trades on the third
+    result = backtest(ticks([0.02, 0.04, 0.09]), policy_grid(bands=[5.0, 0.01]), fixed_cost=1.0)
+    np.testing.assert_array_equal(result['trades'], [1, 3])
+    np.testing.assert_allclose(result['fees'], [1.0, 3.0])
+    np.testing.assert_allclose(result['turnover'], [9.0, 9.0])
+
+
+def test_vol_band_policy_skips_small_first_error():
+    # 10 x 2 delta-shares x 20% x sqrt(400 / 365) is a band of about 4.2 shares
+    result = backtest(ticks([0.02, 0.02]), policy_grid(vol_bands=[10.0]))
+    assert result['trades'][0] == 0
+
+
+def test_interval_policy_trades_on_schedule():
+    result = backtest(ticks([0.02, 0.04, 0.09, 0.10]), policy_grid(intervals=[2]))
+    # Rows 0 and 2 are due; the error in between is left alone
+    np.testing.assert_array_equal(result['trades'], [2])
+    np.testing.assert_allclose(result['turnover'], [9.0])
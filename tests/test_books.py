@@ -0,0 +1,90 @@
+# tests/test_books.py - Loading and eviction of hedge books
+import datetime as dt
+import os
+import sys
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import books
+from books import BookRegistry
+from models import OptionData
+from hedger import DeltaHedger
+
+START = dt.date(2024, 1, 1)
+
+
+def tick(hedger: DeltaHedger, day: int, delta: float) -> None:
+    with hedger.writing():
+        hedger.add_option_data(OptionData(START + dt.timedelta(days=day), 100.0 + day, 100.0, 5.0,
+                                          0.2, delta, dt.date(2024, 6, 1), 'call', 10))
+        hedger.update_hedge()
+
+
+def rows(hedger: DeltaHedger) -> int:
+    with hedger.reading():
+        return len(hedger.position_history)
+
+
+def two_book_budget(tmp_path) -> int:
+    """A budget that holds two loaded books but not three"""
+    return DeltaHedger(str(tmp_path / 'probe.store')).memory_bytes() * 5 // 2
+
+
+def test_budget_evicts_least_recently_used(tmp_path):
+    registry = BookRegistry(str(tmp_path / 'books'), memory_budget=two_book_budget(tmp_path))
+    registry.get('a')
+    registry.get('b')
+    registry.get('a')
+    registry.get('c')
+    assert list(registry.stats()['books']) == ['a', 'c']
+    assert registry.evictions == 1
+
+
+def test_idle_books_are_evicted(tmp_path, monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(books, 'time', types.SimpleNamespace(monotonic=lambda: clock[0],
+                                                             perf_counter=lambda: clock[0]))
+    registry = BookRegistry(str(tmp_path / 'books'), idle_seconds=60)
+    registry.get('a')
+    clock[0] = 30.0
+    registry.get('b')
+    clock[0] = 70.0
+    registry.evict_idle()
+    assert list(registry.stats()['books']) == ['b']
+    clock[0] = 95.0
+    registry.evict_idle()
+    assert registry.stats()['loaded'] == 0
+    assert registry.evictions == 2
+
+
+def test_evicted_book_reloads_from_its_snapshot(tmp_path):
+    registry = BookRegistry(str(tmp_path / 'books'))
+    hedger = registry.get('a')
+    for day, delta in enumerate([0.5, 0.6, 0.4]):
+        tick(hedger, day, delta)
+    registry.flush_all()
+    assert hedger._journal.size == 0
+
+    reloaded = registry.get('a')
+    assert reloaded is not hedger
+    assert rows(reloaded) == 3
+    assert reloaded.current_stock_units == hedger.current_stock_units
+
+
+def test_reload_sees_writes_through_a_stale_hedger(tmp_path):
+    registry = BookRegistry(str(tmp_path / 'books'), memory_budget=two_book_budget(tmp_path))
+    stale = registry.get('a')
+    tick(stale, 0, 0.5)
+    registry.get('b')
+    registry.get('c')
+    assert 'a' not in registry.stats()['books']
+
+    # A request that still holds the evicted hedger writes before and after the reload
+    tick(stale, 1, 0.6)
+    reloaded = registry.get('a')
+    assert rows(reloaded) == 2
+    tick(stale, 2, 0.4)
+    assert rows(reloaded) == 3
+    assert reloaded.current_stock_units == stale.current_stock_units
+    assert reloaded.current_capital == stale.current_capital
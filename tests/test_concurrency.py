@@ -0,0 +1,85 @@
+# tests/test_concurrency.py - Worker processes writing to one set of data files
+import datetime as dt
+import multiprocessing
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+from models import OptionData
+from hedger import DeltaHedger
+
+OPERATIONS = 300
+
+
+def option(rng: random.Random) -> OptionData:
+    return OptionData(dt.date(2024, 1, 1) + dt.timedelta(days=rng.randrange(300)), 100 + rng.uniform(-10, 10),
+                      100.0, 5.0, 0.2, rng.uniform(0.1, 0.9), dt.date(2025, 1, 1), 'call', 10)
+
+
+def worker(filename: str, seed: int, barrier, results) -> None:
+    """Mixed writes through writing(), with consistency checks through reading().
+
+    Once both workers are done, each catches up and reports the book it ends up with.
+    """
+    rng = random.Random(seed)
+    hedger = DeltaHedger(filename)
+    barrier.wait()
+    accepted, errors = {'ticks': 0, 'stock': 0}, []
+    for _ in range(OPERATIONS):
+        kind = rng.random()
+        with hedger.writing():
+            if kind < 0.7 or not hedger.options_data:
+                hedger.add_option_data(option(rng))
+                hedger.update_hedge()
+                accepted['ticks'] += 1
+            elif kind < 0.85:
+                hedger.add_stock_position(dt.date(2024, 6, 1), 100.0, rng.choice(['LONG', 'SHORT']),
+                                          rng.randint(1, 50))
+                accepted['stock'] += 1
+            else:
+                hedger.edit_option_data(rng.randrange(len(hedger.options_data)), option(rng))
+        if rng.random() < 0.3:
+            with hedger.reading():
+                lengths = {len(column) for column in hedger.position_history.columns().values()}
+                if len(lengths) != 1:
+                    errors.append(f"ragged history columns {lengths}")
+    barrier.wait()
+    with hedger.reading():
+        book = (len(hedger.position_history), hedger.current_capital, hedger.current_stock_units)
+    results.put((accepted, errors, book))
+
+
+def test_two_processes_share_one_book(tmp_path):
+    filename = str(tmp_path / 'book.store')
+    context = multiprocessing.get_context('spawn')
+    results, barrier = context.Queue(), context.Barrier(2)
+    processes = [context.Process(target=worker, args=(filename, seed, barrier, results)) for seed in range(2)]
+    for process in processes:
+        process.start()
+    outcomes = [results.get(timeout=120) for _ in processes]
+    for process in processes:
+        process.join(timeout=30)
+        assert process.exitcode == 0
+
+    assert [error for _, errors, _ in outcomes for error in errors] == []
+    ticks = sum(accepted['ticks'] for accepted, _, _ in outcomes)
+    stock = sum(accepted['stock'] for accepted, _, _ in outcomes)
+
+    # Every write landed once, both workers hold the book the journal replays to,
+    # and that book is consistent
+    hedger = DeltaHedger(filename)
+    assert len(hedger.options_data) == ticks
+    assert len(hedger.position_history) == ticks + stock
+    for _, _, book in outcomes:
+        np.testing.assert_allclose(book, (len(hedger.position_history), hedger.current_capital,
+                                          hedger.current_stock_units))
+    history = {name: column.copy() for name, column in hedger.position_history.columns().items()}
+    transactions = hedger.stock_transactions.to_records()
+    hedger._recalculate_position_history(0)
+    for name, column in hedger.position_history.columns().items():
+        np.testing.assert_allclose(column, history[name], err_msg=name)
+    assert hedger.stock_transactions.to_records() == transactions
@@ -0,0 +1,98 @@
+# tests/test_downsample.py - Point reduction keeps trades and extremes
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+import pytest
+
+from downsample import downsample, lttb, minmax
+
+
+def walk(size: int, seed: int = 0) -> np.ndarray:
+    return np.cumsum(np.random.default_rng(seed).normal(size=size))
+
+
+def lttb_loop(x, y, points):
+    """Largest-triangle-three-buckets one point at a time, over the same buckets"""
+    edges = list(np.linspace(1, len(x) - 1, points - 1).astype(np.int64)) + [len(x)]
+    picked, a = [0], 0
+    for i in range(points - 2):
+        lo, hi, next_lo, next_hi = edges[i], edges[i + 1], edges[i + 1], edges[i + 2]
+        avg_x = sum(x[next_lo:next_hi]) / (next_hi - next_lo)
+        avg_y = sum(y[next_lo:next_hi]) / (next_hi - next_lo)
+        best, best_area = lo, -1.0
+        for j in range(lo, hi):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        picked.append(best)
+        a = best
+    return picked + [len(x) - 1]
+
+
+def test_lttb_matches_loop():
+    y = walk(1000)
+    x = np.arange(1000.0)
+    assert lttb(x, y, 50).tolist() == lttb_loop(x.tolist(), y.tolist(), 50)
+
+
+def test_minmax_keeps_every_bucket_extreme():
+    y = walk(1000, seed=1)
+    picked = set(minmax(y, 40).tolist())
+    starts = np.linspace(0, 1000, 20, endpoint=False).astype(np.int64)
+    for lo, hi in zip(starts, np.append(starts[1:], 1000)):
+        assert lo + int(np.argmin(y[lo:hi])) in picked
+        assert lo + int(np.argmax(y[lo:hi])) in picked
+    assert len(picked) <= 40
+
+
+@pytest.mark.parametrize('method', ['lttb', 'minmax'])
+def test_downsample_keeps_trades_and_extremes(method):
+    y = walk(5000, seed=2)
+    y[1234] = y.max() + 10  # a lone spike
+    trades = np.array([3, 777, 4321, 4999])
+    picked = downsample(np.arange(5000.0), y, 200, trades, method)
+    assert np.all(np.diff(picked) > 0)
+    assert set(trades.tolist()) <= set(picked.tolist())
+    assert {int(np.argmin(y)), int(np.argmax(y)), 1234} <= set(picked.tolist())
+    assert len(picked) <= 200 + len(trades) + 2
+
+
+def test_short_series_are_kept_whole():
+    y = walk(100)
+    assert downsample(np.arange(100.0), y, 100).tolist() == list(range(100))
+    assert downsample(np.arange(100.0), y, 0).tolist() == list(range(100))
+
+
+def test_chart_series_keep_the_largest_trades(tmp_path):
+    from hedger import DeltaHedger
+
+    rows = 3000
+    rng = np.random.default_rng(3)
+    start = 730000
+    hedger = DeltaHedger(str(tmp_path / 'charts.store'))
+    hedger.ingest_options({
+        'date': start + np.arange(rows, dtype=np.int64),
+        'underlying_price': 100 + walk(rows, seed=4),
+        'strike_price': np.full(rows, 100.0),
+        'option_price': np.full(rows, 5.0),
+        'iv': np.full(rows, 0.2),
+        'delta': np.clip(0.5 + walk(rows, seed=5) / 100, 0.0, 1.0),
+        'expiration': np.full(rows, start + rows + 365, dtype=np.int64),
+        'option_type': np.zeros(rows, dtype=np.int8),
+        'position_size': rng.integers(1, 20, rows)
+    })
+    points = 200
+    transactions = hedger.stock_transactions
+    largest = np.argsort(transactions.column('shares'))[-(points // 4):]
+    trade_dates = set(hedger.position_history.column('date')[transactions.column('row')[largest]].tolist())
+
+    history = hedger.position_history
+    for name, (dates, values) in hedger._plot_series(points, None, None).items():
+        kept = set((dates.astype('datetime64[D]').astype(np.int64) + 719163).tolist())
+        assert trade_dates <= kept, name
+        column = history.column(name)
+        assert column.min() in values and column.max() in values, name
+        assert len(values) <= points + points // 4 + 2, name
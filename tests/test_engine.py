@@ -0,0 +1,80 @@
+# tests/test_engine.py - Vectorized replay against the sequential hedging rule
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+import pytest
+
+import engine
+from engine import DEAD_BAND, find_trades, hedge_units, replay_hedge
+
+
+def replay_loop(delta, position_size, price, held, capital, fixed_cost, percentage_cost):
+    """The per-row rule of DeltaHedger.update_hedge"""
+    rows = {name: [] for name in ('stock_position', 'capital', 'trade', 'adjustment', 'fee')}
+    for d, size, p in zip(delta, position_size, price):
+        target = -d * size * 100
+        adjustment = target - held
+        fee = 0.0
+        trade = abs(adjustment) > DEAD_BAND
+        if trade:
+            fee = fixed_cost + abs(adjustment) * p * percentage_cost
+            capital -= adjustment * p + fee
+            held = target
+        for name, value in zip(rows, (held, capital, trade, adjustment if trade else 0.0, fee)):
+            rows[name].append(value)
+    return {name: np.array(values) for name, values in rows.items()}
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_replay_matches_sequential_loop(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(1, 700))
+    position_size = rng.choice([1, 10, -5], n)
+    # Targets drawn from a few levels plus steps right at the edges of the dead band
+    levels = rng.choice([-0.6, -0.2, 0.3, 0.55], n)
+    delta = np.where(rng.random(n) < 0.5, levels, np.roll(levels, 1))
+    edge = rng.choice([0.0, DEAD_BAND, -DEAD_BAND, 0.5 * DEAD_BAND, 1.5 * DEAD_BAND], n)
+    target = np.cumsum(np.where(rng.random(n) < 0.6, edge, 0.0)) + hedge_units(delta, position_size)
+    delta = target / (-100.0 * position_size)
+    target = hedge_units(delta, position_size)
+    price = 100 + np.cumsum(rng.normal(0, 1, n))
+    held = float(target[0] + rng.choice([0.0, DEAD_BAND, 2 * DEAD_BAND]))
+    fixed_cost, percentage_cost = rng.choice([0.0, 1.5]), rng.choice([0.0, 0.001])
+
+    result = replay_hedge(delta, position_size, price, held, 1e6, fixed_cost, percentage_cost)
+    expected = replay_loop(delta, position_size, price, held, 1e6, fixed_cost, percentage_cost)
+    np.testing.assert_array_equal(result['trade'], expected['trade'])
+    for name in ('stock_position', 'adjustment', 'fee', 'capital'):
+        np.testing.assert_allclose(result[name], expected[name], rtol=1e-12, atol=1e-6, err_msg=name)
+
+
+@pytest.mark.parametrize('sigma', [0.004, 0.01, 0.03])
+def test_skips_resolved_in_one_pass_match_sequential_loop(sigma, monkeypatch):
+    # Keep the skip path even where skips are dense enough to walk the rows
+    monkeypatch.setattr(engine, '_DENSE_SKIPS', 10 ** 9)
+    rng = np.random.default_rng(11)
+    for _ in range(200):
+        n = int(rng.integers(2, 300))
+        # Rounded steps make runs of consecutive skips and rows exactly on the band
+        target = np.round(np.cumsum(rng.normal(0, sigma, n)), 3)
+        held = float(rng.choice([0.0, target[0]]))
+        expected, position = np.zeros(n, dtype=bool), held
+        for row, value in enumerate(target):
+            if abs(value - position) > DEAD_BAND:
+                expected[row], position = True, value
+        np.testing.assert_array_equal(find_trades(target, held), expected)
+
+
+def test_dead_band_edges():
+    # Targets exactly DEAD_BAND from the held position hold; anything further trades
+    delta = np.array([-0.0001, 0.0001, -0.0002, -0.0001, 0.0003, 0.0002])
+    position_size = np.ones(len(delta), dtype=np.int64)
+    price = np.full(len(delta), 100.0)
+    result = replay_hedge(delta, position_size, price, 0.0, 0.0, 2.0, 0.01)
+    expected = replay_loop(delta, position_size, price, 0.0, 0.0, 2.0, 0.01)
+    np.testing.assert_array_equal(result['trade'], [False, False, True, False, True, False])
+    np.testing.assert_array_equal(result['trade'], expected['trade'])
+    np.testing.assert_allclose(result['capital'], expected['capital'])
@@ -0,0 +1,30 @@
+# tests/test_events.py - Live-update stream limits
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from events import BUSY_RETRY_MS, EventBus, StreamSlots, busy_stream
+
+
+def test_stream_slots_refuse_past_limit_until_released():
+    slots = StreamSlots(2)
+    assert slots.acquire() and slots.acquire()
+    assert not slots.acquire()
+    slots.release()
+    assert slots.acquire()
+    assert slots.open == 2
+
+
+def test_busy_stream_only_sets_retry():
+    assert busy_stream() == f"retry: {BUSY_RETRY_MS}\n\n"
+
+
+def test_closing_an_unstarted_stream_unsubscribes():
+    # The route unsubscribes on close, since an unstarted generator never runs its finally
+    bus = EventBus()
+    subscriber = bus.subscribe()
+    bus.stream(subscriber)
+    bus.unsubscribe(subscriber)
+    bus.unsubscribe(subscriber)
+    assert not bus
@@ -0,0 +1,157 @@
+# tests/test_hedger.py - Journal replay and shared state of DeltaHedger
+import datetime as dt
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+from models import OptionData
+from hedger import DeltaHedger
+
+START = dt.date(2024, 1, 1)
+
+
+def option(day: int, delta: float) -> OptionData:
+    return OptionData(START + dt.timedelta(days=day), 100.0 + day, 100.0, 5.0 + day * 0.1,
+                      0.2, delta, dt.date(2024, 6, 1), 'call', 10)
+
+
+def tick(hedger: DeltaHedger, day: int, delta: float) -> None:
+    with hedger.writing():
+        hedger.add_option_data(option(day, delta))
+        hedger.update_hedge()
+
+
+def change(hedger: DeltaHedger, method, *args) -> None:
+    """Run one mutation the way a route does: under writing(), committed on exit"""
+    with hedger.writing():
+        method(*args)
+
+
+def mixed_sequence(hedger: DeltaHedger) -> None:
+    """Ticks interleaved with edits, deletes, settings and manual trades"""
+    for day, delta in enumerate([0.5, 0.6, 0.55]):
+        tick(hedger, day, delta)
+    change(hedger, hedger.delete_option_data, 1)
+    change(hedger, hedger.set_transaction_costs, 5, 0.01)
+    tick(hedger, 3, 0.7)
+    change(hedger, hedger.add_stock_position, START + dt.timedelta(days=3), 103.0, 'LONG', 17)
+    tick(hedger, 4, 0.45)
+    change(hedger, hedger.edit_option_data, 2, option(3, 0.4))
+    change(hedger, hedger.set_initial_capital, 250000)
+    change(hedger, hedger.add_stock_position, START + dt.timedelta(days=4), 104.0, 'SHORT', 5)
+    change(hedger, hedger.set_transaction_costs, 1, 0.002)
+    tick(hedger, 5, 0.62)
+    change(hedger, hedger.edit_option_data, 0, option(0, 0.52))
+    tick(hedger, 6, 0.3)
+    change(hedger, hedger.delete_option_data, 3)
+    change(hedger, hedger.set_transaction_costs, 2, 0.005)
+    tick(hedger, 7, 0.5)
+
+
+def assert_same_book(actual: DeltaHedger, expected: DeltaHedger) -> None:
+    for name, store in expected.stores().items():
+        other = actual.stores()[name]
+        assert len(other) == len(store), name
+        for column, values in store.columns().items():
+            np.testing.assert_allclose(other.column(column), values, err_msg=f"{name}.{column}")
+    assert actual.current_capital == expected.current_capital
+    assert actual.current_stock_units == expected.current_stock_units
+    assert actual.totals == expected.totals
+
+
+def test_reload_replays_journal_like_the_live_book(tmp_path):
+    hedger = DeltaHedger(str(tmp_path / 'book.json'))
+    mixed_sequence(hedger)
+
+    reloaded = DeltaHedger(str(tmp_path / 'book.json'))
+    assert_same_book(reloaded, hedger)
+
+
+def test_delete_before_cost_change_keeps_old_fees_on_reload(tmp_path):
+    hedger = DeltaHedger(str(tmp_path / 'book.json'))
+    for day, delta in enumerate([0.5, 0.6, 0.55]):
+        tick(hedger, day, delta)
+    change(hedger, hedger.delete_option_data, 1)
+    change(hedger, hedger.set_transaction_costs, 5, 0.01)
+    tick(hedger, 3, 0.7)
+
+    reloaded = DeltaHedger(str(tmp_path / 'book.json'))
+    assert hedger.stock_transactions.column('transaction_fee')[0] == 0
+    assert_same_book(reloaded, hedger)
+
+
+def test_sync_catches_up_with_another_writer(tmp_path):
+    writer = DeltaHedger(str(tmp_path / 'book.json'))
+    reader = DeltaHedger(str(tmp_path / 'book.json'))
+    mixed_sequence(writer)
+
+    assert reader.is_stale()
+    with reader.lock.write():
+        reader.sync()
+    assert_same_book(reader, writer)
+
+
+def history_state(hedger: DeltaHedger):
+    return ({name: {column: values.copy() for column, values in store.columns().items()}
+             for name, store in hedger.snapshot_stores().items()},
+            hedger.current_capital, hedger.current_stock_units, dict(hedger.totals))
+
+
+def assert_same_state(actual, expected) -> None:
+    stores, capital, units, totals = expected
+    for name, columns in stores.items():
+        for column, values in columns.items():
+            np.testing.assert_allclose(actual[0][name][column], values, err_msg=f"{name}.{column}")
+    np.testing.assert_allclose(actual[1:3], (capital, units))
+    for name, value in totals.items():
+        np.testing.assert_allclose(actual[3][name], value, err_msg=name)
+
+
+def test_incremental_replay_with_manual_trades_matches_full_replay(tmp_path, monkeypatch):
+    # Small chunks and checkpoint intervals so replays cross both
+    monkeypatch.setattr('hedger.CHECKPOINT_INTERVAL', 4)
+    monkeypatch.setattr('hedger.REPLAY_CHUNK', 3)
+    rng = np.random.default_rng(7)
+    deltas = [0.3, 0.45, 0.5, 0.6]
+    hedger = DeltaHedger(str(tmp_path / 'book.json'))
+    hedger.set_transaction_costs(1, 0.001)
+
+    day, manual_trades = 0, 0
+    for _ in range(40):
+        if rng.random() < 0.25:
+            hedger.add_stock_position(START + dt.timedelta(days=day), 100.0 + day,
+                                      rng.choice(['LONG', 'SHORT']), float(rng.integers(1, 30)))
+            manual_trades += 1
+        else:
+            hedger.add_option_data(option(day, rng.choice(deltas)))
+            hedger.update_hedge()
+            day += 1
+
+    for _ in range(30):
+        kind = rng.random()
+        if kind < 0.5:
+            index = int(rng.integers(len(hedger.options_data)))
+            hedger.edit_option_data(index, option(index, rng.choice(deltas)))
+            if rng.random() < 0.5:
+                index = int(rng.integers(len(hedger.options_data)))
+                hedger.edit_option_data(index, option(index, rng.choice(deltas)))
+        elif kind < 0.8:
+            hedger.delete_option_data(int(rng.integers(len(hedger.options_data))))
+        else:
+            manual = np.flatnonzero(hedger.stock_transactions.decoded_column('type') == 'MANUAL')
+            if len(manual):
+                hedger.delete_transaction(int(rng.choice(manual)))
+                manual_trades -= 1
+        hedger.apply_pending_edits()
+        incremental = history_state(hedger)
+
+        hedger._recalculate_position_history(0)
+        assert_same_state(incremental, history_state(hedger))
+        # Every option row is hedged once and every manual trade is kept
+        row_types = hedger.position_history.decoded_column('transaction_type')
+        assert (row_types == 'HEDGE').sum() == len(hedger.options_data)
+        assert (row_types == 'MANUAL').sum() == manual_trades
+        assert (hedger.stock_transactions.decoded_column('type') == 'MANUAL').sum() == manual_trades
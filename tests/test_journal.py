@@ -0,0 +1,38 @@
+# tests/test_journal.py - Append-only journal writes
+import errno
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pytest
+
+import journal
+from journal import Journal
+
+
+class FullDisk(io.FileIO):
+    """Writes half the data, then fails like a full disk"""
+
+    def write(self, data):
+        super().write(data[:len(data) // 2])
+        raise OSError(errno.ENOSPC, 'No space left on device')
+
+
+def test_failed_write_does_not_tear_the_next_entry(tmp_path, monkeypatch):
+    log = Journal(str(tmp_path / 'book.journal'), fsync=False)
+    log.record('tick', value=1)
+    log.commit()
+
+    log.record('capital', value=2)
+    monkeypatch.setattr(journal, 'open', lambda path, mode: FullDisk(path, mode), raising=False)
+    with pytest.raises(OSError):
+        log.commit()
+    monkeypatch.undo()
+    assert os.path.getsize(log.path) == log.offset
+
+    log.record('costs', value=3)
+    log.commit()
+    entries = Journal(log.path).read()
+    assert [(entry['op'], entry['value']) for entry in entries] == [('tick', 1), ('capital', 2), ('costs', 3)]
@@ -0,0 +1,24 @@
+# tests/test_metrics.py - Prometheus rendering of the hedger metrics
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import metrics
+from hedger import DeltaHedger
+
+
+def version_lines(book: str):
+    return [line for line in metrics.render().splitlines()
+            if line.startswith(f'hedger_version{{book="{book}"}}')]
+
+
+def test_reloaded_book_is_reported_once_by_its_newest_instance(tmp_path):
+    path = str(tmp_path / 'reloaded.store')
+    stale = DeltaHedger(path)
+    stale.version = 7
+    current = DeltaHedger(path)
+    current.version = 3
+    # Both instances are alive, as when a request still holds an evicted book
+    assert stale is not current
+    assert version_lines('reloaded') == ['hedger_version{book="reloaded"} 3']
@@ -0,0 +1,91 @@
+# tests/test_pricing.py - Black-Scholes greeks, implied vol and the greeks cache
+import datetime as dt
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+import pytest
+
+from models import OptionData
+from hedger import DeltaHedger
+from pricing import GreeksCache, bs_delta, bs_price, implied_vol
+
+
+def test_delta_reference_values():
+    # d1 = 0.35 for a one-year at-the-money option at 20% vol and 5% rates
+    np.testing.assert_allclose(bs_delta(100.0, 100.0, 1.0, 0.2, True, 0.05), 0.636831, atol=1e-6)
+    np.testing.assert_allclose(bs_delta(100.0, 100.0, 1.0, 0.2, False, 0.05), 0.636831 - 1, atol=1e-6)
+    # Expired options take their intrinsic delta
+    np.testing.assert_array_equal(bs_delta(np.array([90.0, 110.0]), 100.0, 0.0, 0.2, True), [0.0, 1.0])
+
+
+def test_implied_vol_round_trip():
+    rng = np.random.default_rng(3)
+    spot = rng.uniform(50, 150, 200)
+    strike = rng.uniform(60, 140, 200)
+    years = rng.uniform(0.05, 2.0, 200)
+    vol = rng.uniform(0.05, 1.5, 200)
+    is_call = rng.random(200) < 0.5
+    price = bs_price(spot, strike, years, vol, is_call)
+    # Deep in or out of the money prices carry too little vol to invert precisely
+    usable = np.abs(bs_price(spot, strike, years, vol * 1.01, is_call) - price) > 1e-6
+    solved = implied_vol(price, spot, strike, years, is_call)
+    np.testing.assert_allclose(solved[usable], vol[usable], rtol=1e-6)
+
+
+@pytest.mark.parametrize('price', [0.0001, 99.0])
+def test_unreachable_price_has_no_implied_vol(price):
+    # Below the price at MIN_VOL, or above the price at MAX_VOL, but within the arbitrage bounds
+    assert np.isnan(implied_vol(price, 100.0, 100.0, 0.5, True))
+
+
+def test_unsolvable_option_is_rejected_by_the_hedger(tmp_path):
+    hedger = DeltaHedger(str(tmp_path / 'book.json'))
+    option = OptionData(dt.date(2024, 1, 2), 100.0, 100.0, 0.0001, float('nan'), float('nan'),
+                        dt.date(2024, 7, 2), 'call', 10)
+    with pytest.raises(ValueError):
+        hedger.add_option_data(option)
+    assert not hedger.options_data
+
+
+def quotes(option_price):
+    return (np.array([100.0, 100.0]), np.array([100.0, 110.0]), np.asarray(option_price, dtype=np.float64),
+            np.array([180, 180]), np.array([True, False]), np.array([np.nan, np.nan]))
+
+
+def test_greeks_cache_hits_and_misses():
+    cache = GreeksCache()
+    iv, delta = cache.solve(*quotes([6.0, 14.0]))
+    assert (cache.hits, cache.misses) == (0, 2)
+
+    again = cache.solve(*quotes([6.0, 14.0]))
+    assert (cache.hits, cache.misses) == (2, 2)
+    np.testing.assert_array_equal(again[0], iv)
+    np.testing.assert_array_equal(again[1], delta)
+
+    # A new option price is a new quote
+    changed_iv, _ = cache.solve(*quotes([6.5, 14.0]))
+    assert (cache.hits, cache.misses) == (3, 3)
+    assert changed_iv[0] > iv[0] and changed_iv[1] == iv[1]
+
+
+def call_quote(option_price):
+    return (np.array([100.0]), np.array([100.0]), np.array([option_price]),
+            np.array([180]), np.array([True]), np.array([np.nan]))
+
+
+def test_greeks_cache_evicts_least_recently_used():
+    cache = GreeksCache(max_entries=2)
+    cache.solve(*call_quote(6.0))
+    cache.solve(*call_quote(7.0))
+    cache.solve(*call_quote(6.0))
+    cache.solve(*call_quote(8.0))
+    assert cache.misses == 3
+
+    # 7.0 was used least recently and made room for 8.0
+    cache.solve(*call_quote(6.0))
+    assert cache.misses == 3
+    cache.solve(*call_quote(7.0))
+    assert cache.misses == 4
@@ -0,0 +1,98 @@
+# tests/test_serialize.py - Column serialization and the per-version response cache
+import datetime as dt
+import gzip
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pytest
+
+from models import OptionData
+from hedger import DeltaHedger
+from serialize import COMPRESS_MIN_BYTES, ResponseCache, columns_json, compress, records_json
+
+START = dt.date(2024, 1, 1)
+
+
+def tick(hedger: DeltaHedger, day: int, delta: float) -> None:
+    with hedger.writing():
+        hedger.add_option_data(OptionData(START + dt.timedelta(days=day), 100.0 + day, 100.0, 5.0,
+                                          0.2, delta, dt.date(2024, 6, 1), 'call', 10))
+        hedger.update_hedge()
+
+
+def book(tmp_path, days: int = 30) -> DeltaHedger:
+    hedger = DeltaHedger(str(tmp_path / 'serialize.store'))
+    for day in range(days):
+        tick(hedger, day, 0.3 + 0.4 * (day % 7) / 7)
+    with hedger.writing():
+        hedger.add_stock_position(START + dt.timedelta(days=3), 103.0, 'SHORT', 12)
+    return hedger
+
+
+def test_json_matches_the_records(tmp_path):
+    hedger = book(tmp_path)
+    for store in (hedger.position_history, hedger.stock_transactions):
+        records = store.to_records()
+        assert json.loads(records_json(store)) == records
+        columns = json.loads(columns_json(store))
+        assert [dict(zip(columns, row)) for row in zip(*columns.values())] == records
+        assert json.loads(records_json(store, [2, 0])) == [records[2], records[0]]
+
+
+def test_compress_only_bodies_worth_it():
+    body = json.dumps(list(range(1000))).encode()
+    assert len(body) >= COMPRESS_MIN_BYTES
+    compressed, encoding = compress(body, 'gzip')
+    assert encoding == 'gzip' and gzip.decompress(compressed) == body
+    assert compress(body[:100], 'gzip') == (body[:100], None)
+    assert compress(body, 'identity') == (body, None)
+
+
+def test_response_cache_misses_after_a_version_bump():
+    cache = ResponseCache(max_entries=2)
+    assert cache.get(1, 'a') is None
+    cache.put(1, 'a', b'A')
+    assert cache.get(1, 'a') == b'A'
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    assert cache.get(2, 'a') is None
+    cache.put(1, 'a', b'stale')  # built before the bump; never served
+    assert cache.get(2, 'a') is None
+
+    for key in 'abc':
+        cache.put(2, key, key.upper().encode())
+    assert cache.get(2, 'a') is None
+    assert cache.get(2, 'c') == b'C'
+
+
+def test_routes_answer_304_and_gzip_from_the_cache(tmp_path):
+    flask = pytest.importorskip('flask')
+    from routes import configure_routes
+
+    hedger = book(tmp_path)
+    app = flask.Flask(__name__)
+    configure_routes(app, hedger)
+    client = app.test_client()
+
+    first = client.get('/api/analytics?window=5')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert client.get('/api/analytics?window=5', headers={'If-None-Match': etag}).status_code == 304
+    assert client.get('/api/analytics?window=6', headers={'If-None-Match': etag}).status_code == 200
+
+    history = client.get('/api/history', headers={'Accept-Encoding': 'gzip'})
+    assert history.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(history.data)) == hedger.position_history.to_records()
+    hits = hedger.responses.hits
+    assert client.get('/api/history', headers={'Accept-Encoding': 'gzip'}).data == history.data
+    assert hedger.responses.hits == hits + 1
+
+    tick(hedger, 30, 0.5)
+    assert client.get('/api/analytics?window=5', headers={'If-None-Match': etag}).status_code == 200
+    misses = hedger.responses.misses
+    fresh = client.get('/api/history', headers={'Accept-Encoding': 'gzip'})
+    assert hedger.responses.misses == misses + 1
+    assert len(json.loads(gzip.decompress(fresh.data))) == len(hedger.position_history)
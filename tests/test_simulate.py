@@ -0,0 +1,50 @@
+# tests/test_simulate.py - Trade and fee counts of the Monte Carlo hedge
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+from engine import hedge_units
+from pricing import bs_delta
+from simulate import SimulationParams, simulate_chunk
+
+
+def flat_params(**overrides):
+    # A vanishing vol keeps every path at the spot, so only time moves the delta
+    values = dict(spot=100.0, strike=105.0, days=60, iv=0.3, vol=1e-12, position_size=10,
+                  paths=3, steps=30, band=0.5, fixed_cost=1.0, percentage_cost=0.001, seed=0)
+    values.update(overrides)
+    return SimulationParams(**values)
+
+
+def expected_counts(params):
+    """Trades and fees of the live rule, stepping one path by hand"""
+    years = params.days / 365.0
+    dt = years / params.steps
+    target = hedge_units(bs_delta(np.full(params.steps, params.spot), params.strike,
+                                  years - dt * np.arange(params.steps), params.iv, params.is_call, params.rate),
+                         params.position_size)
+    held, trades, fees = target[0], 0, 0.0
+    for value in target[1:]:
+        if abs(value - held) > params.band:
+            trades += 1
+            fees += params.fixed_cost + abs(value - held) * params.spot * params.percentage_cost
+            held = value
+    return trades, fees
+
+
+def test_opening_hedge_is_neither_a_trade_nor_charged():
+    result = simulate_chunk(flat_params(steps=1), 3, 0)
+    assert result['trades'].tolist() == [0, 0, 0]
+    assert result['fees'].tolist() == [0.0, 0.0, 0.0]
+
+
+def test_trade_and_fee_counts_on_a_fixed_path():
+    params = flat_params()
+    trades, fees = expected_counts(params)
+    assert trades > 0
+    result = simulate_chunk(params, 3, 0)
+    assert result['trades'].tolist() == [trades] * 3
+    np.testing.assert_allclose(result['fees'], fees, rtol=1e-9)
@@ -0,0 +1,88 @@
+# tests/test_store.py - Date-ordered range queries over column stores
+import datetime as dt
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+from store import DATE, ColumnStore, DateIndex
+from hedger import DeltaHedger
+
+START = dt.date(2024, 1, 1)
+
+
+def dated_store(days) -> ColumnStore:
+    store = ColumnStore({'date': DATE, 'value': np.float64})
+    store.extend({'date': START.toordinal() + np.asarray(days, dtype=np.int64),
+                  'value': np.arange(len(days), dtype=np.float64)})
+    return store
+
+
+def in_range(store: ColumnStore, start, end) -> list:
+    """Rows dated from start to end, by date and then storage order"""
+    dates = store.column('date')
+    rows = [row for row in range(len(dates))
+            if (start is None or dates[row] >= start.toordinal()) and (end is None or dates[row] <= end.toordinal())]
+    return sorted(rows, key=lambda row: dates[row])
+
+
+def assert_ranges_match(store: ColumnStore, index: DateIndex, rng) -> None:
+    for _ in range(50):
+        first, last = sorted(rng.integers(-5, 70, 2).tolist())
+        start, end = START + dt.timedelta(days=first), START + dt.timedelta(days=last)
+        for bounds in ((start, end), (start, None), (None, end), (None, None)):
+            lo, hi = index.span(*bounds)
+            assert index.rows(lo, hi).tolist() == in_range(store, *bounds), bounds
+
+
+def test_ranges_over_unsorted_dates_match_a_scan():
+    rng = np.random.default_rng(0)
+    store = dated_store(rng.integers(0, 60, 500))
+    assert_ranges_match(store, DateIndex(store), rng)
+
+
+def test_index_follows_appends_and_edits():
+    rng = np.random.default_rng(1)
+    store = dated_store(np.arange(0, 40, 2))
+    index = DateIndex(store)
+    assert_ranges_match(store, index, rng)
+
+    # In-order appends, then one back-dated row, then edits in place
+    store.append({'date': START + dt.timedelta(days=45), 'value': 1.0})
+    assert_ranges_match(store, index, rng)
+    store.append({'date': START + dt.timedelta(days=3), 'value': 2.0})
+    assert_ranges_match(store, index, rng)
+    store.set_value(0, 'date', START + dt.timedelta(days=50))
+    assert_ranges_match(store, index, rng)
+    store.delete(5)
+    assert_ranges_match(store, index, rng)
+    assert len(index) == len(store)
+
+
+def test_paging_over_back_dated_trades(tmp_path):
+    hedger = DeltaHedger(str(tmp_path / 'pages.store'))
+    rng = np.random.default_rng(2)
+    for day in rng.integers(0, 30, 40).tolist():
+        with hedger.writing():
+            hedger.add_stock_position(START + dt.timedelta(days=day), 100.0, 'LONG', 1)
+    store = hedger.stock_transactions
+    start, end = START + dt.timedelta(days=5), START + dt.timedelta(days=20)
+    expected = in_range(store, start, end)
+
+    for descending in (False, True):
+        pages, cursor = [], 0
+        while cursor is not None:
+            rows, cursor = hedger.query_rows('stock_transactions', start, end, limit=7, cursor=cursor,
+                                             descending=descending)
+            assert len(rows) <= 7
+            pages += rows.tolist()
+        if descending:
+            assert sorted(pages) == sorted(expected)
+            assert (np.diff(store.column('date')[pages]) <= 0).all()
+        else:
+            assert pages == expected
+    # Without a range, rows come in storage order
+    rows, cursor = hedger.query_rows('stock_transactions', limit=10, cursor=35)
+    assert rows.tolist() == list(range(35, 40)) and cursor is None
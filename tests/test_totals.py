@@ -0,0 +1,100 @@
+# tests/test_totals.py - Running trade totals against a recount of the transactions
+import datetime as dt
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+import hedger as hedger_module
+from models import OptionData
+from hedger import DeltaHedger, trade_totals
+from store import TRADE_TOTALS, TRANSACTION_SCHEMA
+
+START = dt.date(2024, 1, 1)
+
+
+def option(day: int, delta: float) -> OptionData:
+    return OptionData(START + dt.timedelta(days=day), 100.0 + day, 100.0, 5.0,
+                      0.2, delta, dt.date(2024, 6, 1), 'call', 10)
+
+
+def recount(records) -> dict:
+    """TRADE_TOTALS one transaction at a time"""
+    totals = dict.fromkeys(TRADE_TOTALS, 0.0)
+    for record in records:
+        action = record['action'].lower()
+        totals['fees'] += record['transaction_fee']
+        totals[f"{action}_trades"] += 1
+        totals[f"{action}_shares"] += record['shares']
+        totals[f"{action}_notional"] += record['cost']
+    return totals
+
+
+def assert_close(actual: dict, expected: dict) -> None:
+    assert actual.keys() == expected.keys()
+    for name, value in expected.items():
+        assert np.isclose(actual[name], value, rtol=1e-9, atol=1e-6), name
+
+
+def test_trade_totals_match_a_recount():
+    rng = np.random.default_rng(0)
+    count = 200
+    columns = {
+        'action': rng.integers(0, len(TRANSACTION_SCHEMA['action']), count).astype(np.int8),
+        'shares': rng.uniform(0, 50, count),
+        'cost': rng.normal(0, 1000, count),
+        'transaction_fee': rng.uniform(0, 5, count)
+    }
+    records = [{'action': TRANSACTION_SCHEMA['action'][code], 'shares': shares, 'cost': cost,
+                'transaction_fee': fee}
+               for code, shares, cost, fee in zip(columns['action'], columns['shares'], columns['cost'],
+                                                  columns['transaction_fee'])]
+    assert_close({name: float(sums[0]) for name, sums in trade_totals(columns).items()}, recount(records))
+
+    ends = np.array([0, 1, 17, 17, 120, 200])
+    totals = trade_totals(columns, ends)
+    for i, end in enumerate(ends):
+        assert_close({name: float(sums[i]) for name, sums in totals.items()}, recount(records[:end]))
+
+
+def test_totals_follow_every_change(tmp_path, monkeypatch):
+    # Small checkpoints so edits restore totals from them
+    monkeypatch.setattr(hedger_module, 'CHECKPOINT_INTERVAL', 4)
+    hedger = DeltaHedger(str(tmp_path / 'totals.store'))
+    rng = np.random.default_rng(1)
+
+    def change(method, *args):
+        with hedger.writing():
+            method(*args)
+        with hedger.reading():
+            records = hedger.stock_transactions.to_records()
+            assert_close(hedger.totals, recount(records))
+            for checkpoint in hedger._checkpoints:
+                assert_close({name: checkpoint[name] for name in TRADE_TOTALS},
+                             recount(records[:int(checkpoint['transactions'])]))
+            summary = hedger.get_summary_data()
+            assert summary['total_trades'] == len(records)
+
+    def tick(day):
+        with hedger.writing():
+            hedger.add_option_data(option(day, rng.uniform(0.2, 0.8)))
+        change(hedger.update_hedge)
+
+    for day in range(20):
+        tick(day)
+    change(hedger.set_transaction_costs, 2, 0.001)
+    for day in range(20, 30):
+        tick(day)
+    change(hedger.add_stock_position, START + dt.timedelta(days=25), 120.0, 'LONG', 30)
+    change(hedger.add_stock_position, START + dt.timedelta(days=26), 121.0, 'SHORT', 12)
+    change(hedger.edit_option_data, 6, option(6, 0.9))
+    change(hedger.delete_option_data, 2)
+    change(hedger.delete_transaction, 3)
+    change(hedger.edit_option_data, 22, option(22, 0.1))
+    tick(30)
+
+    assert hedger.check_aggregates()['status'] == 'success'
+    reloaded = DeltaHedger(hedger.filename)
+    assert_close(reloaded.totals, hedger.totals)